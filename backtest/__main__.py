@@ -0,0 +1,82 @@
+# backtest/__main__.py
+"""
+離線回測：
+    python -m backtest run data/BTCUSDT-5m.csv data/ETHUSDT-5m.npy --out bt_out --workers 8
+    python -m backtest run klines/*-5m.kls          # 實盤 KLINE_STORE_DIR 落地的 K 線
+    python -m backtest convert data/BTCUSDT-5m.csv data/BTCUSDT-5m.npy
+    python -m backtest sweep data/*-5m.npy --grid grid.json --out sweep_out --verify 3
+不需要 API 金鑰，也不會連線交易所。
+"""
+import argparse
+import json
+import os
+import time
+
+# config.py 沒有金鑰會直接結束；回測完全離線，給假金鑰即可
+os.environ.setdefault("API_KEY", "backtest")
+os.environ.setdefault("API_SECRET", "backtest")
+os.environ.setdefault("DEBUG_MODE", "false")
+
+
+def main():
+    from backtest import data, engine, sweep
+
+    ap = argparse.ArgumentParser(prog="python -m backtest", description="離線回測")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run")
+    r.add_argument("files", nargs="+")
+    r.add_argument("--out", default="backtest_out")
+    r.add_argument("--workers", type=int, default=0, help="0 = CPU 核心數")
+    r.add_argument("--interval", default=None)
+    c = sub.add_parser("convert", help="CSV -> .npy（mmap 讀取）")
+    c.add_argument("src")
+    c.add_argument("dst")
+    w = sub.add_parser("sweep", help="參數網格掃描（backtest/sweep.py）")
+    w.add_argument("files", nargs="+")
+    w.add_argument("--grid", default="", help="JSON 檔：{參數名: [值, ...]}")
+    w.add_argument("-p", "--param", action="append", default=[], help="NAME=v1,v2,...（可重複，覆蓋 --grid）")
+    w.add_argument("--out", default="sweep_out")
+    w.add_argument("--workers", type=int, default=0, help="0 = CPU 核心數")
+    w.add_argument("--rank", default="pnl", choices=sweep.RANK_KEYS)
+    w.add_argument("--top", type=int, default=20)
+    w.add_argument("--verify", type=int, default=0, help="前 N 名以 replay 逐欄比對")
+    args = ap.parse_args()
+
+    if args.cmd == "sweep":
+        grid = {}
+        if args.grid:
+            with open(args.grid, "r", encoding="utf-8") as f:
+                grid = json.load(f)
+        for item in args.param:
+            name, _, values = item.partition("=")
+            grid[name.strip()] = sweep.parse_values(name.strip(), values)
+        t0 = time.perf_counter()
+        rows = sweep.sweep(args.files, grid, workers=args.workers or None, rank=args.rank)
+        elapsed = round(time.perf_counter() - t0, 2)
+        meta = {"files": args.files, "grid": grid, "rank": args.rank, "elapsed_s": elapsed}
+        out = sweep.write_results(rows, args.out, top=args.top, meta=meta)
+        out["elapsed_s"] = elapsed
+        if args.verify:
+            bad = sweep.verify(args.files, rows, args.verify)
+            out["verify"] = {"checked": min(args.verify, len(rows)), "mismatched": len(bad)}
+            if bad:
+                print(json.dumps(bad[:3], indent=2))
+        print(json.dumps(out, indent=2))
+        if out.get("verify", {}).get("mismatched"):
+            raise SystemExit(1)
+        return
+
+    if args.cmd == "convert":
+        data.save_npy(data.load(args.src), args.dst)
+        print(f"[BACKTEST] wrote {args.dst}")
+        return
+
+    t0 = time.perf_counter()
+    results = engine.run(args.files, workers=args.workers or None, interval=args.interval)
+    total = engine.write_results(results, args.out)
+    total["elapsed_s"] = round(time.perf_counter() - t0, 2)
+    print(json.dumps(total, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# backtest/data.py
+"""
+回測用的本地 K 線檔案：
+- CSV：至少 7 欄 open_time,open,high,low,close,volume,close_time（可有表頭；
+  data.binance.vision 下載的 12 欄格式可直接使用）
+- .npy：KLINE_DTYPE 的結構化陣列，以 mmap 方式讀取（不整檔載入記憶體）
+- .kls：實盤 KLINE_STORE_DIR 落地的 K 線檔（exchange/kline_store.py），同樣以 mmap 讀取
+檔名慣例 <SYMBOL>-<interval>.<ext>，例如 BTCUSDT-5m.csv。
+"""
+import os
+from typing import Tuple
+
+import numpy as np
+
+from exchange.kline_store import SUFFIX, read_header, read_records
+from strategies.klines import Bars
+
+KLINE_DTYPE = np.dtype([
+    ("open_time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+    ("close", "<f8"), ("volume", "<f8"), ("close_time", "<i8"),
+])
+
+
+def symbol_interval(path: str) -> Tuple[str, str]:
+    stem = os.path.basename(path).split(".")[0]
+    parts = stem.split("-")
+    return parts[0].upper(), (parts[1] if len(parts) > 1 else "")
+
+
+def from_records(rec: np.ndarray) -> Bars:
+    return Bars(rec["open_time"], rec["open"], rec["high"], rec["low"],
+                rec["close"], rec["volume"], rec["close_time"])
+
+
+def to_records(bars: Bars) -> np.ndarray:
+    rec = np.empty(len(bars), dtype=KLINE_DTYPE)
+    for name in KLINE_DTYPE.names:
+        rec[name] = getattr(bars, name)
+    return rec
+
+
+def load_csv(path: str) -> Bars:
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+    skip = 0 if first.split(",")[0].strip().lstrip("-").isdigit() else 1
+    raw = np.loadtxt(path, delimiter=",", skiprows=skip, usecols=range(7), dtype=np.float64, ndmin=2)
+    return Bars(
+        raw[:, 0].astype(np.int64), raw[:, 1].copy(), raw[:, 2].copy(), raw[:, 3].copy(),
+        raw[:, 4].copy(), raw[:, 5].copy(), raw[:, 6].astype(np.int64),
+    )
+
+
+def load_npy(path: str) -> Bars:
+    return from_records(np.load(path, mmap_mode="r"))
+
+
+def load_kls(path: str) -> Bars:
+    """open_time 必須逐根連續（相差 interval_ms）：有空洞的檔案直接拒絕，不拿來回測。"""
+    rec = read_records(path)
+    step = int(read_header(path)["interval_ms"])
+    if len(rec) > 1:
+        d = np.diff(rec["open_time"])
+        bad = np.flatnonzero(d != (step or d[0]))
+        if bad.size:
+            i = int(bad[0])
+            raise ValueError(f"non-contiguous open_time in {path}: "
+                             f"{int(rec['open_time'][i])} -> {int(rec['open_time'][i + 1])} at row {i + 1}")
+    # STORE_DTYPE 的前 7 欄即 KLINE_DTYPE，欄位名稱相同
+    return from_records(rec)
+
+
+def save_npy(bars: Bars, path: str):
+    np.save(path, to_records(bars))
+
+
+def load(path: str) -> Bars:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        return load_npy(path)
+    if ext == SUFFIX:
+        return load_kls(path)
+    if ext in (".csv", ".txt"):
+        return load_csv(path)
+    raise ValueError(f"unsupported kline file: {path}")
@@ -0,0 +1,144 @@
+# backtest/engine.py
+import asyncio
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import List, Optional
+
+import numpy as np
+
+import config
+from backtest.data import load, symbol_interval
+from backtest.sim_client import SimClient
+from risk.risk_mgr import RiskManager
+from strategies import indicators
+from strategies.revert import generate_revert_signal
+from strategies.trend import generate_trend_signal, should_pyramid
+
+
+def warmup_bars(params: dict = None) -> int:
+    """重播從第幾根開始評估；params 為參數掃描的網格點（預設讀 config）。"""
+    p = params or {}
+
+    def get(name):
+        return p.get(name, getattr(config, name))
+
+    return max(get("TREND_EMA_SLOW"), get("MACD_SIGNAL"), get("REVERT_RSI_PERIOD"), get("BOLL_WINDOW")) + 5
+
+
+@contextmanager
+def override(params: dict):
+    """暫時把 config 換成指定的值（參數掃描的網格點、replay 的回測設定），結束後還原。"""
+    saved = {k: getattr(config, k) for k in params}
+    for k, v in params.items():
+        setattr(config, k, v)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(config, k, v)
+
+
+async def replay(symbol: str, bars, interval: str = None):
+    """
+    逐根重播：每根 K 線依 main.manage_symbol 的順序呼叫真正的策略函式，
+    有訊號就經 RiskManager 下單（EQUITY_RATIO / LEVERAGE 與線上相同），突破時再加碼一次。
+    回傳 (SimClient, 權益曲線)。重播期間的 config 調整在結束後還原，不影響同 process 的其它呼叫端。
+    """
+    # 回測一律使用 O(1) 增量指標，否則每根都要重算整段視窗；模擬下單不寫進線上的交易日誌
+    with override({"INCREMENTAL_INDICATORS": True, "TRADE_JOURNAL": ""}):
+        return await _replay(symbol, bars, interval)
+
+
+async def _replay(symbol: str, bars, interval: str = None):
+    interval = interval or config.KLINE_INTERVAL
+    indicators.reset(symbol)
+    sim = SimClient(symbol, bars)
+    # 模擬時間與牆鐘無關：關閉帳戶 / 價格快取，每次都讀 SimClient 當下狀態
+    rm = RiskManager(sim, account_ttl=0, price_ttl=0)
+    n = len(bars)
+    curve = np.empty(n, dtype=np.float64)
+    warm = warmup_bars()
+    for i in range(n):
+        sim.i = i
+        if i >= warm:
+            trend = await generate_trend_signal(sim, symbol, interval)
+            revert = await generate_revert_signal(sim, symbol, interval)
+            sig = trend or revert
+            if sig:
+                await rm.execute_trade(symbol, sig)
+                if await should_pyramid(sim, symbol, side_long=(sig == "LONG")):
+                    await rm.execute_trade(symbol, sig)
+        curve[i] = sim.equity()
+        if curve[i] <= 0:
+            # 爆倉：之後不再交易
+            curve[i:] = 0.0
+            break
+    return sim, curve
+
+
+def summarize(sim: SimClient, curve: np.ndarray, start_equity: float) -> dict:
+    if curve.size:
+        peak = np.maximum.accumulate(curve)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dd = np.where(peak > 0, (peak - curve) / peak, 0.0)
+        max_dd = float(dd.max())
+        final = float(curve[-1])
+    else:
+        max_dd, final = 0.0, start_equity
+    closes = [t for t in sim.trades if t["realized"] != 0]
+    wins = sum(1 for t in closes if t["realized"] > 0)
+    return {
+        "symbol": sim.symbol,
+        "bars": int(curve.size),
+        "start_equity": start_equity,
+        "final_equity": round(final, 4),
+        "pnl": round(final - start_equity, 4),
+        "return_pct": round(100.0 * (final / start_equity - 1), 3) if start_equity else 0.0,
+        "max_drawdown_pct": round(100.0 * max_dd, 3),
+        "trades": len(sim.trades),
+        "closing_trades": len(closes),
+        "win_rate_pct": round(100.0 * wins / len(closes), 2) if closes else 0.0,
+        "fees": round(sim.fees, 4),
+        "rejected": sim.rejected,
+    }
+
+
+def run_file(path: str, interval: Optional[str] = None) -> dict:
+    """單一檔案回測（給 process pool 用，回傳可 pickle 的 dict）。"""
+    bars = load(path)
+    symbol, file_interval = symbol_interval(path)
+    sim, curve = asyncio.run(replay(symbol, bars, interval or file_interval or None))
+    return {"summary": summarize(sim, curve, float(config.BACKTEST_EQUITY)), "trades": sim.trades}
+
+
+def run(paths: List[str], workers: int = None, interval: str = None) -> List[dict]:
+    """多個 symbol 以 process pool 平行回測（每個 process 各自重播一個檔案）。"""
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1 or len(paths) <= 1:
+        return [run_file(p, interval) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(run_file, paths, [interval] * len(paths)))
+
+
+def write_results(results: List[dict], out_dir: str) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    summaries = [r["summary"] for r in results]
+    total = {
+        "symbols": len(summaries),
+        "pnl": round(sum(s["pnl"] for s in summaries), 4),
+        "trades": sum(s["trades"] for s in summaries),
+        "fees": round(sum(s["fees"] for s in summaries), 4),
+        "worst_drawdown_pct": max((s["max_drawdown_pct"] for s in summaries), default=0.0),
+    }
+    with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump({"total": total, "symbols": summaries}, f, indent=2)
+    fields = ["time", "symbol", "side", "qty", "price", "fee", "realized", "position", "equity"]
+    with open(os.path.join(out_dir, "trades.csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        for r in results:
+            w.writerows(r["trades"])
+    return total
@@ -0,0 +1,120 @@
+# backtest/sim_client.py
+from decimal import Decimal
+from typing import List, Optional
+
+import config
+from exchange.precision import SymbolPrecision
+from strategies.klines import Bars
+
+
+class SimClient:
+    """
+    回測用的 BinanceClient 替身（單一 symbol）：
+    get_klines / get_price / get_equity / change_leverage / open_long / open_short
+    都只讀寫記憶體。成交價 = 當根收盤價，手續費依 taker 費率，部位為單向淨額（one-way）。
+    """
+
+    def __init__(self, symbol: str, bars: Bars, equity: float = None, leverage: int = None,
+                 fee_rate: float = None, step_size: str = "0", max_pyramid: int = None):
+        self.symbol = symbol
+        self.bars = bars
+        self.i = 0
+        self.cash = float(equity if equity is not None else config.BACKTEST_EQUITY)
+        self.leverage = int(leverage or config.LEVERAGE)
+        self.fee_rate = float(config.BACKTEST_FEE_RATE if fee_rate is None else fee_rate)
+        # stepSize 為 "0" 時以 1e-8 為單位捨去（等同不量化）
+        self.precision = SymbolPrecision(symbol, step=step_size)
+        self.max_layers = 1 + (config.MAX_PYRAMID if max_pyramid is None else max_pyramid)
+        self.qty = 0.0           # >0 多單、<0 空單
+        self.entry = 0.0
+        self.layers = 0
+        self.realized = 0.0
+        self.fees = 0.0
+        self.trades: List[dict] = []
+        self.rejected = 0
+
+    # ---------- market data ----------
+    @property
+    def price(self) -> float:
+        return float(self.bars.close[self.i])
+
+    async def get_klines(self, symbol: str, interval: str = None, limit: int = None):
+        return self.bars.window(self.i + 1, limit or config.KLINE_LIMIT)
+
+    async def get_price(self, symbol: str) -> Optional[Decimal]:
+        return Decimal(repr(self.price))
+
+    # ---------- account ----------
+    def unrealized(self) -> float:
+        return self.qty * (self.price - self.entry) if self.qty else 0.0
+
+    def equity(self) -> float:
+        return self.cash + self.unrealized()
+
+    async def get_equity(self) -> Decimal:
+        return Decimal(repr(max(self.equity(), 0.0)))
+
+    async def change_leverage(self, symbol: str, leverage: int):
+        self.leverage = int(leverage)
+        return {"symbol": symbol, "leverage": self.leverage}
+
+    # ---------- orders ----------
+    async def get_precision(self, symbol: str) -> SymbolPrecision:
+        return self.precision
+
+    async def _quantize_qty(self, symbol: str, qty) -> Decimal:
+        return Decimal(self.precision.qty_str(self.precision.floor_qty(qty)))
+
+    async def open_long(self, symbol: str, qty):
+        return self._fill(self.precision.qty_float(self.precision.floor_qty(qty)))
+
+    async def open_short(self, symbol: str, qty):
+        return self._fill(-self.precision.qty_float(self.precision.floor_qty(qty)))
+
+    def _fill(self, dq: float):
+        if dq == 0:
+            return None
+        p = self.price
+        same_side = self.qty == 0 or (self.qty > 0) == (dq > 0)
+        if same_side:
+            if self.layers >= self.max_layers:
+                self.rejected += 1
+                return None
+            # 保證金不足就拒單
+            margin_used = abs(self.qty) * self.entry / self.leverage
+            if margin_used + abs(dq) * p / self.leverage > self.equity():
+                self.rejected += 1
+                return None
+
+        fee = abs(dq) * p * self.fee_rate
+        self.cash -= fee
+        self.fees += fee
+        realized = 0.0
+        if same_side:
+            new_qty = self.qty + dq
+            self.entry = (abs(self.qty) * self.entry + abs(dq) * p) / abs(new_qty)
+            self.qty = new_qty
+            self.layers += 1
+        else:
+            closed = min(abs(dq), abs(self.qty))
+            realized = closed * (p - self.entry) * (1 if self.qty > 0 else -1)
+            self.cash += realized
+            self.realized += realized
+            rest = abs(dq) - closed
+            if rest > 0:
+                # 反手：剩餘數量以現價開新方向
+                self.qty = rest if dq > 0 else -rest
+                self.entry = p
+                self.layers = 1
+            else:
+                self.qty = self.qty + dq
+                if abs(self.qty) < 1e-12:
+                    self.qty, self.entry, self.layers = 0.0, 0.0, 0
+
+        t = {
+            "time": int(self.bars.open_time[self.i]), "symbol": self.symbol,
+            "side": "BUY" if dq > 0 else "SELL", "qty": abs(dq), "price": p,
+            "fee": fee, "realized": realized, "position": self.qty, "equity": self.equity(),
+        }
+        self.trades.append(t)
+        return {"symbol": self.symbol, "status": "FILLED", "executedQty": str(abs(dq)), "avgPrice": str(p)}
@@ -0,0 +1,434 @@
+# backtest/sweep.py
+"""
+策略參數掃描：本地 K 線檔 × 參數網格，排名結果寫到磁碟。
+    python -m backtest sweep data/*-5m.npy --grid grid.json --out sweep_out --workers 8
+    python -m backtest sweep data/BTCUSDT-5m.kls -p TREND_EMA_FAST=8,12,16 -p REVERT_RSI_OVERSOLD=30,35,40
+grid.json 為 {"TREND_EMA_FAST": [8, 12], "BOLL_STDDEV": [1.5, 2.0], ...}，未列出的參數沿用 config。
+
+不逐組合重播：每個檔案的指標族只算一次，所有網格點共用
+- 每個不同的 EMA span 一次（fast / slow 共用），MACD 線依 (fast, slow)、signal 線依 (fast, slow, signal)
+- RSI 依 period、布林帶平均 / 標準差依 window；超買超賣門檻與 k 倍數只是向量比較
+- 突破加碼的前 N 根高 / 低點依 lookback
+再以與 generate_trend_signal / generate_revert_signal / should_pyramid 相同的規則得出每根的訊號，
+只在有訊號的 K 線上依 RiskManager 的 sizing 與 SimClient 成交，其餘區段的權益以向量計算。
+
+數值與 backtest.replay 完全一致：EMA 用與 indicators.EMA 相同的遞迴式（多個 span 整列一起算），
+再依 replay 每根看到的 KLINE_LIMIT 視窗以 MACD.anchored 的同一算式換算到視窗起點；
+RSI / 布林帶直接跑 indicators 的增量類別（滑動總和的捨入相同），門檻剛好相等時的判斷也不會不同。
+--verify N 會對排名前 N 的組合實際跑一次 replay 逐欄比對。
+"""
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import config
+from backtest.data import load, symbol_interval
+from backtest.engine import override, run_file, summarize, warmup_bars
+from backtest.sim_client import SimClient
+from strategies.indicators import RSI, RollingStats
+
+PARAMS = (
+    "TREND_EMA_FAST", "TREND_EMA_SLOW", "MACD_SIGNAL",
+    "REVERT_RSI_PERIOD", "REVERT_RSI_OVERSOLD", "REVERT_RSI_OVERBOUGHT",
+    "BOLL_WINDOW", "BOLL_STDDEV", "PYRAMID_BREAKOUT_LOOKBACK",
+)
+RANK_KEYS = ("pnl", "return_pct", "calmar", "win_rate_pct")
+
+
+# ---------- 網格 ----------
+def parse_values(name: str, text: str) -> list:
+    cast = type(getattr(config, name))
+    return [cast(v) for v in text.split(",") if v.strip()]
+
+
+def expand(grid: Dict[str, list]) -> List[dict]:
+    """
+    網格 -> 組合清單（未指定的參數沿用 config）。略過 fast >= slow，
+    以及暖機根數不小於 KLINE_LIMIT 的組合（replay 的增量狀態不會從第一根 seed，無法共用指標族）。
+    """
+    unknown = set(grid) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"unknown sweep params: {sorted(unknown)}")
+    values = []
+    for name in PARAMS:
+        v = grid.get(name, [getattr(config, name)])
+        values.append(list(v) if isinstance(v, (list, tuple)) else [v])
+    out = []
+    for combo in itertools.product(*values):
+        p = dict(zip(PARAMS, combo))
+        if p["TREND_EMA_FAST"] >= p["TREND_EMA_SLOW"] or warmup_bars(p) >= config.KLINE_LIMIT:
+            continue
+        out.append(p)
+    return out
+
+
+# ---------- 指標族 ----------
+def ema_rows(x: np.ndarray, spans) -> np.ndarray:
+    """
+    多個 span 的 EMA，回傳 (len(spans), n)；x 為共用的 1D 序列或每列一條的 2D。
+    遞迴式與 indicators.EMA 相同（第一筆為初值、value + alpha * (x - value)），逐根整列向量化。
+    """
+    alpha = 2.0 / (np.asarray(spans, dtype=np.float64) + 1.0)
+    xs = np.ascontiguousarray(x.T) if x.ndim == 2 else x
+    n = xs.shape[0]
+    out = np.empty((n, alpha.size), dtype=np.float64)
+    if n == 0:
+        return out.T
+    out[0] = xs[0]
+    for j in range(1, n):
+        p = out[j - 1]
+        np.add(p, alpha * (xs[j] - p), out=out[j])
+    return out.T
+
+
+class Families:
+    """
+    單一檔案的指標族快取。每個陣列的第 i 個元素 = replay 在第 i 根（未收盤）時看到的值：
+    狀態已吃進 0..i-1 根，第 i 根以 peek 試算。
+    """
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.close = np.ascontiguousarray(bars.close, dtype=np.float64)
+        self.high = np.ascontiguousarray(bars.high, dtype=np.float64)
+        self.low = np.ascontiguousarray(bars.low, dtype=np.float64)
+        self.n = self.close.size
+        self._ema: Dict[int, np.ndarray] = {}
+        self._signal: Dict[Tuple[int, int, int], np.ndarray] = {}
+        self._rsi: Dict[int, np.ndarray] = {}
+        self._boll: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._brk: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def prepare(self, combos: List[dict]):
+        """一次補齊這批組合缺少的 EMA / signal 線（同一趟逐根迴圈算完所有 span）。"""
+        spans = sorted({p[k] for p in combos for k in ("TREND_EMA_FAST", "TREND_EMA_SLOW")} - set(self._ema))
+        if spans:
+            for s, row in zip(spans, ema_rows(self.close, spans)):
+                self._ema[s] = row
+        triples = sorted({_triple(p) for p in combos} - set(self._signal))
+        if triples:
+            lines = np.stack([self.macd(f, s) for f, s, _ in triples])
+            for t, row in zip(triples, ema_rows(lines, [g for _, _, g in triples])):
+                self._signal[t] = row
+
+    def ema(self, span: int) -> np.ndarray:
+        if span not in self._ema:
+            self._ema[span] = ema_rows(self.close, [span])[0]
+        return self._ema[span]
+
+    def macd(self, fast: int, slow: int) -> np.ndarray:
+        return self.ema(fast) - self.ema(slow)
+
+    def signal(self, fast: int, slow: int, signal: int) -> np.ndarray:
+        t = (fast, slow, signal)
+        if t not in self._signal:
+            self._signal[t] = ema_rows(self.macd(fast, slow), [signal])[0]
+        return self._signal[t]
+
+    def window(self) -> Tuple[np.ndarray, np.ndarray]:
+        """replay 第 i 根的 K 線視窗起點 w（SimClient.get_klines 的 KLINE_LIMIT 根）與距起點的根數 i - w。"""
+        idx = np.arange(self.n)
+        w = np.maximum(0, idx + 1 - config.KLINE_LIMIT)
+        return w, idx - w
+
+    def trend_lines(self, fast: int, slow: int, signal: int) -> Tuple[np.ndarray, ...]:
+        """
+        每根的 (fast, slow, macd, signal) 前一根 / 最新一根，已換算到該根視窗起點（等同 SymbolIndicators.trend）。
+        回傳 8 個陣列：f1, f2, s1, s2, m1, m2, g1, g2。
+        """
+        w, k = self.window()
+        f, s, g = self.ema(fast), self.ema(slow), self.signal(fast, slow, signal)
+        base = (self.close[w], f[w], s[w], g[w])
+        ag = 2.0 / (signal + 1.0)
+        rates = (1.0 - 2.0 / (fast + 1.0), 1.0 - 2.0 / (slow + 1.0), 1.0 - ag)
+        # 次方以 Python float 建表（與 MACD.anchored 的 r ** n 逐位相同）
+        pows = [np.array([r ** j for j in range(config.KLINE_LIMIT + 1)]) for r in rates]
+        cur = _anchored(base, (f, s, g), k, rates, ag, pows)
+        prev = _anchored(base, tuple(np.concatenate(([a[0]], a[:-1])) for a in (f, s, g)),
+                         np.maximum(k - 1, 0), rates, ag, pows)
+        return prev[0], cur[0], prev[1], cur[1], prev[2], cur[2], prev[3], cur[3]
+
+    def rsi(self, period: int) -> np.ndarray:
+        if period not in self._rsi:
+            ind = RSI(period)
+            out = np.empty(self.n, dtype=np.float64)
+            for i, c in enumerate(self.close.tolist()):
+                out[i] = ind.peek(c)
+                ind.update(c)
+            self._rsi[period] = out
+        return self._rsi[period]
+
+    def boll(self, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        """布林帶的 (平均, 標準差)；上下軌 = ma ± k * sd 由呼叫端依 k 計算（與 Bollinger.peek 相同算式）。"""
+        if window not in self._boll:
+            st = RollingStats(window)
+            ma = np.empty(self.n, dtype=np.float64)
+            sd = np.empty(self.n, dtype=np.float64)
+            for i, c in enumerate(self.close.tolist()):
+                ma[i], sd[i] = st.peek(c)
+                st.update(c)
+            self._boll[window] = (ma, sd)
+        return self._boll[window]
+
+    def breakout(self, lookback: int) -> Tuple[np.ndarray, np.ndarray]:
+        """第 i 根之前 lookback 根的最高 / 最低（資料不足為 NaN，比較一律 False）。"""
+        if lookback not in self._brk:
+            hi = np.full(self.n, np.nan)
+            lo = np.full(self.n, np.nan)
+            # should_pyramid 的視窗至少要 lookback + 2 根，即 i >= lookback + 1
+            if lookback > 0 and self.n > lookback + 1:
+                win = np.lib.stride_tricks.sliding_window_view
+                hi[lookback + 1:] = win(self.high, lookback).max(axis=1)[1:self.n - lookback]
+                lo[lookback + 1:] = win(self.low, lookback).min(axis=1)[1:self.n - lookback]
+            self._brk[lookback] = (hi, lo)
+        return self._brk[lookback]
+
+
+def _anchored(base, vals, n, rates, ag, pows):
+    """MACD.anchored 的向量版（運算順序相同）：回傳 (fast, slow, macd, signal)。"""
+    x, fb, sb, gb = base
+    f, s, g = vals
+    (rf, rs, rg), (pf, ps, pg) = rates, pows
+    cf, cs = fb - x, sb - x
+    f2 = f - pf[n] * cf
+    s2 = s - ps[n] * cs
+    gn = pg[n]
+
+    def h(r, pr):
+        return gn + ag * (n * pr[n] if r == rg else r * (gn - pr[n]) / (rg - r))
+
+    g2 = g - gn * (gb - (fb - sb)) - cf * h(rf, pf) + cs * h(rs, ps)
+    return f2, s2, f2 - s2, g2
+
+
+def _triple(p: dict) -> Tuple[int, int, int]:
+    return p["TREND_EMA_FAST"], p["TREND_EMA_SLOW"], p["MACD_SIGNAL"]
+
+
+def _revert_key(p: dict) -> tuple:
+    return (p["REVERT_RSI_PERIOD"], p["REVERT_RSI_OVERSOLD"], p["REVERT_RSI_OVERBOUGHT"],
+            p["BOLL_WINDOW"], p["BOLL_STDDEV"])
+
+
+# ---------- 訊號 ----------
+def _crosses(a1: np.ndarray, a2: np.ndarray, b1: np.ndarray, b2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """trend_decision 的交叉：第 i 根比較前一根（a1 / b1）與最新一根（a2 / b2），第 0 根沒有前一根。"""
+    up = (a1 <= b1) & (a2 > b2)
+    dn = (a1 >= b1) & (a2 < b2)
+    up[0] = dn[0] = False
+    return up, dn
+
+
+def trend_series(fam: Families, fast: int, slow: int, signal: int) -> np.ndarray:
+    """每根的 generate_trend_signal：1 = LONG、-1 = SHORT、0 = 無（LONG 優先）。"""
+    f1, f2, s1, s2, m1, m2, g1, g2 = fam.trend_lines(fast, slow, signal)
+    golden, dead = _crosses(f1, f2, s1, s2)
+    up, dn = _crosses(m1, m2, g1, g2)
+    return np.where(golden | up, 1, np.where(dead | dn, -1, 0)).astype(np.int8)
+
+
+def revert_series(fam: Families, period: int, oversold, overbought, window: int, k: float) -> np.ndarray:
+    """每根的 generate_revert_signal（revert_decision 的條件；NaN 的比較為 False）。"""
+    rsi = fam.rsi(period)
+    ma, sd = fam.boll(window)
+    upper = ma + k * sd
+    lower = ma - k * sd
+    c = fam.close
+    long_ = (c <= lower) & (rsi <= oversold)
+    short = (c >= upper) & (rsi >= overbought)
+    return np.where(long_, 1, np.where(short, -1, 0)).astype(np.int8)
+
+
+def pyramid_series(fam: Families, sig: np.ndarray, lookback: int) -> np.ndarray:
+    """有訊號的那根是否再加碼一次（should_pyramid：突破前 lookback 根高 / 低點）。"""
+    if not config.PYRAMID_BREAKOUT_ENABLED or config.MAX_PYRAMID <= 0:
+        return np.zeros(sig.size, dtype=bool)
+    hi, lo = fam.breakout(lookback)
+    return ((sig == 1) & (fam.close > hi)) | ((sig == -1) & (fam.close < lo))
+
+
+# ---------- 成交模擬 ----------
+def _order_qty(sim: SimClient, ratio: float, leverage: int) -> float:
+    """RiskManager._size / _qty_for 在 SimClient 上的結果（無餘額快照：available = equity）。"""
+    equity = max(sim.equity(), 0.0)
+    price = sim.price
+    if not price or price <= 0 or equity <= 0:
+        return 0.0
+    margin = min(equity * ratio, equity)
+    if margin <= 0:
+        return 0.0
+    prec = sim.precision
+    u = prec.floor_qty(margin * leverage / price)
+    if u <= 0 or (prec.min_notional and not prec.notional_ok(u, prec.round_price(price) or 0)):
+        return 0.0
+    # open_long / open_short 對 qty_str(u) 再量化仍是 u
+    return prec.qty_float(u)
+
+
+def _mark(sim: SimClient, close: np.ndarray, curve: np.ndarray, a: int, b: int) -> bool:
+    """[a, b) 之間部位不變，權益一次算完（與 SimClient.equity 同一算式）；爆倉回傳 True。"""
+    if a >= b:
+        return False
+    seg = sim.cash + sim.qty * (close[a:b] - sim.entry) if sim.qty else np.full(b - a, sim.cash + 0.0)
+    bad = np.flatnonzero(seg <= 0)
+    if bad.size:
+        curve[a:a + bad[0]] = seg[:bad[0]]
+        curve[a + bad[0]:] = 0.0
+        return True
+    curve[a:b] = seg
+    return False
+
+
+def simulate(symbol: str, bars, sig: np.ndarray, pyr: np.ndarray) -> Tuple[SimClient, np.ndarray]:
+    """只在有訊號的 K 線下單，結果等同 replay（訊號、加碼、拒單、爆倉的處理順序都相同）。"""
+    sim = SimClient(symbol, bars)
+    close = np.ascontiguousarray(bars.close, dtype=np.float64)
+    curve = np.empty(close.size, dtype=np.float64)
+    ratio, leverage = float(config.EQUITY_RATIO), config.LEVERAGE
+    last = 0
+    for i in np.flatnonzero(sig).tolist():
+        if _mark(sim, close, curve, last, i):
+            return sim, curve
+        sim.i = i
+        side = 1.0 if sig[i] > 0 else -1.0
+        for _ in range(2 if pyr[i] else 1):
+            q = _order_qty(sim, ratio, leverage)
+            if q:
+                sim._fill(side * q)
+        curve[i] = sim.equity()
+        if curve[i] <= 0:
+            curve[i:] = 0.0
+            return sim, curve
+        last = i + 1
+    _mark(sim, close, curve, last, close.size)
+    return sim, curve
+
+
+# ---------- worker ----------
+_CACHE: Dict[str, Families] = {}
+
+
+def _families(path: str) -> Families:
+    """同一 process 依序處理同一檔案的多個 chunk 時沿用指標族；換檔就丟掉舊的。"""
+    fam = _CACHE.get(path)
+    if fam is None:
+        _CACHE.clear()
+        fam = _CACHE[path] = Families(load(path))
+    return fam
+
+
+def run_chunk(path: str, combos: List[Tuple[int, dict]]) -> List[Tuple[int, dict]]:
+    """一個檔案 × 一批組合，回傳 [(組合編號, summary)]。"""
+    fam = _families(path)
+    symbol = symbol_interval(path)[0]
+    start = float(config.BACKTEST_EQUITY)
+    fam.prepare([p for _, p in combos])
+    trends: Dict[tuple, np.ndarray] = {}
+    reverts: Dict[tuple, np.ndarray] = {}
+    out = []
+    for idx, p in combos:
+        t = _triple(p)
+        if t not in trends:
+            trends[t] = trend_series(fam, *t)
+        r = _revert_key(p)
+        if r not in reverts:
+            reverts[r] = revert_series(fam, *r)
+        sig = np.where(trends[t] != 0, trends[t], reverts[r])
+        sig[:warmup_bars(p)] = 0
+        sim, curve = simulate(symbol, fam.bars, sig, pyramid_series(fam, sig, p["PYRAMID_BREAKOUT_LOOKBACK"]))
+        s = summarize(sim, curve, start)
+        s["wins"] = sum(1 for tr in sim.trades if tr["realized"] > 0)
+        out.append((idx, s))
+    return out
+
+
+# ---------- 彙總 ----------
+def _aggregate(params: dict, per_file: List[dict]) -> dict:
+    closing = sum(s["closing_trades"] for s in per_file)
+    wins = sum(s["wins"] for s in per_file)
+    ret = sum(s["return_pct"] for s in per_file) / len(per_file)
+    dd = max(s["max_drawdown_pct"] for s in per_file)
+    row = dict(params)
+    row.update({
+        "pnl": round(sum(s["pnl"] for s in per_file), 4),
+        "return_pct": round(ret, 3),
+        "max_drawdown_pct": dd,
+        "calmar": round(ret / dd, 4) if dd > 0 else 0.0,
+        "trades": sum(s["trades"] for s in per_file),
+        "closing_trades": closing,
+        "win_rate_pct": round(100.0 * wins / closing, 2) if closing else 0.0,
+        "fees": round(sum(s["fees"] for s in per_file), 4),
+        "rejected": sum(s["rejected"] for s in per_file),
+    })
+    return row
+
+
+def sweep(paths: List[str], grid: Dict[str, list], workers: int = None, rank: str = "pnl",
+          chunk: int = 0) -> List[dict]:
+    """
+    回傳依 rank 由高到低排序的組合清單（每筆含參數、跨檔案彙總與 per_file 明細）。
+    工作單位 = 一個檔案 × 一批組合；同一批依 (fast, slow, signal) 排序，盡量共用趨勢訊號。
+    """
+    if rank not in RANK_KEYS:
+        raise ValueError(f"rank must be one of {RANK_KEYS}")
+    combos = expand(grid)
+    if not combos or not paths:
+        return []
+    order = sorted(range(len(combos)), key=lambda i: (_triple(combos[i]), _revert_key(combos[i])))
+    workers = workers or os.cpu_count() or 1
+    size = chunk or max(1, -(-len(order) // max(1, 4 * workers // len(paths))))
+    tasks = [(path, [(i, combos[i]) for i in order[k:k + size]])
+             for path in paths for k in range(0, len(order), size)]
+
+    if workers <= 1 or len(tasks) <= 1:
+        parts = [run_chunk(path, batch) for path, batch in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            parts = list(ex.map(run_chunk, *zip(*tasks)))
+
+    per_file: Dict[int, List[dict]] = {i: [] for i in range(len(combos))}
+    for part in parts:
+        for idx, s in part:
+            per_file[idx].append(s)
+    rows = []
+    for i, p in enumerate(combos):
+        row = _aggregate(p, per_file[i])
+        row["per_file"] = per_file[i]
+        rows.append(row)
+    rows.sort(key=lambda r: r[rank], reverse=True)
+    for k, r in enumerate(rows, 1):
+        r["rank"] = k
+    return rows
+
+
+def verify(paths: List[str], rows: List[dict], n: int) -> List[dict]:
+    """前 n 名的組合實際跑 replay，逐欄比對 summary；回傳不一致的項目。"""
+    bad = []
+    for r in rows[:n]:
+        with override({k: r[k] for k in PARAMS}):
+            ref = [run_file(p)["summary"] for p in paths]
+        for path, got, want in zip(paths, r["per_file"], ref):
+            got = {k: v for k, v in got.items() if k != "wins"}
+            if got != want:
+                bad.append({"rank": r["rank"], "file": path, "sweep": got, "replay": want})
+    return bad
+
+
+def write_results(rows: List[dict], out_dir: str, top: int = 20, meta: dict = None) -> dict:
+    """sweep_results.csv：全部組合（已排名）；sweep_top.json：前 top 名含每個檔案的明細。"""
+    os.makedirs(out_dir, exist_ok=True)
+    fields = ["rank", *PARAMS, "pnl", "return_pct", "max_drawdown_pct", "calmar", "trades",
+              "closing_trades", "win_rate_pct", "fees", "rejected"]
+    with open(os.path.join(out_dir, "sweep_results.csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows)
+    best = [{k: v for k, v in r.items()} for r in rows[:top]]
+    with open(os.path.join(out_dir, "sweep_top.json"), "w", encoding="utf-8") as f:
+        json.dump({"meta": meta or {}, "top": best}, f, indent=2)
+    return {"combos": len(rows), "best": {k: v for k, v in rows[0].items() if k != "per_file"} if rows else None}
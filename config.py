@@ -14,25 +14,87 @@ if not API_KEY or not API_SECRET:
     print("[ERROR] 請設定 API_KEY / API_SECRET（或 BINANCE_API_KEY / BINANCE_API_SECRET）")
     sys.exit(1)
 
-# 掃描頻率（秒）
+# REST 傳輸層：executor（UMFutures + 執行緒池）或 aiohttp（原生 async、keep-alive 連線池）
+BINANCE_TRANSPORT = os.getenv("BINANCE_TRANSPORT", "executor").lower()
+BINANCE_BASE_URL = os.getenv("BINANCE_BASE_URL", "")   # 留空 = 依 TESTNET 自動選擇
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+
+# 交易所限流（USDT-M 預設值）；ORDER_WEIGHT_RESERVE = 保留給下單的 weight 比例
+BINANCE_WEIGHT_LIMIT = int(os.getenv("BINANCE_WEIGHT_LIMIT", "2400"))
+BINANCE_ORDER_LIMIT_10S = int(os.getenv("BINANCE_ORDER_LIMIT_10S", "300"))
+BINANCE_ORDER_LIMIT_1M = int(os.getenv("BINANCE_ORDER_LIMIT_1M", "1200"))
+ORDER_WEIGHT_RESERVE = float(os.getenv("ORDER_WEIGHT_RESERVE", "0.1"))
+
+# 掃描頻率（秒）；SCHEDULER_MODE=interval 時使用
 SCAN_INTERVAL = int(os.getenv("SCAN_INTERVAL", "60"))
 
+# 排程：candle = 對齊交易所 K 線收盤（engine/scheduler.py）；interval = 每 SCAN_INTERVAL 秒掃一次
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "candle").lower()
+CANDLE_CLOSE_DELAY_MS = int(os.getenv("CANDLE_CLOSE_DELAY_MS", "1500"))   # 收盤後等交易所資料更新
+CANDLE_RETRY_MS = int(os.getenv("CANDLE_RETRY_MS", "1000"))               # 尚未收盤的 symbol 補評估間隔
+CANDLE_READY_GRACE = float(os.getenv("CANDLE_READY_GRACE", "15"))         # 超過此秒數仍未收盤就放棄這根
+SERVER_TIME_SYNC = float(os.getenv("SERVER_TIME_SYNC", "600"))            # 伺服器時差校正週期（秒）
+
+# 多 process 分片掃描（engine/shards.py）：SHARD_WORKERS > 1 時 symbol 分給多個 worker 評估，
+# 主 process 只做 shortlist 與下單 gateway（RiskManager / 持倉 / 出場引擎），限流額度共用
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "1"))
+SHARD_BATCH_WAIT_MS = int(os.getenv("SHARD_BATCH_WAIT_MS", "250"))    # gateway 等齊各 shard 同一輪意圖的上限
+SHARD_STALE_S = float(os.getenv("SHARD_STALE_S", "30"))               # 心跳超過此秒數視為卡住並重啟
+SHARD_HEALTH_INTERVAL = float(os.getenv("SHARD_HEALTH_INTERVAL", "10"))
+# 共享限流鎖的等待上限（秒）：被終止的 worker 若持鎖，其它 process 逾時後先以本地計數限流，由 coordinator 釋放
+SHARD_LOCK_TIMEOUT_S = float(os.getenv("SHARD_LOCK_TIMEOUT_S", "0.5"))
+
+# 每輪 symbol 管線（engine/pipeline.py）：同時評估的 symbol 數上限；每輪截止秒數，逾時的 symbol 取消並回報
+# （0 = 本輪預算：candle 模式為最短 K 線週期、interval 模式為 SCAN_INTERVAL）
+PIPELINE_CONCURRENCY = int(os.getenv("PIPELINE_CONCURRENCY", "32"))
+SYMBOL_DEADLINE_S = float(os.getenv("SYMBOL_DEADLINE_S", "0"))
+
 # 交易池（保留你之前部署時觀察到的幾個幣對）
 SYMBOL_POOL: List[str] = [
     "BTCUSDT","ETHUSDT","SOLUSDT","XRPUSDT","ADAUSDT",
     "DOGEUSDT","1000PEPEUSDT"
 ]
 
+# 掃描範圍：pool = 只看 SYMBOL_POOL；all = 全部 USDT 永續（扣除 SYMBOL_DENYLIST）
+SYMBOL_UNIVERSE = os.getenv("SYMBOL_UNIVERSE", "pool").lower()
+SYMBOL_DENYLIST: List[str] = [
+    s.strip().upper() for s in os.getenv("SYMBOL_DENYLIST", "").split(",") if s.strip()
+]
+SHORTLIST_MAX = int(os.getenv("SHORTLIST_MAX", str(len(SYMBOL_POOL))))
+
 # 風控參數（依你原本的命名）
 EQUITY_RATIO = float(os.getenv("EQUITY_RATIO", "0.02"))      # 單筆資金使用比例
 LEVERAGE = int(os.getenv("LEVERAGE", "30"))                    # 槓桿
 MAX_PYRAMID = int(os.getenv("MAX_PYRAMID", "8"))              # 允許加碼層數
 TRAILING_GIVEBACK_PCT = float(os.getenv("TRAILING_GIVEBACK_PCT", "0.20"))  # 從高點回落%
 MAX_LOSS_PCT = float(os.getenv("MAX_LOSS_PCT", "0.30"))       # 單筆最大虧損%
+TRAILING_ACTIVATION_PCT = float(os.getenv("TRAILING_ACTIVATION_PCT", "0.10"))  # 利潤%達此值才啟動追蹤停利
+# 以上百分比皆為保證金報酬率（已乘槓桿）；出場引擎依標記價格逐 tick 檢查
+EXIT_ENGINE_ENABLED = os.getenv("EXIT_ENGINE_ENABLED", "true").lower() in ("1", "true", "yes")
 
 # K 線與指標
 KLINE_INTERVAL = os.getenv("KLINE_INTERVAL", "5m")
 KLINE_LIMIT = int(os.getenv("KLINE_LIMIT", "200"))
+# K 線快取：ring buffer 長度與同一輪快照的最長有效秒數
+KLINE_CACHE_ENABLED = os.getenv("KLINE_CACHE_ENABLED", "true").lower() in ("1","true","yes")
+KLINE_BUFFER_SIZE = int(os.getenv("KLINE_BUFFER_SIZE", str(KLINE_LIMIT)))
+KLINE_CACHE_TTL = float(os.getenv("KLINE_CACHE_TTL", "15"))
+# K 線持久化目錄（exchange/kline_store.py）：重啟時從本地檔案還原、只補缺口；留空 = 不落地
+KLINE_STORE_DIR = os.getenv("KLINE_STORE_DIR", "")
+
+# 多週期：只維護一條 base（1m）K 線，較高週期在本地合成（exchange/bar_aggregator.py）
+RESAMPLE_ENABLED = os.getenv("RESAMPLE_ENABLED", "false").lower() in ("1","true","yes")
+RESAMPLE_BASE_INTERVAL = os.getenv("RESAMPLE_BASE_INTERVAL", "1m")
+RESAMPLE_MAX_INTERVAL = os.getenv("RESAMPLE_MAX_INTERVAL", "4h")   # base buffer 至少涵蓋兩根此週期
+# 趨勢確認週期（例如 15m / 1h）：趨勢訊號需與該週期已收盤 K 線的 EMA 方向一致；留空 = 不確認
+TREND_CONFIRM_INTERVAL = os.getenv("TREND_CONFIRM_INTERVAL", "")
+
+# 指標計算：true = O(1) 增量狀態（strategies/indicators.py），false = 每次以 pandas 重算
+INCREMENTAL_INDICATORS = os.getenv("INCREMENTAL_INDICATORS", "true").lower() in ("1","true","yes")
+
+# 批次評估：所有候選幣疊成矩陣一次以 NumPy 計算（strategies/batch.py）
+BATCH_EVAL = os.getenv("BATCH_EVAL", "false").lower() in ("1","true","yes")
 
 # 趨勢策略參數（保留 EMA+MACD）
 TREND_EMA_FAST = int(os.getenv("TREND_EMA_FAST", "12"))
@@ -54,7 +116,48 @@ PYRAMID_BREAKOUT_LOOKBACK = int(os.getenv("PYRAMID_BREAKOUT_LOOKBACK", "20"))
 VOLUME_MIN_USD = float(os.getenv("VOLUME_MIN_USD", "3000000"))   # 24h quote volume 門檻
 FUNDING_RATE_MIN = float(os.getenv("FUNDING_RATE_MIN", "-0.03"))    # 預設極小，等同關閉門檻
 
+# 行情來源：rest（輪詢）或 ws（WebSocket 串流，斷線時以 REST 補缺口）
+MARKET_DATA_MODE = os.getenv("MARKET_DATA_MODE", "rest").lower()
+WS_BASE_URL = os.getenv(
+    "WS_BASE_URL",
+    "wss://stream.binancefuture.com" if TESTNET else "wss://fstream.binance.com"
+)
+WS_RECONNECT_DELAY = float(os.getenv("WS_RECONNECT_DELAY", "1"))
+
+# 帳戶 user data stream（listenKey）：即時持倉 / 成交；listenKey 60 分鐘過期，預設 30 分鐘續期
+USER_STREAM_ENABLED = os.getenv("USER_STREAM_ENABLED", "true").lower() in ("1", "true", "yes")
+USER_STREAM_URL = os.getenv("USER_STREAM_URL", WS_BASE_URL)
+LISTEN_KEY_KEEPALIVE = float(os.getenv("LISTEN_KEY_KEEPALIVE", "1800"))
+
+# 交易對資訊（exchange_info）快取刷新週期（秒）
+SYMBOL_INFO_TTL = int(os.getenv("SYMBOL_INFO_TTL", "3600"))
+
+# 帳戶快照快取：balance / 可用保證金與下單價格的有效秒數（成交後立即失效）
+ACCOUNT_CACHE_TTL = float(os.getenv("ACCOUNT_CACHE_TTL", "5"))
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "1"))
+
+# 回測（backtest/）：每個 symbol 的起始資金與 taker 手續費率
+BACKTEST_EQUITY = float(os.getenv("BACKTEST_EQUITY", "1000"))
+BACKTEST_FEE_RATE = float(os.getenv("BACKTEST_FEE_RATE", "0.0004"))
+
+# 監控：延遲直方圖 / 計數器，/metrics（Prometheus 格式）與定期摘要
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1","true","yes")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")   # 預設只綁本機；要讓外部抓取才設 0.0.0.0
+METRICS_SUMMARY_INTERVAL = float(os.getenv("METRICS_SUMMARY_INTERVAL", "300"))
+
 # 其它
 DEBUG_MODE = os.getenv("DEBUG_MODE", "true").lower() in ("1","true","yes")
 
+# 日誌（monitor/log.py）：背景 thread 寫出，LOG_FORMAT=text（與原本 print 相同）或 json（每行一筆）
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG_MODE else "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_FILE = os.getenv("LOG_FILE", "")                                  # 空字串 = stdout
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "100000"))             # 排隊上限，超過即丟棄並計數
+LOG_RATE_WINDOW_S = float(os.getenv("LOG_RATE_WINDOW_S", "60"))       # 重複訊息（如 [SKIP]）的限流視窗
+LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", "20"))               # 每個視窗同一 tag 最多輸出筆數
+
+# 交易日誌（monitor/journal.py）：訊號 / 下單數量 / 下單請求 / 交易所回應，append-only JSONL；空字串 = 關閉
+TRADE_JOURNAL = os.getenv("TRADE_JOURNAL", "journal/trades.jsonl")
+
 print("=================================")
@@ -1,30 +1,55 @@
 # engine/hedge_engine.py
 import asyncio
+
+import config
+from engine.pipeline import SymbolPipeline
+from monitor import journal, log
 from strategies.filter import filter_symbols  # 原本就存在的輕量版篩選
 from strategies.trend import generate_trend_signal, should_pyramid
 from strategies.revert import generate_revert_signal
 
 class HedgeEngine:
-    def __init__(self, client, risk_mgr):
+    def __init__(self, client, risk_mgr, max_candidates: int = 10, pipeline: SymbolPipeline = None):
         self.client = client
         self.risk_mgr = risk_mgr
+        self.max_candidates = max_candidates
+        self.pipeline = pipeline or SymbolPipeline(name="engine")
 
-    async def run(self):
-        print("[Engine] Running scan...")
-        symbols = await filter_symbols(self.client)
-        print(f"[Engine] Filtered: {symbols}")
+    async def _evaluate(self, symbol, track):
+        """單一 symbol 的訊號（trend / revert 並行，共用同一份 K 線快取）；回傳 (symbol, signal, 是否加碼) 或 None。"""
+        try:
+            track("signals")
+            trend_sig, revert_sig = await asyncio.gather(
+                generate_trend_signal(self.client, symbol), generate_revert_signal(self.client, symbol)
+            )
+            signal = trend_sig or revert_sig
+            if not signal:
+                log.debug("NO SIGNAL", "%s no entry", symbol, rate=True)
+                return None
+            log.info("SIGNAL", "%s -> %s", symbol, signal)
+            journal.record("signal", symbol=symbol, side=signal, source="engine")
+            track("pyramid")
+            return symbol, signal, await should_pyramid(self.client, symbol, side_long=(signal=="LONG"))
+        except Exception as e:
+            log.error("Engine", "error %s: %s", symbol, e, exc=e)
+            return None
+
+    async def _order(self, symbol, signal, pyramid):
+        try:
+            await self.risk_mgr.execute_trade(symbol, signal)
+            if pyramid:
+                await self.risk_mgr.execute_trade(symbol, signal)
+        except Exception as e:
+            log.error("Engine", "error %s: %s", symbol, e, exc=e)
 
-        for symbol in symbols:
-            try:
-                trend_sig = await generate_trend_signal(self.client, symbol)
-                revert_sig = await generate_revert_signal(self.client, symbol)
-                signal = trend_sig or revert_sig
-                if signal:
-                    print(f"[SIGNAL] {symbol} -> {signal}")
-                    await self.risk_mgr.execute_trade(symbol, signal)
-                    if await should_pyramid(self.client, symbol, side_long=(signal=="LONG")):
-                        await self.risk_mgr.execute_trade(symbol, signal)
-                else:
-                    print(f"[NO SIGNAL] {symbol} no entry")
-            except Exception as e:
-                print(f"[Engine] error {symbol}: {e}")
+    async def _execute(self, orders):
+        # 不同 symbol 並行下單（RiskManager 以預留保證金避免超額配置）；同一 symbol 先進場再加碼
+        await asyncio.gather(*(self._order(*o) for o in orders))
+
+    async def run(self):
+        log.info("Engine", "Running scan...")
+        self.client.klines.new_cycle()
+        symbols = await filter_symbols(self.client, max_candidates=self.max_candidates)
+        log.info("Engine", "Filtered: %s", symbols)
+        # 評估以有上限的並行執行，有訊號就先下單；逾時的 symbol 取消並回報
+        await self.pipeline.run(symbols, self._evaluate, submit=self._execute, budget_s=config.SCAN_INTERVAL)
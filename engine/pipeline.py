@@ -0,0 +1,121 @@
+# engine/pipeline.py
+"""
+每輪 symbol 的管線執行器（main.scanner / 分片 worker / HedgeEngine 共用）：
+- 評估階段（K 線、trend / revert、加碼判斷）以 Semaphore 限制同時進行的 symbol 數（PIPELINE_CONCURRENCY）
+- 本輪有截止時間（SYMBOL_DEADLINE_S，0 = 呼叫端給的週期預算）：時間到仍在排隊或評估中的 symbol 一律取消，
+  並回報各自卡在哪個階段
+- 下單優先：某個 symbol 一產生意圖就交給 OrderLane，不等其它 symbol；排隊中的意圖合併成一批送出，
+  下單不受截止時間取消，限流器也會讓下單先於行情請求
+整輪耗時 ≈ 最慢的那個 symbol（或截止時間）+ 最後一批下單，而不是所有 symbol 的總和。
+"""
+import asyncio
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import config
+from monitor import log, metrics
+
+Track = Callable[[str], None]
+
+
+class OrderLane:
+    """下單通道：意圖一產生就排入，背景 task 把排隊中的全部合併成一批交給 submit（同時只有一批在途）。"""
+
+    def __init__(self, submit: Callable[[list], Awaitable]):
+        self.submit = submit
+        self.queue: list = []
+        self.batches = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def put(self, item):
+        self.queue.append(item)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.queue:
+            batch, self.queue = self.queue, []
+            self.batches += 1
+            try:
+                await self.submit(batch)
+            except Exception as e:
+                log.error("PIPELINE", "submit error: %s", e, exc=e)
+
+    async def drain(self):
+        """等到排隊中的意圖都送出；呼叫端被取消時下單仍會做完。"""
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+
+class SymbolPipeline:
+    """
+    run(symbols, work, submit) 評估一輪：work(symbol, track) 回傳下單意圖或 None，
+    track(stage) 標記目前階段（逾時回報用）。submit 為 None 時只收集意圖（分片 worker）。
+    """
+
+    def __init__(self, concurrency: int = None, deadline_s: float = None, name: str = "scan"):
+        self.concurrency = max(1, concurrency or config.PIPELINE_CONCURRENCY)
+        self.deadline_s = config.SYMBOL_DEADLINE_S if deadline_s is None else deadline_s
+        self.name = name
+        self.durations: Dict[str, float] = {}
+        self.timed_out: Dict[str, str] = {}
+
+    async def run(self, symbols: Iterable[str], work: Callable[[str, Track], Awaitable[Any]],
+                  submit: Callable[[list], Awaitable] = None, budget_s: float = None,
+                  durations: Dict[str, float] = None) -> List[Any]:
+        symbols = list(dict.fromkeys(symbols))
+        self.durations = durations if durations is not None else {}
+        self.timed_out = {}
+        if not symbols:
+            return []
+        sem = asyncio.Semaphore(self.concurrency)
+        lane = OrderLane(submit) if submit is not None else None
+        stage = {s: "queued" for s in symbols}
+        results: List[Any] = []
+        t_cycle = time.perf_counter()
+
+        async def one(symbol: str):
+            async with sem:
+                t0 = time.perf_counter()
+                stage[symbol] = "start"
+                try:
+                    res = await work(symbol, partial(stage.__setitem__, symbol))
+                finally:
+                    self.durations[symbol] = time.perf_counter() - t0
+                    metrics.observe("manage_symbol_ms", self.durations[symbol] * 1000)
+            stage[symbol] = "done"
+            if res:
+                results.append(res)
+                if lane is not None:
+                    lane.put(res)
+
+        tasks = {asyncio.create_task(one(s)): s for s in symbols}
+        deadline = self.deadline_s or budget_s or None
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=deadline)
+            for t in done:
+                if not t.cancelled() and t.exception() is not None:
+                    log.error("PIPELINE", "%s error: %s", tasks[t], t.exception(), exc=t.exception())
+            if pending:
+                for t in pending:
+                    t.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                late = {tasks[t]: stage[tasks[t]] for t in pending if stage[tasks[t]] != "done"}
+                if late:
+                    self._report(deadline, late)
+        finally:
+            for t in tasks:
+                t.cancel()
+            if lane is not None:
+                await lane.drain()
+        metrics.observe(f"{self.name}_pipeline_ms", (time.perf_counter() - t_cycle) * 1000)
+        return results
+
+    def _report(self, deadline: float, late: Dict[str, str]):
+        self.timed_out = late
+        for st in late.values():
+            metrics.inc("symbol_deadline_total", stage=st)
+        detail = ", ".join(f"{s}({st})" for s, st in list(late.items())[:10])
+        more = f" +{len(late) - 10}" if len(late) > 10 else ""
+        log.warning("DEADLINE", "%s: %d symbols cancelled after %.1fs: %s%s", self.name, len(late), deadline, detail, more)
@@ -0,0 +1,272 @@
+# engine/scheduler.py
+import asyncio
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import config
+from exchange.kline_cache import interval_ms
+from monitor import log, metrics
+
+# WebSocket 收盤 frame 喚醒後再等一小段，讓同一個邊界的其它 symbol 一起進來
+_WS_COALESCE_MS = 200
+
+
+class ServerClock:
+    """
+    交易所時間：以 /fapi/v1/time 估算本機與伺服器的時差（取請求來回的中點），
+    背景每 SERVER_TIME_SYNC 秒校正一次；K 線收盤邊界一律以伺服器時間計算。
+    """
+
+    def __init__(self, client, resync: float = None):
+        self.client = client
+        self.resync = resync if resync is not None else config.SERVER_TIME_SYNC
+        self.offset_ms = 0.0
+        self.rtt_ms = 0.0
+        self.synced = False
+        self._task: Optional[asyncio.Task] = None
+
+    def now_ms(self) -> int:
+        return int(time.time() * 1000 + self.offset_ms)
+
+    async def sync(self) -> float:
+        t0 = time.time()
+        server = await self.client.server_time()
+        t1 = time.time()
+        self.rtt_ms = (t1 - t0) * 1000
+        self.offset_ms = server - (t0 + t1) * 500
+        self.synced = True
+        metrics.gauge("server_time_offset_ms", self.offset_ms)
+        return self.offset_ms
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._resync_loop())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _resync_loop(self):
+        while True:
+            await asyncio.sleep(max(1.0, self.resync))
+            try:
+                await self.sync()
+            except Exception as e:
+                log.warning("CLOCK", "sync error: %s", e)
+
+
+@dataclass
+class Due:
+    """
+    一個到期的收盤工作。boundary = 新 K 線的開盤時間（即上一根剛收盤）；
+    skipped = 因上一輪超時而合併掉的收盤數；retry = 只補評估上次還沒收盤的 symbol。
+    """
+    interval: str
+    boundary: int
+    priority: int = 0
+    skipped: int = 0
+    retry: bool = False
+
+
+class _Job:
+    __slots__ = ("interval", "step", "priority", "boundary")
+
+    def __init__(self, interval: str, step: int, priority: int):
+        self.interval = interval
+        self.step = step
+        self.priority = priority
+        self.boundary = 0      # 下一個要評估的收盤邊界
+
+
+class CandleScheduler:
+    """
+    K 線收盤對齊的排程器（取代固定 SCAN_INTERVAL 的 sleep 迴圈）：
+    - 每個 interval 一個工作，到期時間 = 伺服器時間的收盤邊界 + CANDLE_CLOSE_DELAY_MS，
+      放在 heap 依 (到期時間, 優先序) 排序；同時到期的工作一次取出
+    - collect() 只留下該根 K 線確實已收盤、且這根還沒評估過的 symbol；
+      交易所資料還沒更新的 symbol 每 CANDLE_RETRY_MS 補一次，超過 CANDLE_READY_GRACE 秒放棄
+    - 上一輪超時跨過多個收盤時只評估最新一根，略過的根數計入 scheduler_skipped_bars_total
+    - WebSocket 模式下收盤 frame 會提早喚醒，不必等滿 CANDLE_CLOSE_DELAY_MS
+    """
+
+    def __init__(self, client, delay_ms: int = None, retry_ms: int = None, grace: float = None):
+        self.client = client
+        self.clock = ServerClock(client)
+        # 策略依同一個時鐘去掉未收盤的那根（strategies.klines.closed_klines）
+        client.clock = self.clock
+        self.delay_ms = config.CANDLE_CLOSE_DELAY_MS if delay_ms is None else delay_ms
+        self.retry_ms = config.CANDLE_RETRY_MS if retry_ms is None else retry_ms
+        self.grace_ms = int((config.CANDLE_READY_GRACE if grace is None else grace) * 1000)
+        self._jobs: Dict[str, _Job] = {}
+        # (到期 ms, 優先序, seq, interval, boundary, retry)；過時的項目在取出時略過
+        self._heap: List[Tuple[int, int, int, str, int, bool]] = []
+        self._seq = 0
+        self._done: Dict[Tuple[str, str], int] = {}     # (symbol, interval) -> 最後評估的 boundary
+        self._closed: Dict[Tuple[str, str], int] = {}   # (symbol, interval) -> WebSocket 回報收盤的 boundary
+        self._lag: Dict[str, Tuple[int, Set[str]]] = {}  # interval -> (boundary, 尚未收盤的 symbol)
+        self._retry_at: Dict[str, int] = {}
+
+    # ---------- jobs ----------
+    def add(self, interval: str, priority: int = None):
+        """註冊一個 interval；priority 越小越先處理（預設依註冊順序）。"""
+        if interval in self._jobs:
+            return self._jobs[interval]
+        step = interval_ms(interval)
+        if not step:
+            raise ValueError(f"unsupported interval: {interval}")
+        job = self._jobs[interval] = _Job(interval, step, len(self._jobs) if priority is None else priority)
+        self._seed(job)
+        return job
+
+    def intervals(self) -> List[str]:
+        return list(self._jobs)
+
+    def budget_s(self) -> float:
+        """一輪可用的時間：最短 interval 的長度（超過即為 overrun）。"""
+        return min((j.step for j in self._jobs.values()), default=0) / 1000
+
+    async def start(self):
+        """校正伺服器時間後重排所有工作，並啟動背景校正。"""
+        try:
+            off = await self.clock.sync()
+            log.info("SCHED", "server time offset %.0fms (rtt %.0fms)", off, self.clock.rtt_ms)
+        except Exception as e:
+            log.warning("SCHED", "server time sync error: %s", e)
+        self._heap.clear()
+        for job in self._jobs.values():
+            self._seed(job)
+        self.clock.start()
+
+    def _seed(self, job: _Job):
+        # 目前這根的開盤邊界：啟動後立刻評估最近一根已收盤的 K 線
+        now = self.clock.now_ms()
+        job.boundary = now // job.step * job.step
+        self._push(job.boundary + self.delay_ms, job, job.boundary)
+
+    def _push(self, due_ms: int, job: _Job, boundary: int, retry: bool = False):
+        self._seq += 1
+        heapq.heappush(self._heap, (int(due_ms), job.priority, self._seq, job.interval, boundary, retry))
+
+    # ---------- wait ----------
+    async def next_due(self, stream=None) -> List[Due]:
+        """等到下一批到期工作（依優先序排列）；stream 為 MarketStream 時收盤 frame 可提早喚醒。"""
+        while True:
+            now = self.clock.now_ms()
+            if self._heap and self._heap[0][0] <= now:
+                dues = self._pop_due(now)
+                if dues:
+                    return dues
+                continue
+            timeout = (self._heap[0][0] - now) / 1000 if self._heap else 60.0
+            if stream is None:
+                await asyncio.sleep(timeout)
+                continue
+            try:
+                await asyncio.wait_for(stream.bar_closed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                continue
+            self._on_closed(stream.interval, stream.take_closed())
+
+    def _on_closed(self, interval: str, symbols: Iterable[str]):
+        job = self._jobs.get(interval)
+        if job is None:
+            return
+        now = self.clock.now_ms()
+        b = now // job.step * job.step
+        for s in symbols:
+            self._closed[(s, interval)] = b
+        if job.boundary <= b:
+            self._push(now + _WS_COALESCE_MS, job, job.boundary)
+        elif interval in self._lag and self._lag[interval][0] == b:
+            self._schedule_retry(job, b, now + _WS_COALESCE_MS)
+
+    def _pop_due(self, now: int) -> List[Due]:
+        out: Dict[str, Due] = {}
+        while self._heap and self._heap[0][0] <= now:
+            due_ms, prio, _, interval, boundary, retry = heapq.heappop(self._heap)
+            job = self._jobs[interval]
+            if retry:
+                lag = self._lag.get(interval)
+                if self._retry_at.get(interval) != due_ms or not lag or lag[0] != boundary:
+                    continue
+                self._retry_at.pop(interval, None)
+                out.setdefault(interval, Due(interval, boundary, prio, retry=True))
+                continue
+            if boundary != job.boundary:
+                continue   # 已被收盤 frame 提早處理
+            # 超時跨過多根：只評估已過延遲的最新一根，其餘合併略過
+            latest = max(boundary, (now - self.delay_ms) // job.step * job.step)
+            skipped = (latest - boundary) // job.step
+            job.boundary = latest + job.step
+            self._push(job.boundary + self.delay_ms, job, job.boundary)
+            if skipped:
+                metrics.inc("scheduler_skipped_bars_total", skipped, interval=interval)
+                log.warning("SCHED", "%s overrun: coalesced %d missed close(s)", interval, skipped)
+            # 新的收盤取代尚未補完的舊工作
+            self._lag.pop(interval, None)
+            self._retry_at.pop(interval, None)
+            out[interval] = Due(interval, latest, prio, skipped)
+        return sorted(out.values(), key=lambda d: d.priority)
+
+    def _schedule_retry(self, job: _Job, boundary: int, at_ms: int):
+        cur = self._retry_at.get(job.interval)
+        if cur is not None and cur <= at_ms:
+            return
+        self._retry_at[job.interval] = int(at_ms)
+        self._push(at_ms, job, boundary, retry=True)
+
+    # ---------- symbols ----------
+    async def collect(self, symbols: Iterable[str], due: Due) -> List[str]:
+        """
+        回傳 due 這根 K 線已收盤、且尚未評估過的 symbol（會標記為已評估）。
+        判斷方式：最後一根的開盤時間 >= boundary，或 WebSocket 已回報收盤。
+        K 線經 client.get_klines 取得，同一輪的策略直接共用 KlineCache 快照。
+        """
+        iv, b = due.interval, due.boundary
+        if due.retry:
+            lag = self._lag.get(iv)
+            pending = lag[1] if lag and lag[0] == b else set()
+            symbols = [s for s in symbols if s in pending]
+        todo = [s for s in dict.fromkeys(symbols) if self._done.get((s, iv), -1) < b]
+        ready = {s for s in todo if self._closed.get((s, iv), -1) >= b}
+        need = [s for s in todo if s not in ready]
+        res = await asyncio.gather(
+            *(self.client.get_klines(s, interval=iv, limit=config.KLINE_LIMIT) for s in need),
+            return_exceptions=True
+        )
+        for s, kl in zip(need, res):
+            if not isinstance(kl, Exception) and kl and int(kl[-1][0]) >= b:
+                ready.add(s)
+
+        now = self.clock.now_ms()
+        if ready:
+            metrics.observe("candle_close_lag_ms", now - b, interval=iv)
+        for s in ready:
+            self._done[(s, iv)] = b
+        late = {s for s in todo if s not in ready}
+        if late:
+            if now < b + self.delay_ms + self.grace_ms:
+                self._lag[iv] = (b, late)
+                self._schedule_retry(self._jobs[iv], b, now + self.retry_ms)
+            else:
+                self._lag.pop(iv, None)
+                metrics.inc("scheduler_late_symbols_total", len(late), interval=iv)
+                log.warning("SCHED", "%s close %s: gave up on %d symbol(s) without a closed bar", iv, b, len(late))
+        return [s for s in todo if s in ready]
+
+    async def collect_all(self, symbols: Iterable[str], dues: List[Due]) -> List[str]:
+        """多個工作同時到期時依優先序合併成一份待評估清單（保留原順序、不重複）。"""
+        symbols = list(symbols)
+        out = {}
+        for d in dues:
+            for s in await self.collect(symbols, d):
+                out.setdefault(s, None)
+        return list(out)
@@ -0,0 +1,305 @@
+# engine/shards.py
+"""
+多 process 分片掃描（SHARD_WORKERS > 1）：
+- coordinator（主 process）依 symbol 的 crc32 固定分到 N 個 worker；shortlist 變動時只通知清單有變的 shard，
+  symbol 不會在 shard 間搬來搬去，各自的 K 線快取 / 指標狀態保持溫熱
+- worker 各有自己的 BinanceClient / KlineCache / MarketStream / CandleScheduler，只做行情與策略評估，
+  每輪把下單意圖送回 coordinator
+- coordinator 同時是唯一的下單 gateway：RiskManager、持倉、出場引擎只在主 process，sizing 與持倉判斷一致；
+  同一輪各 shard 的意圖等齊（最多 SHARD_BATCH_WAIT_MS）後一次送出
+- 所有 process 共用 SharedBudget 的 weight / order 額度，合計不超過帳戶上限
+- 每個 shard 回報心跳、event loop 延遲、週期時間與收盤延遲；process 結束或心跳逾時就重啟該 shard
+"""
+import asyncio
+import multiprocessing as mp
+import queue
+import signal
+import time
+import zlib
+from typing import Awaitable, Callable, List, Optional
+
+import config
+from exchange.rate_limiter import SharedBudget
+from monitor import log, metrics
+
+# 每個 shard 在共享 health 陣列中的欄位
+_BEAT, _LOOP_LAG_MS, _CYCLES, _CYCLE_MS, _LAG_MS, _SYMBOLS, _ERRORS = range(7)
+_H = 7
+
+
+def shard_of(symbol: str, n: int) -> int:
+    return zlib.crc32(symbol.encode()) % n if n > 1 else 0
+
+
+def partition(symbols, n: int) -> List[List[str]]:
+    parts = [[] for _ in range(n)]
+    for s in symbols:
+        parts[shard_of(s, n)].append(s)
+    return parts
+
+
+# ---------- worker process ----------
+def _exit_on_term(signum, frame):
+    # 在主 thread 拋出 SystemExit：with 區塊（含共享限流鎖）照常解開後才結束
+    raise SystemExit(0)
+
+
+def _worker_main(shard: int, symbols: List[str], budget: SharedBudget, control, out, health):
+    # 交易日誌只由 gateway 寫（regate 後的訊號 + 下單），worker 不寫同一個檔
+    config.TRADE_JOURNAL = ""
+    signal.signal(signal.SIGTERM, _exit_on_term)
+    try:
+        asyncio.run(_Worker(shard, symbols, budget, control, out, health).run())
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+
+class _Worker:
+    """單一 shard：行情 + 策略評估，意圖送回 gateway，不下單。"""
+
+    def __init__(self, shard, symbols, budget, control, out, health):
+        self.shard = shard
+        self.symbols = list(symbols)
+        self.budget = budget
+        self.control = control
+        self.out = out
+        self.health = health
+        self.base = shard * _H
+
+    def _set(self, field: int, value: float):
+        self.health[self.base + field] = value
+
+    def _poll_control(self):
+        """只取最新的一份清單（coordinator 每次都送完整清單）。"""
+        try:
+            while True:
+                self.symbols = list(self.control.get_nowait())
+        except queue.Empty:
+            pass
+        self._set(_SYMBOLS, len(self.symbols))
+
+    async def _heartbeat(self):
+        """每秒寫一次心跳；實際睡眠超過 1 秒的部分即 event loop 被占用的延遲。"""
+        while True:
+            t0 = time.monotonic()
+            await asyncio.sleep(1.0)
+            self._set(_LOOP_LAG_MS, max(0.0, (time.monotonic() - t0 - 1.0) * 1000))
+            self._set(_BEAT, time.time())
+            self._poll_control()
+
+    async def run(self):
+        # 延後匯入：main 匯入本模組
+        from engine.scheduler import CandleScheduler
+        from exchange.binance_client import BinanceClient
+        from exchange.market_stream import MarketStream
+        from exchange.rate_limiter import SharedWeightLimiter
+        from main import evaluate_targets
+
+        client = BinanceClient(config.API_KEY, config.API_SECRET, testnet=False,
+                               limiter=SharedWeightLimiter(self.budget, slot=self.shard + 1))
+        self._set(_BEAT, time.time())
+        self._poll_control()
+        asyncio.create_task(self._heartbeat())
+
+        sched = None
+        if config.SCHEDULER_MODE == "candle":
+            sched = CandleScheduler(client)
+            sched.add(config.KLINE_INTERVAL)
+            await sched.start()
+
+        cycles = errors = 0
+        while True:
+            dues = await sched.next_due(client.stream) if sched is not None else None
+            start = time.time()
+            client.klines.new_cycle()
+            symbols = self.symbols
+            if config.MARKET_DATA_MODE == "ws" and symbols:
+                if client.stream is None:
+                    client.stream = MarketStream(
+                        client, symbols, interval=client.bars.base if config.RESAMPLE_ENABLED else None
+                    )
+                    client.stream.start()
+                else:
+                    await client.stream.update_symbols(symbols)
+
+            intents = []
+            try:
+                targets = await sched.collect_all(symbols, dues) if dues is not None else symbols
+                budget = sched.budget_s() if sched is not None else config.SCAN_INTERVAL
+                intents = await evaluate_targets(client, targets, {}, budget_s=budget)
+            except Exception as e:
+                errors += 1
+                log.error(f"SHARD {self.shard}", "error: %s", e, exc=e)
+            self.out.put((self.shard, intents))
+
+            elapsed = time.time() - start
+            cycles += 1
+            self._set(_CYCLES, cycles)
+            self._set(_ERRORS, errors)
+            self._set(_CYCLE_MS, elapsed * 1000)
+            # 收盤延遲：K 線收盤（伺服器時間）到本輪評估完成；interval 模式記週期時間
+            self._set(_LAG_MS, sched.clock.now_ms() - max(d.boundary for d in dues)
+                      if dues else elapsed * 1000)
+            if sched is not None:
+                continue
+
+            wait = max(1, int(config.SCAN_INTERVAL - elapsed))
+            if client.stream is not None:
+                try:
+                    await asyncio.wait_for(client.stream.bar_closed.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                client.stream.take_closed()
+            else:
+                await asyncio.sleep(wait)
+
+
+# ---------- coordinator / gateway ----------
+class ShardCoordinator:
+    """
+    在主 process 管理 worker：分配 symbol、收集各 shard 的下單意圖交給 on_intents（唯一的下單入口），
+    並監控每個 shard 的健康狀態。
+    """
+
+    def __init__(self, budget: SharedBudget, on_intents: Callable[[list], Awaitable],
+                 workers: int = None, batch_wait_ms: int = None):
+        self.ctx = mp.get_context("spawn")
+        self.n = max(1, workers or config.SHARD_WORKERS)
+        if len(budget.waiting) < self.n + 1:
+            raise ValueError(f"SharedBudget has {len(budget.waiting)} slots, need {self.n + 1}")
+        self.budget = budget
+        self.on_intents = on_intents
+        self.batch_wait = (config.SHARD_BATCH_WAIT_MS if batch_wait_ms is None else batch_wait_ms) / 1000
+        self.out = self.ctx.Queue()
+        self.health_arr = self.ctx.RawArray("d", self.n * _H)
+        self._assigned: List[List[str]] = [[] for _ in range(self.n)]
+        self._control = [None] * self.n
+        self._procs: List[Optional[mp.Process]] = [None] * self.n
+        self._started_at = [0.0] * self.n
+        self.restarts = 0
+        self.started = False
+        self._tasks: List[asyncio.Task] = []
+
+    # ---------- workers ----------
+    def _spawn(self, i: int):
+        self._control[i] = self.ctx.Queue()
+        self.health_arr[i * _H + _BEAT] = 0.0
+        p = self.ctx.Process(
+            target=_worker_main, name=f"shard-{i}", daemon=True,
+            args=(i, self._assigned[i], self.budget, self._control[i], self.out, self.health_arr),
+        )
+        p.start()
+        self._procs[i] = p
+        self._started_at[i] = time.time()
+
+    def start(self):
+        for i in range(self.n):
+            self._spawn(i)
+        self._tasks = [asyncio.create_task(self._gateway()), asyncio.create_task(self._monitor())]
+        self.started = True
+        log.info("SHARD", "started %d workers", self.n)
+
+    def update(self, symbols):
+        """新的候選清單：只通知清單有變的 shard。"""
+        for i, part in enumerate(partition(symbols, self.n)):
+            if part != self._assigned[i]:
+                self._assigned[i] = part
+                if self._control[i] is not None:
+                    self._control[i].put(part)
+
+    def _kill(self, i: int):
+        """SIGTERM（worker 會解開持有的鎖再結束），沒反應再 SIGKILL；之後釋放死掉的 process 可能留下的共享鎖。"""
+        p = self._procs[i]
+        if p is not None and p.is_alive():
+            p.terminate()
+            p.join(timeout=5)
+            if p.is_alive():
+                p.kill()
+                p.join(timeout=1)
+        if self.budget.recover(slots=(i + 1,)):
+            metrics.inc("shared_budget_lock_recovered_total", shard=i)
+            log.warning("SHARD", "released shared budget lock held by dead shard %d", i)
+
+    def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        for p in self._procs:
+            if p is not None and p.is_alive():
+                p.terminate()
+        for p in self._procs:
+            if p is not None:
+                p.join(timeout=5)
+        self.started = False
+
+    # ---------- gateway ----------
+    def _get(self, timeout: float):
+        try:
+            return self.out.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def _gateway(self):
+        """等到第一個 shard 的意圖後，再等其它 shard（最多 batch_wait 秒），整輪合併一次下單。"""
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await loop.run_in_executor(None, self._get, 1.0)
+            if first is None:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.n:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                msg = await loop.run_in_executor(None, self._get, left)
+                if msg is None:
+                    break
+                batch.append(msg)
+            # 同一 symbol 只會屬於一個 shard；保險起見仍以最後一筆為準
+            merged = {}
+            for _, intents in batch:
+                for it in intents:
+                    merged[it[0]] = it
+            metrics.observe("shard_batch_shards", len(batch))
+            if merged:
+                try:
+                    await self.on_intents(list(merged.values()))
+                except Exception as e:
+                    log.error("SHARD", "gateway error: %s", e, exc=e)
+
+    # ---------- health ----------
+    def health(self) -> List[dict]:
+        now = time.time()
+        out = []
+        for i in range(self.n):
+            h = self.health_arr[i * _H:(i + 1) * _H]
+            p = self._procs[i]
+            out.append({
+                "shard": i,
+                "alive": bool(p is not None and p.is_alive()),
+                "symbols": int(h[_SYMBOLS]),
+                "cycles": int(h[_CYCLES]),
+                "cycle_ms": round(h[_CYCLE_MS], 1),
+                "close_lag_ms": round(h[_LAG_MS], 1),
+                "loop_lag_ms": round(h[_LOOP_LAG_MS], 1),
+                "heartbeat_age_s": round(now - (h[_BEAT] or self._started_at[i]), 1),
+                "errors": int(h[_ERRORS]),
+            })
+        return out
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(max(1.0, config.SHARD_HEALTH_INTERVAL))
+            for h in self.health():
+                i = h["shard"]
+                metrics.gauge("shard_cycle_ms", h["cycle_ms"], shard=i)
+                metrics.gauge("shard_close_lag_ms", h["close_lag_ms"], shard=i)
+                metrics.gauge("shard_loop_lag_ms", h["loop_lag_ms"], shard=i)
+                metrics.gauge("shard_heartbeat_age_s", h["heartbeat_age_s"], shard=i)
+                metrics.gauge("shard_symbols", h["symbols"], shard=i)
+                if not h["alive"] or h["heartbeat_age_s"] > config.SHARD_STALE_S:
+                    log.warning("SHARD", "restarting shard %d: %s", i, h)
+                    self._kill(i)
+                    self._spawn(i)
+                    self.restarts += 1
+                    metrics.inc("shard_restarts_total", shard=i)
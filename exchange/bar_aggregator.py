@@ -0,0 +1,115 @@
+# exchange/bar_aggregator.py
+import asyncio
+from collections import deque
+from itertools import islice
+from typing import Dict, List, Tuple
+
+import config
+from exchange.kline_cache import interval_ms
+
+_DAY_MS = 86_400_000
+
+
+def resample(rows, step_ms: int) -> List[list]:
+    """
+    較小週期的 K 線（依 open_time 遞增）合成為 step_ms 週期，格式同交易所 12 欄。
+    bucket 對齊 UTC epoch，與交易所的 K 線邊界相同；最後一根若未滿即為未收盤的那根。
+    """
+    out: List[list] = []
+    for r in rows:
+        t = int(r[0])
+        b = t - t % step_ms
+        h, l, c = float(r[2]), float(r[3]), float(r[4])
+        if out and out[-1][0] == b:
+            a = out[-1]
+            if h > a[2]:
+                a[2] = h
+            if l < a[3]:
+                a[3] = l
+            a[4] = c
+            a[5] += float(r[5])
+            a[7] += float(r[7])
+            a[8] += int(r[8])
+            a[9] += float(r[9])
+            a[10] += float(r[10])
+        else:
+            out.append([b, float(r[1]), h, l, c, float(r[5]), b + step_ms - 1,
+                        float(r[7]), int(r[8]), float(r[9]), float(r[10]), "0"])
+    return out
+
+
+def base_buffer_size(base: str = None, max_interval: str = None) -> int:
+    """base 序列至少要涵蓋兩根最大週期的 K 線（漏掉一輪也能接上）。"""
+    b = interval_ms(base or config.RESAMPLE_BASE_INTERVAL)
+    m = interval_ms(max_interval or config.RESAMPLE_MAX_INTERVAL)
+    return max(config.KLINE_BUFFER_SIZE, 2 * (m // b) if b else 0)
+
+
+class BarAggregator:
+    """
+    多週期 K 線：每個 symbol 只維護一條 base（預設 1m）序列，也就是 client.klines 裡的那條，
+    5m / 15m / 1h / 4h 等較高週期在記憶體內由 base 增量合成，不再各自打 REST。
+    - 某週期第一次讀取時以 REST 抓一次歷史當底，之後只用 base 的新 K 線更新尾端
+    - 每次只重算最後一根（可能未收盤）之後的 bucket，成本與新增的 base 根數成正比
+    - base 接不上（長時間離線、缺口超過 buffer）時重新抓歷史
+    """
+
+    def __init__(self, client, base: str = None, size: int = None, max_interval: str = None):
+        self.client = client
+        self.base = base or config.RESAMPLE_BASE_INTERVAL
+        self.base_ms = interval_ms(self.base)
+        self.max_ms = interval_ms(max_interval or config.RESAMPLE_MAX_INTERVAL)
+        self.size = size or config.KLINE_BUFFER_SIZE
+        self._series: Dict[Tuple[str, str], deque] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self.bootstraps = 0
+
+    def derives(self, interval: str) -> bool:
+        """此週期能否由 base 合成：base 的整數倍、整除一天（與 UTC 對齊），且不超過 RESAMPLE_MAX_INTERVAL。"""
+        step = interval_ms(interval or "")
+        return (self.base_ms > 0 and self.base_ms < step <= self.max_ms
+                and step % self.base_ms == 0 and _DAY_MS % step == 0)
+
+    async def get(self, symbol: str, interval: str, limit: int = None) -> List[list]:
+        limit = limit or config.KLINE_LIMIT
+        if limit > self.size:
+            return await self.client.fetch_klines(symbol, interval=interval, limit=limit)
+        key = (symbol, interval)
+        step = interval_ms(interval)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            base = await self.client.klines.get(symbol, interval=self.base, limit=self.client.klines.size)
+            ser = self._series.get(key)
+            if ser is None or not self._fold(ser, base, step):
+                ser = await self._bootstrap(key)
+                self._fold(ser, base, step)
+            n = len(ser)
+            return list(islice(ser, max(0, n - limit), n))
+
+    async def _bootstrap(self, key) -> deque:
+        symbol, interval = key
+        rows = await self.client.fetch_klines(symbol, interval=interval, limit=self.size)
+        ser = self._series[key] = deque(rows or [], maxlen=self.size)
+        self.bootstraps += 1
+        return ser
+
+    @staticmethod
+    def _fold(ser: deque, base: list, step: int) -> bool:
+        """以 base 重算 ser 最後一根之後的 bucket；base 沒涵蓋到那根的開頭時回傳 False。"""
+        if not ser or not base:
+            return False
+        b0 = int(ser[-1][0])
+        if int(base[0][0]) > b0:
+            return False
+        if int(base[-1][0]) < b0:
+            return True    # base 比歷史還舊（剛 bootstrap）：維持 REST 的版本
+        i = len(base) - 1
+        while i > 0 and int(base[i - 1][0]) >= b0:
+            i -= 1
+        ser.pop()
+        ser.extend(resample(base[i:], step))
+        return True
+
+    def clear(self, symbol: str = None):
+        for k in [k for k in self._series if symbol is None or k[0] == symbol]:
+            self._series.pop(k, None)
@@ -1,11 +1,21 @@
 # exchange/binance_client.py
 import os
+import time
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from decimal import Decimal, getcontext
 
 from binance.um_futures import UMFutures
+from binance.error import ClientError
 import config
+from exchange.symbol_registry import SymbolRegistry
+from exchange.kline_cache import KlineCache
+from exchange.bar_aggregator import BarAggregator, base_buffer_size
+from exchange.endpoints import ENDPOINTS, orders_of, weight_of
+from exchange.precision import SymbolPrecision
+from exchange.http_transport import AiohttpTransport
+from exchange.rate_limiter import WeightLimiter
+from monitor import journal, metrics
 
 getcontext().prec = 28
 
@@ -16,48 +26,112 @@ class BinanceClient:
     1) get_klines 使用「關鍵字參數」呼叫，避免位置參數錯誤。
     2) 統一所有交易所呼叫都用關鍵字參數。
     3) 以 asyncio.Semaphore 做併發限流，避免連線池爆滿。
+    4) 交易對資訊改由 SymbolRegistry 快取，下單量化以 SymbolPrecision 整數運算。
+    5) K 線經 KlineCache 共用快照並增量更新。
+    6) RESAMPLE_ENABLED 時只抓 1m，較高週期由 BarAggregator 在本地合成。
+    7) 傳輸層可選：executor（UMFutures + 執行緒池）或 aiohttp（原生 async 連線池）。
+    8) WeightLimiter 依端點 weight 控管每分鐘額度，下單優先，429/418 依 Retry-After 暫停。
     """
 
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = False):
-        base_url = "https://testnet.binancefuture.com" if testnet else "https://fapi.binance.com"
-        self.client = UMFutures(key=api_key, secret=api_secret, base_url=base_url)
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = False,
+                 base_url: str = None, transport: str = None, limiter: WeightLimiter = None):
+        base_url = base_url or config.BINANCE_BASE_URL or (
+            "https://testnet.binancefuture.com" if testnet else "https://fapi.binance.com"
+        )
+        # show_limit_usage：回應附上 X-MBX-USED-WEIGHT / ORDER-COUNT header 供限流校正
+        self.client = UMFutures(key=api_key, secret=api_secret, base_url=base_url, show_limit_usage=True)
+        # 分片模式下傳入 SharedWeightLimiter：所有 process 共用同一份額度
+        self.limiter = limiter or WeightLimiter()
+        self.transport = (transport or config.BINANCE_TRANSPORT).lower()
+        self.http = AiohttpTransport(
+            api_key, api_secret, base_url, on_headers=self.limiter.sync
+        ) if self.transport == "aiohttp" else None
         # 併發上限（可用環境變數 BINANCE_MAX_CONCURRENCY 調整）
         self._sem = asyncio.Semaphore(int(os.getenv("BINANCE_MAX_CONCURRENCY", "5")))
+        # exchange_info 快取 + 已設定槓桿紀錄
+        self.registry = SymbolRegistry(self)
+        # K 線快取（每輪掃描共用、增量抓取）；重採樣模式下只放 base 週期，buffer 需涵蓋最大週期
+        self.klines = KlineCache(self, size=base_buffer_size() if config.RESAMPLE_ENABLED else None)
+        self.bars = BarAggregator(self)
+        # WebSocket 行情（MARKET_DATA_MODE=ws 時由 main 建立並掛上）
+        self.stream = None
+        # 伺服器時鐘（SCHEDULER_MODE=candle 時由 CandleScheduler 掛上）；有時鐘時策略只看已收盤 K 線
+        self.clock = None
 
     # ---------- utils ----------
-    async def _run(self, fn, *args, **kwargs):
-        # 所有對交易所的呼叫都經過限流
-        async with self._sem:
-            loop = asyncio.get_running_loop()
-            return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+    async def _call(self, name: str, **params):
+        """依端點名稱（同 UMFutures 方法名）呼叫交易所，走設定的傳輸層。"""
+        ep = ENDPOINTS[name]
+        t0 = time.perf_counter()
+        await self.limiter.acquire(weight_of(name, params), orders=orders_of(name, params),
+                                   is_order=ep.is_order)
+        req = 0
+        try:
+            async with self._sem:
+                # 排隊時間 = 等 weight 額度 + 等併發 semaphore
+                metrics.observe("binance_wait_ms", (time.perf_counter() - t0) * 1000, endpoint=name)
+                if ep.is_order:
+                    # 交易日誌：送出前記下請求，回應 / 錯誤以 req 對應
+                    req = journal.record("order", endpoint=name, params=params)
+                with metrics.span("binance_request", endpoint=name):
+                    if self.http is not None:
+                        res = await self.http.request(ep, params)
+                    else:
+                        fn = getattr(self.client, ep.fn or name)
+                        loop = asyncio.get_running_loop()
+                        res = await loop.run_in_executor(None, lambda: fn(**params))
+        except ClientError as e:
+            metrics.inc("binance_http_errors_total", endpoint=name, status=e.status_code)
+            if req:
+                journal.record("error", req=req, endpoint=name, status=e.status_code, msg=e.error_message)
+            if e.status_code in (429, 418):
+                self.limiter.penalize(e.status_code, e.header)
+            raise
+        except Exception as e:
+            if req:
+                journal.record("error", req=req, endpoint=name, msg=repr(e))
+            raise
+        if isinstance(res, dict) and "limit_usage" in res and "data" in res:
+            self.limiter.sync(res["limit_usage"])
+            res = res["data"]
+        if req:
+            journal.record("response", req=req, endpoint=name, response=res)
+        return res
+
+    async def close(self):
+        self.klines.close()
+        if self.http is not None:
+            await self.http.close()
 
     @staticmethod
     def _D(x) -> Decimal:
         return Decimal(str(x))
 
-    @staticmethod
-    def _floor_step(value: Decimal, step: Decimal) -> Decimal:
-        if step == 0:
-            return value
-        return (value // step) * step
-
     # ---------- info ----------
+    async def server_time(self) -> int:
+        """交易所伺服器時間（ms）。"""
+        res = await self._call("time")
+        return int(res["serverTime"])
+
     async def exchange_info(self) -> Dict[str, Any]:
-        return await self._run(self.client.exchange_info)
+        return await self._call("exchange_info")
 
     async def get_symbol_info(self, symbol: str) -> Optional[dict]:
-        try:
-            info = await self.exchange_info()
-            for s in info.get("symbols", []):
-                if s.get("symbol") == symbol:
-                    return s
-        except Exception:
-            pass
-        return None
+        meta = await self.get_symbol_meta(symbol)
+        return meta.raw if meta else None
+
+    async def get_symbol_meta(self, symbol: str):
+        """從 registry 取得已解析的交易對限制；僅在尚未載入時才會打 API。"""
+        await self.registry.ensure_loaded()
+        return self.registry.get(symbol)
 
     async def get_price(self, symbol: str) -> Optional[Decimal]:
+        if self.stream is not None and self.stream.connected:
+            p = self.stream.price(symbol)
+            if p:
+                return self._D(p)
         try:
-            res = await self._run(self.client.ticker_price, symbol=symbol)
+            res = await self._call("ticker_price", symbol=symbol)
             return self._D(res.get("price"))
         except Exception:
             return None
@@ -65,79 +139,179 @@ class BinanceClient:
     async def get_24h_stats(self, symbol: str) -> Optional[dict]:
         """給 shortlist 使用的 24hr 統計（含 quoteVolume）。"""
         try:
-            return await self._run(self.client.ticker_24hr, symbol=symbol)
+            return await self._call("ticker_24hr", symbol=symbol)
         except Exception:
             return None
 
     async def get_premium_index(self, symbol: str) -> Optional[dict]:
         """取得資金費等 premium index 資訊。"""
         try:
-            return await self._run(self.client.premium_index, symbol=symbol)
+            return await self._call("premium_index", symbol=symbol)
+        except Exception:
+            return None
+
+    async def get_all_24h_stats(self) -> Optional[list]:
+        """不帶 symbol：一次取回全市場 24hr 統計。"""
+        try:
+            return await self._call("ticker_24hr")
+        except Exception:
+            return None
+
+    async def get_all_premium_index(self) -> Optional[list]:
+        """不帶 symbol：一次取回全市場 premium index（含 lastFundingRate）。"""
+        try:
+            return await self._call("premium_index")
         except Exception:
             return None
 
     # ---------- market data ----------
     async def get_klines(self, symbol: str, interval: str = None, limit: int = None):
+        """策略使用的 K 線入口：預設經過 KlineCache；可由 base 合成的週期走 BarAggregator。"""
+        if config.RESAMPLE_ENABLED and self.bars.derives(interval or config.KLINE_INTERVAL):
+            return await self.bars.get(symbol, interval or config.KLINE_INTERVAL, limit=limit)
+        if config.KLINE_CACHE_ENABLED:
+            return await self.klines.get(symbol, interval=interval, limit=limit)
+        return await self.fetch_klines(symbol, interval=interval, limit=limit)
+
+    async def fetch_klines(self, symbol: str, interval: str = None, limit: int = None,
+                           start_time: int = None):
         """
         關鍵修復：一律使用關鍵字參數呼叫 UMFutures.klines
         """
         interval = interval or config.KLINE_INTERVAL
         limit = limit or config.KLINE_LIMIT
-        return await self._run(self.client.klines, symbol=symbol, interval=interval, limit=limit)
+        kwargs = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            kwargs["startTime"] = int(start_time)
+        return await self._call("klines", **kwargs)
 
     # ---------- account ----------
-    async def get_equity(self) -> Decimal:
+    async def get_balance_snapshot(self) -> dict:
+        """USDT 錢包餘額與可用保證金（一次 balance 請求）。"""
+        zero = Decimal("0")
         try:
-            balances = await self._run(self.client.balance)
+            balances = await self._call("balance")
             for b in balances:
                 if b.get("asset") == "USDT":
-                    return self._D(b.get("balance"))
+                    return {"balance": self._D(b.get("balance")),
+                            "available": self._D(b.get("availableBalance", b.get("balance")))}
         except Exception:
             pass
-        return Decimal("0")
+        return {"balance": zero, "available": zero}
+
+    async def get_equity(self) -> Decimal:
+        return (await self.get_balance_snapshot())["balance"]
 
     async def change_leverage(self, symbol: str, leverage: int):
+        # 已是目標槓桿就不再送出請求
+        if self.registry.leverage(symbol) == int(leverage):
+            return {"symbol": symbol, "leverage": int(leverage)}
         try:
-            return await self._run(self.client.change_leverage, symbol=symbol, leverage=leverage)
+            res = await self._call("change_leverage", symbol=symbol, leverage=leverage)
+            if res:
+                self.registry.set_leverage(symbol, res.get("leverage", leverage))
+            return res
         except Exception:
             return None
 
+    async def get_position_risk(self) -> Optional[list]:
+        """全部持倉（positionAmt / entryPrice / updateTime）；給 PositionManager 對帳用。"""
+        try:
+            return await self._call("get_position_risk")
+        except Exception:
+            return None
+
+    # ---------- user data stream ----------
+    async def new_listen_key(self) -> str:
+        res = await self._call("new_listen_key")
+        return res["listenKey"]
+
+    async def renew_listen_key(self, listen_key: str):
+        return await self._call("renew_listen_key", listenKey=listen_key)
+
+    async def close_listen_key(self, listen_key: str):
+        return await self._call("close_listen_key", listenKey=listen_key)
+
     # ---------- order helpers ----------
-    async def _lot_size_constraints(self, symbol_info: dict):
-        stepSize = minQty = minNotional = Decimal("0")
-        for f in symbol_info.get("filters", []):
-            ft = f.get("filterType")
-            if ft == "LOT_SIZE":
-                stepSize = self._D(f.get("stepSize"))
-                minQty = self._D(f.get("minQty"))
-            if ft == "MIN_NOTIONAL":
-                minNotional = self._D(f.get("notional", f.get("minNotional", "0")))
-        return stepSize, minQty, minNotional
-
-    async def _quantize_qty(self, symbol: str, qty: Decimal) -> Decimal:
-        info = await self.get_symbol_info(symbol)
-        if not info:
-            return qty
-        step, minQty, _ = await self._lot_size_constraints(info)
-        q = self._floor_step(qty, step)
-        if q < minQty:
-            return Decimal("0")
-        return q
-
-    async def open_long(self, symbol: str, qty: Decimal):
-        q = await self._quantize_qty(symbol, qty)
-        if q <= 0:
+    async def get_precision(self, symbol: str) -> Optional[SymbolPrecision]:
+        """整數精度表（registry 載入時建立）；僅在尚未載入時才會打 API。"""
+        await self.registry.ensure_loaded()
+        return self.registry.precision(symbol)
+
+    async def _quantize_qty(self, symbol: str, qty) -> Decimal:
+        """相容舊介面：依 LOT_SIZE / MARKET_LOT_SIZE 捨去（整數運算），回傳 Decimal。"""
+        prec = await self.get_precision(symbol)
+        if prec is None:
+            return self._D(qty)
+        return Decimal(prec.qty_str(prec.floor_qty(qty)))
+
+    async def _order_qty(self, symbol: str, qty) -> Optional[str]:
+        """量化後可直接送出的數量字串；低於 minQty 或沒有交易對資訊時回傳 None。"""
+        prec = await self.get_precision(symbol)
+        if prec is None:
+            return None
+        u = prec.floor_qty(qty)
+        return prec.qty_str(u) if u > 0 else None
+
+    async def open_long(self, symbol: str, qty):
+        q = await self._order_qty(symbol, qty)
+        if q is None:
+            return None
+        return await self._call(
+            "new_order",
+            symbol=symbol, side="BUY", type="MARKET", quantity=q
+        )
+
+    async def open_short(self, symbol: str, qty):
+        q = await self._order_qty(symbol, qty)
+        if q is None:
             return None
-        return await self._run(
-            self.client.new_order,
-            symbol=symbol, side="BUY", type="MARKET", quantity=str(q)
+        return await self._call(
+            "new_order",
+            symbol=symbol, side="SELL", type="MARKET", quantity=q
         )
 
-    async def open_short(self, symbol: str, qty: Decimal):
-        q = await self._quantize_qty(symbol, qty)
-        if q <= 0:
+    async def open_limit(self, symbol: str, side: str, qty, price, time_in_force: str = "GTC"):
+        """
+        限價單：數量依 stepSize 捨去，價格依 PRICE_FILTER 對齊 tickSize（買單向下、賣單向上，
+        不會比指定價格差），並檢查 minPrice / maxPrice / 最小名目；不合格回傳 None。
+        """
+        prec = await self.get_precision(symbol)
+        if prec is None:
+            return None
+        q = prec.floor_qty(qty)
+        p = prec.round_price(price, up=(side != "LONG"))
+        if q <= 0 or p <= 0 or not prec.notional_ok(q, p):
+            return None
+        return await self._call(
+            "new_order",
+            **self.limit_order(symbol, side, prec.qty_str(q), prec.price_str(p), time_in_force)
+        )
+
+    async def new_batch_orders(self, orders: List[dict]) -> list:
+        """
+        批次下單（最多 5 筆）；回傳與 orders 同順序的清單，
+        每一項為成交回應，或失敗時的 {"code": ..., "msg": ...}。
+        """
+        return await self._call("new_batch_order", batchOrders=orders)
+
+    def market_order(self, symbol: str, side: str, qty) -> dict:
+        """組出一筆市價單參數（給 new_batch_orders 用，qty 需已量化）。"""
+        return {"symbol": symbol, "side": "BUY" if side == "LONG" else "SELL",
+                "type": "MARKET", "quantity": str(qty)}
+
+    def limit_order(self, symbol: str, side: str, qty, price, time_in_force: str = "GTC") -> dict:
+        """組出一筆限價單參數（qty / price 需已量化，見 open_limit）。"""
+        return {"symbol": symbol, "side": "BUY" if side == "LONG" else "SELL", "type": "LIMIT",
+                "timeInForce": time_in_force, "quantity": str(qty), "price": str(price)}
+
+    async def close_position(self, symbol: str, qty):
+        """reduce-only 市價平倉；qty 為持倉數量（正 = 多、負 = 空）。"""
+        q = Decimal(str(qty))
+        if q == 0:
             return None
-        return await self._run(
-            self.client.new_order,
-            symbol=symbol, side="SELL", type="MARKET", quantity=str(q)
+        return await self._call(
+            "new_order",
+            symbol=symbol, side="SELL" if q > 0 else "BUY", type="MARKET",
+            quantity=str(abs(q)), reduceOnly="true"
         )
@@ -0,0 +1,72 @@
+# exchange/endpoints.py
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """
+    REST 端點描述；name 與 UMFutures 的方法名稱一致。
+    weight / weight_all：帶 symbol / 不帶 symbol（全市場）時的 request weight；
+    orders：計入 order count 的筆數（下單類端點才有）；
+    fn：UMFutures 方法名與 name 不同時填寫。
+    """
+    method: str
+    path: str
+    signed: bool = False
+    weight: int = 1
+    weight_all: int = 0
+    orders: int = 0
+    fn: str = ""
+
+    @property
+    def is_order(self) -> bool:
+        return self.orders > 0
+
+
+ENDPOINTS: Dict[str, Endpoint] = {
+    "time":               Endpoint("GET",    "/fapi/v1/time"),
+    "exchange_info":      Endpoint("GET",    "/fapi/v1/exchangeInfo"),
+    "ticker_price":       Endpoint("GET",    "/fapi/v2/ticker/price", weight_all=2),
+    "ticker_24hr":        Endpoint("GET",    "/fapi/v1/ticker/24hr", weight_all=40,
+                                  fn="ticker_24hr_price_change"),
+    "premium_index":      Endpoint("GET",    "/fapi/v1/premiumIndex", weight_all=10, fn="mark_price"),
+    "klines":             Endpoint("GET",    "/fapi/v1/klines"),
+    "balance":            Endpoint("GET",    "/fapi/v3/balance", signed=True, weight=5),
+    "change_leverage":    Endpoint("POST",   "/fapi/v1/leverage", signed=True),
+    "new_order":          Endpoint("POST",   "/fapi/v1/order", signed=True, orders=1),
+    # 一次最多 5 筆；每筆仍各計一次 order count
+    "new_batch_order":    Endpoint("POST",   "/fapi/v1/batchOrders", signed=True, weight=5, orders=1),
+    "get_position_risk":  Endpoint("GET",    "/fapi/v3/positionRisk", signed=True, weight=5),
+    # user data stream：只需 API key header，不簽名
+    "new_listen_key":     Endpoint("POST",   "/fapi/v1/listenKey"),
+    "renew_listen_key":   Endpoint("PUT",    "/fapi/v1/listenKey"),
+    "close_listen_key":   Endpoint("DELETE", "/fapi/v1/listenKey"),
+}
+
+
+def _klines_weight(limit: int) -> int:
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def weight_of(name: str, params: Dict[str, Any]) -> int:
+    """估算單次呼叫的 request weight。"""
+    ep = ENDPOINTS[name]
+    if name == "klines":
+        return _klines_weight(int(params.get("limit") or 500))
+    if ep.weight_all and not params.get("symbol"):
+        return ep.weight_all
+    return ep.weight
+
+
+def orders_of(name: str, params: Dict[str, Any]) -> int:
+    """單次呼叫計入 order count 的筆數。"""
+    if name == "new_batch_order":
+        return len(params.get("batchOrders") or ())
+    return ENDPOINTS[name].orders
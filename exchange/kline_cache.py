@@ -0,0 +1,209 @@
+# exchange/kline_cache.py
+import asyncio
+import time
+from collections import deque
+from itertools import islice
+from typing import Dict, List, Tuple
+
+import config
+from exchange.kline_store import KlineStore, to_rows
+from monitor import log, metrics
+
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+_FETCH_MAX = 1500   # klines 單次上限：啟動補缺口超過此根數就整包重抓
+
+
+def interval_ms(interval: str) -> int:
+    """'5m' -> 300000；不支援的單位（如 1M）回傳 0。"""
+    try:
+        return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+    except (KeyError, ValueError, IndexError):
+        return 0
+
+
+class KlineCache:
+    """
+    以 (symbol, interval) 為 key 的 K 線快取（固定長度 ring buffer）。
+    - 同一輪掃描內，所有策略共用同一份快照，只打一次 API。
+    - 下一輪只用 startTime 抓「最後一根（尚未收盤）之後」的 K 線並接上，
+      不再每輪重抓整包 KLINE_LIMIT。
+    - WebSocket 模式下由 MarketStream 直接 merge，標記為 live 的 key 不打 REST。
+    - 設定 KLINE_STORE_DIR 時，已收盤的 K 線同步寫入本地 store（exchange/kline_store.py）；
+      重啟後第一次讀取直接從檔案還原 buffer，只以 REST 補上次寫入之後的缺口。
+    """
+
+    def __init__(self, client, size: int = None, ttl: float = None, store: KlineStore = None):
+        self.client = client
+        self.size = size or config.KLINE_BUFFER_SIZE
+        self.ttl = ttl if ttl is not None else config.KLINE_CACHE_TTL
+        self.store = store if store is not None else (
+            KlineStore(config.KLINE_STORE_DIR) if config.KLINE_STORE_DIR else None
+        )
+        self._bufs: Dict[Tuple[str, str], deque] = {}
+        self._stamp: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._depth: Dict[Tuple[str, str], int] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._live = set()
+        self._cycle = 0
+
+    def new_cycle(self):
+        """新一輪掃描開始：之後的第一次讀取會做增量更新。"""
+        self._cycle += 1
+
+    def set_live(self, symbol: str, interval: str, live: bool):
+        key = (symbol, interval)
+        if live:
+            self._live.add(key)
+        else:
+            self._live.discard(key)
+
+    def _fresh(self, key) -> bool:
+        if key in self._live:
+            return True
+        st = self._stamp.get(key)
+        if not st:
+            return False
+        cycle, ts = st
+        return cycle == self._cycle and (time.monotonic() - ts) < self.ttl
+
+    def _touch(self, key):
+        self._stamp[key] = (self._cycle, time.monotonic())
+
+    async def get(self, symbol: str, interval: str = None, limit: int = None) -> List[list]:
+        interval = interval or config.KLINE_INTERVAL
+        limit = limit or config.KLINE_LIMIT
+        if limit > self.size:
+            # 超過 buffer 容量的請求直接走 REST
+            return await self.client.fetch_klines(symbol, interval=interval, limit=limit)
+
+        key = (symbol, interval)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            buf = self._bufs.get(key)
+            if buf is None or (len(buf) < limit and self._depth.get(key, 0) < limit):
+                await self._load_full(key)
+            elif not self._fresh(key):
+                await self._load_incremental(key)
+            buf = self._bufs[key]
+            n = len(buf)
+            return list(islice(buf, max(0, n - limit), n))
+
+    async def refresh(self, symbol: str, interval: str = None):
+        """強制以 REST 更新（重連補缺口用）：有 buffer 就增量，沒有就整包。"""
+        key = (symbol, interval or config.KLINE_INTERVAL)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if self._bufs.get(key):
+                await self._load_incremental(key)
+            else:
+                await self._load_full(key)
+
+    async def _load_full(self, key):
+        symbol, interval = key
+        # 第一次載入（啟動 / clear 之後）先試著從 store 還原
+        if key not in self._depth and await self._restore(key):
+            self._depth[key] = self.size
+            self._touch(key)
+            return
+        rows = await self.client.fetch_klines(symbol, interval=interval, limit=self.size)
+        self._bufs[key] = deque(rows or [], maxlen=self.size)
+        self._depth[key] = self.size
+        self._touch(key)
+        self._persist(key)
+
+    async def _restore(self, key) -> bool:
+        """
+        從 store 讀回最後 size 根，再以 startTime 只補最後一根之後的缺口（含未收盤那根）。
+        檔案加上缺口仍湊不滿 buffer、尾端有空洞，或缺口超過單次上限時回傳 False（改整包重抓）。
+        """
+        if self.store is None:
+            return False
+        symbol, interval = key
+        step = interval_ms(interval)
+        f = self.store.file(symbol, interval, step)
+        if f is None or not f.count or not step:
+            return False
+        gap = (int(time.time() * 1000) - f.last_open) // step + 2
+        if gap > _FETCH_MAX or f.count + gap - 1 < self.size:
+            return False
+        tail = f.tail(self.size)
+        if int(tail["open_time"][-1]) - int(tail["open_time"][0]) != (len(tail) - 1) * step:
+            return False
+        self._bufs[key] = deque(to_rows(tail), maxlen=self.size)
+        rows = await self.client.fetch_klines(
+            symbol, interval=interval, limit=int(gap), start_time=f.last_open
+        )
+        if rows:
+            # 缺口可能比 buffer 長：整段已收盤的先寫進檔案，檔案才不會留空洞
+            f.append(rows[:-1])
+        self.merge(key, rows)
+        if len(self._bufs[key]) < self.size:
+            return False
+        metrics.inc("kline_store_restore_total")
+        return True
+
+    def _persist(self, key):
+        """buffer 中已收盤（後面已有新 K 線）且比檔案新的 K 線寫入 store。"""
+        buf = self._bufs.get(key)
+        # 只寫完整載入過的 buffer：WS 在初次載入前 merge 進來的零星 K 線不寫，檔案才保持連續
+        if self.store is None or key not in self._depth or not buf or len(buf) < 2:
+            return
+        step = interval_ms(key[1])
+        f = self.store.file(key[0], key[1], step)
+        if f is None or int(buf[-2][0]) <= f.last_open:
+            return
+        new = []
+        for i in range(len(buf) - 2, -1, -1):
+            if int(buf[i][0]) <= f.last_open:
+                break
+            new.append(buf[i])
+        new.reverse()
+        if f.count and step and int(new[0][0]) != f.last_open + step:
+            # 缺口超過單次上限後整包重抓：接在舊檔後面會留下空洞，改開新檔
+            log.warning("STORE", "%s %s gap %d bars, rotating %s", key[0], key[1],
+                        (int(new[0][0]) - f.last_open) // step - 1, f.path)
+            metrics.inc("kline_store_rotate_total")
+            f = self.store.rotate(key[0], key[1], step)
+            if f is None:
+                return
+        f.append(new)
+
+    async def _load_incremental(self, key):
+        symbol, interval = key
+        buf = self._bufs[key]
+        if not buf:
+            return await self._load_full(key)
+        last_open = int(buf[-1][0])
+        step = interval_ms(interval)
+        gap = ((int(time.time() * 1000) - last_open) // step + 2) if step else self.size
+        if gap >= self.size:
+            # 離線太久，缺口比整個 buffer 還長：直接整包重抓
+            return await self._load_full(key)
+        rows = await self.client.fetch_klines(
+            symbol, interval=interval, limit=int(gap), start_time=last_open
+        )
+        self.merge(key, rows)
+        self._touch(key)
+
+    def merge(self, key, rows):
+        """把新 K 線接到 buffer：同 open_time 覆蓋（未收盤那根），較新的 append。"""
+        buf = self._bufs.setdefault(key, deque(maxlen=self.size))
+        for r in rows or []:
+            t = int(r[0])
+            if buf and int(buf[-1][0]) == t:
+                buf[-1] = r
+            elif not buf or t > int(buf[-1][0]):
+                buf.append(r)
+        self._persist(key)
+
+    def clear(self, symbol: str = None):
+        keys = [k for k in self._bufs if symbol is None or k[0] == symbol]
+        for k in keys:
+            self._bufs.pop(k, None)
+            self._stamp.pop(k, None)
+            self._depth.pop(k, None)
+            self._live.discard(k)
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
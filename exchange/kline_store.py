@@ -0,0 +1,194 @@
+# exchange/kline_store.py
+"""
+K 線持久化：每個 (symbol, interval) 一個 append-only 檔案 <SYMBOL>-<interval>.kls，
+64 bytes 標頭 + 固定寬度記錄（STORE_DTYPE，全為 int64 / float64），以 np.memmap 讀寫。
+- 只寫已收盤的 K 線，open_time 嚴格遞增且連續（相鄰兩根差一個週期）；重啟時直接 mmap 讀回最後 N 根，
+  只需補上之後的缺口。接不上的資料（停機太久）不寫進舊檔，舊檔改名保留、另開新檔（KlineStore.rotate）
+- 先寫記錄、再更新標頭筆數：程序中途結束最多少掉最後一批，不會讀到半筆
+- 檔案以 _GROW 筆為單位預先配置，不必每根 K 線都 resize / remap
+- STORE_DTYPE 的前 7 欄與 backtest.data.KLINE_DTYPE 相同，同一份檔案可直接當回測輸入
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"KLSTORE1"
+VERSION = 1
+SUFFIX = ".kls"
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"), ("version", "<u4"), ("rec_size", "<u4"),
+    ("interval_ms", "<i8"), ("count", "<i8"), ("reserved", "V32"),
+])
+STORE_DTYPE = np.dtype([
+    ("open_time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+    ("close", "<f8"), ("volume", "<f8"), ("close_time", "<i8"),
+    ("quote_volume", "<f8"), ("trades", "<i8"), ("taker_base", "<f8"), ("taker_quote", "<f8"),
+])
+_HEADER = HEADER_DTYPE.itemsize
+_GROW = 4096
+
+
+def to_record(r) -> tuple:
+    """交易所 12 欄 K 線（字串或數字皆可）-> STORE_DTYPE 的一筆。"""
+    return (int(r[0]), float(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5]),
+            int(r[6]), float(r[7]), int(r[8]), float(r[9]), float(r[10]))
+
+
+def to_rows(rec: np.ndarray) -> List[list]:
+    """STORE_DTYPE 陣列 -> 與 REST / WS 相同的 12 欄 list（數值型別，策略端照樣 float()）。"""
+    return [list(t) + ["0"] for t in rec.tolist()]
+
+
+def _check(hdr, path: str):
+    if bytes(hdr["magic"]) != MAGIC or int(hdr["rec_size"]) != STORE_DTYPE.itemsize:
+        raise ValueError(f"not a kline store file: {path}")
+
+
+def read_header(path: str):
+    hdr = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if not hdr.size:
+        raise ValueError(f"not a kline store file: {path}")
+    _check(hdr[0], path)
+    return hdr[0]
+
+
+def read_records(path: str) -> np.ndarray:
+    """唯讀 mmap 整個檔案的有效記錄（回測用，不整檔載入記憶體）。"""
+    n = int(read_header(path)["count"])
+    if n == 0:
+        return np.empty(0, dtype=STORE_DTYPE)
+    return np.memmap(path, dtype=STORE_DTYPE, mode="r", offset=_HEADER, shape=(n,))
+
+
+class KlineFile:
+    """單一 (symbol, interval) 的可寫檔案；同一個檔案只能有一個寫入者。"""
+
+    def __init__(self, path: str, interval_ms: int = 0):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) < _HEADER:
+            self._create(interval_ms)
+        self._map()
+        if interval_ms and self.interval_ms and self.interval_ms != interval_ms:
+            raise ValueError(f"interval mismatch in {path}: {self.interval_ms} != {interval_ms}")
+        self.last_open = int(self._rec["open_time"][self.count - 1]) if self.count else -1
+
+    def _create(self, interval_ms: int):
+        hdr = np.zeros(1, dtype=HEADER_DTYPE)
+        hdr["magic"], hdr["version"], hdr["rec_size"] = MAGIC, VERSION, STORE_DTYPE.itemsize
+        hdr["interval_ms"] = interval_ms
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(hdr.tobytes())
+            f.truncate(_HEADER + _GROW * STORE_DTYPE.itemsize)
+        os.replace(tmp, self.path)
+
+    def _map(self):
+        self._hdr = np.memmap(self.path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        _check(self._hdr[0], self.path)
+        cap = (os.path.getsize(self.path) - _HEADER) // STORE_DTYPE.itemsize
+        self._rec = np.memmap(self.path, dtype=STORE_DTYPE, mode="r+", offset=_HEADER, shape=(cap,))
+
+    @property
+    def count(self) -> int:
+        return int(self._hdr["count"][0])
+
+    @property
+    def interval_ms(self) -> int:
+        return int(self._hdr["interval_ms"][0])
+
+    def tail(self, n: int) -> np.ndarray:
+        c = self.count
+        return self._rec[max(0, c - n):c]
+
+    def rows(self, n: int) -> List[list]:
+        return to_rows(self.tail(n))
+
+    def append(self, rows) -> int:
+        """只接 open_time 比檔案最後一根新的 K 線；回傳實際寫入的筆數。"""
+        recs = [to_record(r) for r in rows or [] if int(r[0]) > self.last_open]
+        if not recs:
+            return 0
+        arr = np.array(recs, dtype=STORE_DTYPE)
+        if np.any(np.diff(arr["open_time"]) <= 0):
+            arr = arr[np.unique(arr["open_time"], return_index=True)[1]]
+        c = self.count
+        need = c + len(arr)
+        if need > len(self._rec):
+            self._grow(max(need, len(self._rec) + _GROW))
+        self._rec[c:need] = arr
+        self._hdr["count"] = need
+        self.last_open = int(arr["open_time"][-1])
+        return len(arr)
+
+    def truncate(self, count: int):
+        """只保留前 count 筆（修復尾端資料或模擬停機用）；檔案容量不變。"""
+        self._hdr["count"] = max(0, min(count, self.count))
+        self.last_open = int(self._rec["open_time"][self.count - 1]) if self.count else -1
+
+    def _grow(self, cap: int):
+        self.flush()
+        self._hdr = self._rec = None
+        with open(self.path, "r+b") as f:
+            f.truncate(_HEADER + cap * STORE_DTYPE.itemsize)
+        self._map()
+
+    def flush(self):
+        if self._rec is not None:
+            self._rec.flush()
+            self._hdr.flush()
+
+    def close(self):
+        self.flush()
+        self._hdr = self._rec = None
+
+
+class KlineStore:
+    """目錄下所有 .kls 檔的管理者（依需要開檔，開過的保持 mmap）。"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._files: Dict[Tuple[str, str], Optional[KlineFile]] = {}
+
+    def path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, f"{symbol.upper()}-{interval}{SUFFIX}")
+
+    def file(self, symbol: str, interval: str, interval_ms: int = 0) -> Optional[KlineFile]:
+        """開啟（不存在就建立）；檔案損壞或週期不符時記錄警告並回傳 None，改走 REST。"""
+        key = (symbol, interval)
+        if key not in self._files:
+            try:
+                self._files[key] = KlineFile(self.path(symbol, interval), interval_ms)
+            except (OSError, ValueError) as e:
+                from monitor import log   # 延遲匯入：離線讀檔（backtest.data）不需要 config
+                log.warning("STORE", "disabled for %s %s: %s", symbol, interval, e)
+                self._files[key] = None
+        return self._files[key]
+
+    def rotate(self, symbol: str, interval: str, interval_ms: int = 0) -> Optional[KlineFile]:
+        """
+        新資料接不上舊檔時呼叫：舊檔改名為 <SYMBOL>-<interval>-<第一根 open_time>.kls 保留，
+        再開一個空檔，原檔名底下永遠是一段連續的 K 線。
+        """
+        key = (symbol, interval)
+        old = self._files.pop(key, None)
+        path = self.path(symbol, interval)
+        if old is not None:
+            first = int(old.tail(old.count)["open_time"][0]) if old.count else 0
+            old.close()
+            if first:
+                os.replace(path, os.path.join(self.root, f"{symbol.upper()}-{interval}-{first}{SUFFIX}"))
+            else:
+                os.remove(path)
+        return self.file(symbol, interval, interval_ms)
+
+    def flush(self):
+        for f in self._files.values():
+            if f is not None:
+                f.flush()
+
+    def close(self):
+        self.flush()
+        self._files.clear()
@@ -0,0 +1,178 @@
+# exchange/market_stream.py
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+import aiohttp
+
+import config
+from monitor import log
+
+
+def _pct(values, q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * (len(s) - 1) + 0.5))]
+
+
+class MarketStream:
+    """
+    WebSocket 行情模式：訂閱 combined stream（kline / markPrice / 24hrTicker），
+    直接把 K 線寫進 client.klines（KlineCache），策略讀取時不再打 REST。
+    斷線重連後以 REST 補齊缺口；K 線收盤時設定 bar_closed 事件喚醒掃描。
+    """
+
+    def __init__(self, client, symbols: Iterable[str], interval: str = None, url: str = None):
+        self.client = client
+        self.interval = interval or config.KLINE_INTERVAL
+        self.url = (url or config.WS_BASE_URL).rstrip("/")
+        self.symbols = sorted(set(symbols))
+        self._subscribed = set(self.symbols)
+        self.mark: Dict[str, float] = {}
+        self.funding: Dict[str, float] = {}
+        self.ticker: Dict[str, dict] = {}
+        self.bar_closed = asyncio.Event()
+        self.closed_symbols = set()
+        self.connected = False
+        self.reconnects = 0
+        # 每個 symbol 最後一筆行情：(交易所事件時間 ms, 本地收到的 monotonic 秒)
+        self._last_tick: Dict[str, tuple] = {}
+        self._latency = deque(maxlen=1000)
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def update_symbols(self, symbols: Iterable[str]):
+        """訂閱清單變動時重連（重連時會自動補齊新 symbol 的歷史 K 線）。"""
+        new = sorted(set(symbols))
+        if new == self.symbols:
+            return
+        # 退訂的 symbol：K 線改回 REST 判斷新鮮度，也不再提供最後一筆 WS 行情
+        for s in set(self.symbols) - set(new):
+            self.client.klines.set_live(s, self.interval, False)
+            for d in (self.mark, self.funding, self.ticker, self._last_tick):
+                d.pop(s, None)
+            self.closed_symbols.discard(s)
+        self.symbols = new
+        self._subscribed = set(new)
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+
+    def stream_url(self) -> str:
+        names = []
+        for s in self.symbols:
+            s = s.lower()
+            names += [f"{s}@kline_{self.interval}", f"{s}@markPrice@1s", f"{s}@ticker"]
+        return f"{self.url}/stream?streams={'/'.join(names)}"
+
+    async def _run_forever(self):
+        delay = config.WS_RECONNECT_DELAY
+        while True:
+            try:
+                await self._run_once()
+                delay = config.WS_RECONNECT_DELAY
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("STREAM", "error: %s", e)
+            self._set_live(False)
+            self.connected = False
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    async def _run_once(self):
+        if not self.symbols:
+            await asyncio.sleep(1)
+            return
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(self.stream_url(), heartbeat=30) as ws:
+                self._ws = ws
+                self.connected = True
+                log.info("STREAM", "connected %d symbols", len(self.symbols))
+                # 先連線再補資料：補資料期間的 frame 會留在 socket，之後依序覆蓋
+                await self._backfill()
+                self._set_live(True)
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        self.handle(json.loads(msg.data))
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+        self._ws = None
+
+    async def _backfill(self):
+        tasks = [self.client.klines.refresh(s, self.interval) for s in self.symbols]
+        res = await asyncio.gather(*tasks, return_exceptions=True)
+        for s, r in zip(self.symbols, res):
+            if isinstance(r, Exception):
+                log.error("STREAM", "backfill error %s: %s", s, r)
+
+    def _set_live(self, live: bool):
+        for s in self.symbols:
+            self.client.klines.set_live(s, self.interval, live)
+
+    # ---------- frames ----------
+    def handle(self, msg: dict):
+        data = msg.get("data", msg)
+        et = data.get("e")
+        sym = data.get("s")
+        if not sym or sym not in self._subscribed:
+            return    # 重連前 socket 裡殘留的退訂 symbol frame
+        self._last_tick[sym] = (int(data.get("E", 0)), time.monotonic())
+        if et == "kline":
+            k = data["k"]
+            row = [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"], k["T"],
+                   k.get("q", "0"), k.get("n", 0), k.get("V", "0"), k.get("Q", "0"), "0"]
+            self.client.klines.merge((sym, k.get("i", self.interval)), [row])
+            if k.get("x"):
+                self.closed_symbols.add(sym)
+                self.bar_closed.set()
+        elif et == "markPriceUpdate":
+            self.mark[sym] = float(data["p"])
+            if data.get("r") not in (None, ""):
+                self.funding[sym] = float(data["r"])
+        elif et == "24hrTicker":
+            self.ticker[sym] = data
+
+    def take_closed(self):
+        """取出自上次呼叫以來收盤的 symbol，並重置事件。"""
+        closed, self.closed_symbols = self.closed_symbols, set()
+        self.bar_closed.clear()
+        return closed
+
+    def price(self, symbol: str) -> Optional[float]:
+        p = self.mark.get(symbol)
+        if p is None and symbol in self.ticker:
+            p = float(self.ticker[symbol].get("c", 0)) or None
+        return p
+
+    # ---------- latency ----------
+    def record_signal(self, symbol: str) -> Optional[float]:
+        """在策略算完後呼叫：回傳並記錄 tick（交易所事件時間）到訊號的延遲（ms）。"""
+        t = self._last_tick.get(symbol)
+        if not t or not t[0]:
+            return None
+        lat = time.time() * 1000 - t[0]
+        self._latency.append(lat)
+        return lat
+
+    def latency_summary(self) -> dict:
+        v = list(self._latency)
+        return {"n": len(v), "p50_ms": _pct(v, 0.5), "p99_ms": _pct(v, 0.99), "max_ms": max(v) if v else 0.0}
@@ -0,0 +1,139 @@
+# exchange/precision.py
+"""
+下單數量 / 價格的整數運算：交易對載入時把 stepSize / tickSize / min / max / minNotional
+換算成「以 10^-dp 為單位的整數」，之後的捨去、進位、上下限與最小名目檢查都是整數運算，
+送單字串也由整數直接格式化，不再每筆建立 Decimal、重新解析 filter。
+輸入可為 float / str / Decimal；結果與 Decimal(str(x)) 的十進位運算完全相同。
+"""
+import math
+from decimal import Decimal
+
+# float 快速路徑：乘上 10^dp 後離整數夠遠（相對誤差遠大於 float 精度）才直接取 floor
+_EPS = 1e-9
+_EXACT_INT = 2 ** 53
+
+
+def decimals(step) -> int:
+    """'0.00100' -> 5（依字串原樣的小數位數，與 Decimal 的 exponent 相同）；整數步進為 0。"""
+    exp = Decimal(str(step)).as_tuple().exponent
+    return max(0, -exp) if isinstance(exp, int) else 0
+
+
+def _parse(s: str, dp: int, up: bool) -> int:
+    """十進位字串 -> 以 10^-dp 為單位的整數（預設向 -inf 捨去，up=True 向 +inf 進位）。"""
+    s = s.strip()
+    neg = s.startswith("-")
+    if s[:1] in "+-":
+        s = s[1:]
+    exp = 0
+    k = s.find("e")
+    if k < 0:
+        k = s.find("E")
+    if k >= 0:
+        exp = int(s[k + 1:])
+        s = s[:k]
+    i = s.find(".")
+    if i >= 0:
+        digits, frac = s[:i] + s[i + 1:], len(s) - i - 1
+    else:
+        digits, frac = s, 0
+    n = int(digits or "0")
+    shift = dp + exp - frac
+    if shift >= 0:
+        return -n * 10 ** shift if neg else n * 10 ** shift
+    q, r = divmod(n, 10 ** -shift)
+    if neg:
+        return -q - 1 if (r and not up) else -q
+    return q + 1 if (r and up) else q
+
+
+def to_units(x, dp: int, up: bool = False) -> int:
+    """x -> 以 10^-dp 為單位的整數；預設無條件捨去（floor），up=True 無條件進位（ceil）。"""
+    if isinstance(x, float):
+        m = 10 ** dp
+        y = x * m
+        f = math.floor(y)
+        d = y - f
+        tol = _EPS * max(1.0, abs(y))
+        if tol < d < 1 - tol:
+            return f + 1 if up else f
+        # 貼近整數：r / 10^dp 若正好還原成 x，x 的最短十進位表示就是 r 個單位（常見：價格本來就在 tick 上）
+        r = round(y)
+        if abs(r) < _EXACT_INT and r / m == x:
+            return r
+        return _parse(repr(x), dp, up)
+    if isinstance(x, int):
+        return x * 10 ** dp
+    return _parse(str(x), dp, up)
+
+
+def fmt_units(u: int, dp: int) -> str:
+    """整數單位 -> 精確的十進位字串（小數位數固定為 dp，與 Decimal 的 str 相同）。"""
+    if dp <= 0:
+        return str(u)
+    s = str(abs(u)).rjust(dp + 1, "0")
+    return f"{'-' if u < 0 else ''}{s[:-dp]}.{s[-dp:]}"
+
+
+class SymbolPrecision:
+    """
+    單一交易對的整數精度表（由 SymbolMeta 建立一次，之後只做整數運算）。
+    數量以 10^-qty_dp、價格以 10^-price_dp 為單位；名目 = qty × price，單位 10^-(qty_dp + price_dp)。
+    """
+    __slots__ = ("symbol", "qty_dp", "step", "min_qty", "max_qty",
+                 "price_dp", "tick", "min_price", "max_price", "min_notional")
+
+    def __init__(self, symbol: str, step="0", min_qty="0", max_qty="0", tick="0",
+                 min_price="0", max_price="0", min_notional="0"):
+        self.symbol = symbol
+        self.qty_dp = decimals(step) if Decimal(str(step)) > 0 else 8
+        self.step = to_units(str(step), self.qty_dp)
+        self.min_qty = to_units(str(min_qty), self.qty_dp, up=True)
+        self.max_qty = to_units(str(max_qty), self.qty_dp)
+        self.price_dp = decimals(tick) if Decimal(str(tick)) > 0 else 8
+        self.tick = to_units(str(tick), self.price_dp)
+        self.min_price = to_units(str(min_price), self.price_dp, up=True)
+        self.max_price = to_units(str(max_price), self.price_dp)
+        self.min_notional = to_units(str(min_notional), self.qty_dp + self.price_dp, up=True)
+
+    @classmethod
+    def from_meta(cls, meta) -> "SymbolPrecision":
+        """市價單的數量限制取 LOT_SIZE 與 MARKET_LOT_SIZE 較嚴格者（同 SymbolMeta.market_constraints）。"""
+        step, min_qty, max_qty = meta.market_constraints()
+        return cls(meta.symbol, step, min_qty, max_qty, meta.tick_size,
+                   meta.min_price, meta.max_price, meta.min_notional)
+
+    # ---------- quantity ----------
+    def floor_qty(self, qty) -> int:
+        """超過上限取上限、依 stepSize 無條件捨去；低於 minQty 回傳 0。"""
+        u = to_units(qty, self.qty_dp)
+        if self.max_qty > 0 and u > self.max_qty:
+            u = self.max_qty
+        if self.step > 0:
+            u -= u % self.step
+        return u if u >= self.min_qty and u > 0 else 0
+
+    def qty_str(self, u: int) -> str:
+        return fmt_units(u, self.qty_dp)
+
+    def qty_float(self, u: int) -> float:
+        return u / 10 ** self.qty_dp
+
+    # ---------- price ----------
+    def round_price(self, price, up: bool = False) -> int:
+        """依 tickSize 對齊：買單向下、賣單向上（up=True），不會給出比指定更差的價格；超出範圍回傳 0。"""
+        u = to_units(price, self.price_dp, up=up)
+        if self.tick > 0:
+            r = u % self.tick
+            if r:
+                u += self.tick - r if up else -r
+        if u < self.min_price or (self.max_price > 0 and u > self.max_price) or u <= 0:
+            return 0
+        return u
+
+    def price_str(self, u: int) -> str:
+        return fmt_units(u, self.price_dp)
+
+    # ---------- notional ----------
+    def notional_ok(self, qty_u: int, price_u: int) -> bool:
+        return qty_u * price_u >= self.min_notional
@@ -0,0 +1,305 @@
+# exchange/rate_limiter.py
+import asyncio
+import multiprocessing as mp
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import config
+from monitor import log, metrics
+
+
+class WeightLimiter:
+    """
+    依 Binance request weight / order count 限制的預算控管：
+    - 每分鐘 weight 額度（與交易所一樣以整分鐘重置），order count 另計 10s / 1m。
+    - 回應 header（X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-*）回來時以交易所數字校正。
+    - 下單優先：行情類請求只能用到 (1 - ORDER_WEIGHT_RESERVE) 的額度，且有下單在排隊時先讓路。
+    - 收到 429 / 418 時依 Retry-After 暫停所有請求。
+    """
+
+    def __init__(self, weight_limit: int = None, order_limit_10s: int = None,
+                 order_limit_1m: int = None, reserve: float = None):
+        self.weight_limit = weight_limit or config.BINANCE_WEIGHT_LIMIT
+        self.order_limit_10s = order_limit_10s or config.BINANCE_ORDER_LIMIT_10S
+        self.order_limit_1m = order_limit_1m or config.BINANCE_ORDER_LIMIT_1M
+        self.reserve = config.ORDER_WEIGHT_RESERVE if reserve is None else reserve
+        self._win_1m = 0
+        self._win_10s = 0
+        self.used_weight = 0
+        self.orders_1m = 0
+        self.orders_10s = 0
+        self._blocked_until = 0.0
+        self._order_waiting = 0
+        self.throttled = 0
+        self.bans = 0
+
+    # ---------- window ----------
+    def _roll(self, now: float):
+        w1 = int(now // 60)
+        if w1 != self._win_1m:
+            self._win_1m = w1
+            self.used_weight = 0
+            self.orders_1m = 0
+        w10 = int(now // 10)
+        if w10 != self._win_10s:
+            self._win_10s = w10
+            self.orders_10s = 0
+
+    def _try_take(self, weight: int, orders: int, is_order: bool) -> float:
+        """可以送出就扣額度並回傳 0，否則回傳建議等待秒數。"""
+        now = time.time()
+        self._roll(now)
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if not is_order and self._order_waiting:
+            return 0.05
+        cap = self.weight_limit if is_order else int(self.weight_limit * (1 - self.reserve))
+        if self.used_weight + weight > cap:
+            return 60 - now % 60 + 0.01
+        if orders:
+            if self.orders_10s + orders > self.order_limit_10s:
+                return 10 - now % 10 + 0.01
+            if self.orders_1m + orders > self.order_limit_1m:
+                return 60 - now % 60 + 0.01
+        self.used_weight += weight
+        self.orders_10s += orders
+        self.orders_1m += orders
+        return 0.0
+
+    def _wait_order(self, n: int):
+        self._order_waiting += n
+
+    async def acquire(self, weight: int, orders: int = 0, is_order: bool = False):
+        if is_order:
+            self._wait_order(1)
+        try:
+            while True:
+                delay = self._try_take(weight, orders, is_order)
+                if delay <= 0:
+                    return
+                self.throttled += 1
+                await asyncio.sleep(delay)
+        finally:
+            if is_order:
+                self._wait_order(-1)
+
+    # ---------- server feedback ----------
+    def sync(self, headers: Optional[Dict[str, str]]):
+        """以回應 header 校正本地計數（交易所數字較大時採用交易所的）。"""
+        if not headers:
+            return
+        self._roll(time.time())
+        for k, v in headers.items():
+            k = k.lower()
+            try:
+                n = int(v)
+            except (TypeError, ValueError):
+                continue
+            if k == "x-mbx-used-weight-1m":
+                self.used_weight = max(self.used_weight, n)
+            elif k == "x-mbx-order-count-10s":
+                self.orders_10s = max(self.orders_10s, n)
+            elif k == "x-mbx-order-count-1m":
+                self.orders_1m = max(self.orders_1m, n)
+
+    def penalize(self, status: int, headers: Optional[Dict[str, str]] = None):
+        """429（超量）/ 418（IP 被封）：依 Retry-After 暫停所有請求。"""
+        retry_after = None
+        for k, v in (headers or {}).items():
+            if k.lower() == "retry-after":
+                try:
+                    retry_after = float(v)
+                except (TypeError, ValueError):
+                    pass
+        if retry_after is None:
+            retry_after = 60.0 if status == 418 else 60 - time.time() % 60
+        self._blocked_until = max(self._blocked_until, time.time() + retry_after)
+        self.bans += 1
+        log.warning("RATE", "HTTP %d: pause %.1fs", status, retry_after)
+
+    # ---------- metric ----------
+    def utilization(self) -> dict:
+        now = time.time()
+        self._roll(now)
+        return {
+            "weight_used": self.used_weight,
+            "weight_limit": self.weight_limit,
+            "weight_pct": round(100.0 * self.used_weight / self.weight_limit, 1) if self.weight_limit else 0.0,
+            "orders_10s": self.orders_10s,
+            "orders_1m": self.orders_1m,
+            "blocked_for": round(max(0.0, self._blocked_until - now), 2),
+            "throttled": self.throttled,
+            "bans": self.bans,
+        }
+
+
+class SharedBudget:
+    """
+    跨 process 共用的限流狀態（共享記憶體 + 鎖）：分片模式下由主 process 建立，
+    以 Process 參數傳給各 worker，所有 process 合計的 weight / order count 共用同一份額度。
+    下單排隊數每個 process 一格（waiting[slot]，主 process = 0、shard i = i + 1），讀取時加總：
+    process 死掉時只要把它那格歸零，不會留下永遠 > 0 的排隊數讓行情請求一直讓路。
+    """
+    FIELDS = ("_win_1m", "_win_10s", "used_weight", "orders_1m", "orders_10s", "_blocked_until")
+
+    def __init__(self, ctx=None, slots: int = None):
+        ctx = ctx or mp.get_context("spawn")
+        self.lock = ctx.Lock()
+        self.values = ctx.RawArray("d", len(self.FIELDS))
+        self.waiting = ctx.RawArray("d", slots or max(1, config.SHARD_WORKERS) + 1)
+
+    def recover(self, timeout: float = None, slots=()) -> bool:
+        """
+        worker 被終止 / 異常結束後由 coordinator 呼叫：SIGKILL 不會釋放 mp.Lock，
+        timeout 內拿不到鎖就視為死掉的 process 持有而強制釋放（mp.Lock 為 semaphore，可由其它 process release）；
+        slots 為死掉的 process 的下單排隊格，一併歸零。回傳是否有強制釋放。
+        """
+        timeout = config.SHARD_LOCK_TIMEOUT_S if timeout is None else timeout
+        held = self.lock.acquire(timeout=timeout)
+        if not held:
+            self.lock.release()
+        # 該格只有死掉的 process 會寫：不持鎖也可以直接歸零
+        for i in slots:
+            self.waiting[i] = 0.0
+        if held:
+            self.lock.release()
+        return not held
+
+
+# 拿不到共享鎖時暫存的回饋各自屬於哪個計數視窗（_blocked_until 不分視窗）
+_WINDOW = {"used_weight": "_win_1m", "orders_1m": "_win_1m", "orders_10s": "_win_10s"}
+_LOCK_POLL_S = 0.002
+
+
+class SharedWeightLimiter(WeightLimiter):
+    """
+    與 WeightLimiter 規則相同，但計數放在 SharedBudget：每次判斷前先載入共享數值、結束後寫回（持鎖）。
+    - 鎖只以非阻塞方式嘗試，拿不到就 await 後重試，不會卡住 event loop；
+      超過 SHARD_LOCK_TIMEOUT_S 仍拿不到（持鎖的 process 被終止）就以本地計數繼續限流
+    - 下單排隊數只記在本 process，持鎖時才寫到自己那格；gateway 有單在等時，所有 worker 的行情請求都會先讓路
+    - 拿不到鎖時的 header 校正 / 429 暫停先記在本地，下次持鎖時併入共享計數
+    """
+
+    def __init__(self, budget: SharedBudget, slot: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.budget = budget
+        self.slot = slot
+        self.lock_timeouts = 0
+        self._waiting = 0
+        self._pending: Dict[str, tuple] = {}
+        self._publisher: Optional[asyncio.Task] = None
+
+    # ---------- 共享狀態 ----------
+    def _load(self):
+        v = self.budget.values
+        for i, name in enumerate(SharedBudget.FIELDS):
+            setattr(self, name, v[i] if name == "_blocked_until" else int(v[i]))
+        self._merge_pending()
+        w = self.budget.waiting
+        w[self.slot] = max(0, self._waiting)
+        self._order_waiting = max(0, int(sum(w)))
+
+    def _store(self):
+        v = self.budget.values
+        for i, name in enumerate(SharedBudget.FIELDS):
+            v[i] = getattr(self, name)
+
+    def _remember(self, *names):
+        for n in names:
+            w = _WINDOW.get(n)
+            self._pending[n] = (getattr(self, w) if w else None, getattr(self, n))
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        self._roll(time.time())
+        for n, (win, val) in self._pending.items():
+            w = _WINDOW.get(n)
+            if w is None or getattr(self, w) == win:
+                setattr(self, n, max(getattr(self, n), val))
+        self._pending.clear()
+
+    @contextmanager
+    def _shared(self):
+        """非阻塞拿鎖：拿到就載入共享計數、結束後寫回並 yield True；拿不到 yield False（沿用本地計數）。"""
+        if not self.budget.lock.acquire(False):
+            yield False
+            return
+        try:
+            self._load()
+            try:
+                yield True
+            finally:
+                self._store()
+        finally:
+            self.budget.lock.release()
+
+    def _on_timeout(self):
+        self.lock_timeouts += 1
+        metrics.inc("shared_budget_lock_timeouts_total")
+        log.warning("RATE", "shared budget lock timeout; using local counters", rate=True)
+
+    async def _publish(self):
+        """下單排隊數變動後盡快寫到共享格（拿不到鎖就稍後重試）。"""
+        while True:
+            with self._shared() as held:
+                pass
+            if held:
+                return
+            await asyncio.sleep(_LOCK_POLL_S)
+
+    # ---------- WeightLimiter ----------
+    async def acquire(self, weight: int, orders: int = 0, is_order: bool = False):
+        if is_order:
+            self._wait_order(1)
+        try:
+            deadline = time.monotonic() + config.SHARD_LOCK_TIMEOUT_S
+            while True:
+                with self._shared() as held:
+                    if held:
+                        delay = WeightLimiter._try_take(self, weight, orders, is_order)
+                    elif time.monotonic() >= deadline:
+                        self._on_timeout()
+                        delay = WeightLimiter._try_take(self, weight, orders, is_order)
+                        self._remember("used_weight", "orders_1m", "orders_10s")
+                    else:
+                        delay = None
+                if delay is None:
+                    await asyncio.sleep(_LOCK_POLL_S)
+                    continue
+                if delay <= 0:
+                    return
+                self.throttled += 1
+                await asyncio.sleep(delay)
+                deadline = time.monotonic() + config.SHARD_LOCK_TIMEOUT_S
+        finally:
+            if is_order:
+                self._wait_order(-1)
+
+    def _wait_order(self, n: int):
+        self._waiting = max(0, self._waiting + n)
+        with self._shared() as held:
+            pass
+        if not held and (self._publisher is None or self._publisher.done()):
+            try:
+                self._publisher = asyncio.get_running_loop().create_task(self._publish())
+            except RuntimeError:
+                pass    # 沒有 event loop：下次持鎖時寫入
+
+    def sync(self, headers: Optional[Dict[str, str]]):
+        if headers:
+            with self._shared() as held:
+                super().sync(headers)
+                if not held:
+                    self._remember("used_weight", "orders_1m", "orders_10s")
+
+    def penalize(self, status: int, headers: Optional[Dict[str, str]] = None):
+        with self._shared() as held:
+            super().penalize(status, headers)
+            if not held:
+                self._remember("_blocked_until")
+
+    def utilization(self) -> dict:
+        with self._shared():
+            return super().utilization()
@@ -0,0 +1,168 @@
+# exchange/symbol_registry.py
+import asyncio
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import config
+from exchange.precision import SymbolPrecision
+from monitor import log
+
+
+def _D(x) -> Decimal:
+    return Decimal(str(x)) if x not in (None, "") else Decimal("0")
+
+
+@dataclass(frozen=True)
+class SymbolMeta:
+    """單一交易對已解析好的下單限制（LOT_SIZE / MARKET_LOT_SIZE / PRICE_FILTER / MIN_NOTIONAL）。"""
+    symbol: str
+    status: str = ""
+    quote_asset: str = ""
+    contract_type: str = ""
+    step_size: Decimal = Decimal("0")
+    min_qty: Decimal = Decimal("0")
+    max_qty: Decimal = Decimal("0")
+    market_step_size: Decimal = Decimal("0")
+    market_min_qty: Decimal = Decimal("0")
+    market_max_qty: Decimal = Decimal("0")
+    tick_size: Decimal = Decimal("0")
+    min_price: Decimal = Decimal("0")
+    max_price: Decimal = Decimal("0")
+    min_notional: Decimal = Decimal("0")
+    raw: dict = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_info(cls, s: dict) -> "SymbolMeta":
+        kw = {}
+        for f in s.get("filters", []):
+            ft = f.get("filterType")
+            if ft == "LOT_SIZE":
+                kw["step_size"] = _D(f.get("stepSize"))
+                kw["min_qty"] = _D(f.get("minQty"))
+                kw["max_qty"] = _D(f.get("maxQty"))
+            elif ft == "MARKET_LOT_SIZE":
+                kw["market_step_size"] = _D(f.get("stepSize"))
+                kw["market_min_qty"] = _D(f.get("minQty"))
+                kw["market_max_qty"] = _D(f.get("maxQty"))
+            elif ft == "PRICE_FILTER":
+                kw["tick_size"] = _D(f.get("tickSize"))
+                kw["min_price"] = _D(f.get("minPrice"))
+                kw["max_price"] = _D(f.get("maxPrice"))
+            elif ft == "MIN_NOTIONAL":
+                kw["min_notional"] = _D(f.get("notional", f.get("minNotional", "0")))
+        return cls(
+            symbol=s.get("symbol", ""),
+            status=s.get("status", ""),
+            quote_asset=s.get("quoteAsset", ""),
+            contract_type=s.get("contractType", ""),
+            raw=s,
+            **kw,
+        )
+
+    def market_constraints(self):
+        """市價單實際適用的 (step, minQty, maxQty)：取 LOT_SIZE 與 MARKET_LOT_SIZE 較嚴格者。"""
+        step = max(self.step_size, self.market_step_size)
+        min_qty = max(self.min_qty, self.market_min_qty)
+        caps = [q for q in (self.max_qty, self.market_max_qty) if q > 0]
+        max_qty = min(caps) if caps else Decimal("0")
+        return step, min_qty, max_qty
+
+
+class SymbolRegistry:
+    """
+    交易對資訊快取：啟動時載入一次 exchange_info，之後依 TTL 於背景刷新。
+    下單時的數量量化只做記憶體查表，不再每筆下載整包 exchange_info；
+    載入時一併把 filter 換算成整數精度表（SymbolPrecision），熱路徑不再解析字串。
+    同時記錄每個交易對最後一次成功設定的槓桿，避免重複送出 change_leverage。
+    """
+
+    def __init__(self, client, ttl: int = None):
+        self.client = client
+        self.ttl = ttl if ttl is not None else config.SYMBOL_INFO_TTL
+        self._meta: Dict[str, SymbolMeta] = {}
+        self._prec: Dict[str, SymbolPrecision] = {}
+        self._leverage: Dict[str, int] = {}
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- load / refresh ----------
+    @property
+    def loaded(self) -> bool:
+        return bool(self._meta)
+
+    def is_stale(self) -> bool:
+        return not self._meta or (time.monotonic() - self._loaded_at) >= self.ttl
+
+    async def load(self) -> int:
+        """下載 exchange_info 並重建索引，回傳交易對數量。"""
+        async with self._lock:
+            info = await self.client.exchange_info()
+            meta = {}
+            for s in (info or {}).get("symbols", []):
+                m = SymbolMeta.from_info(s)
+                if m.symbol:
+                    meta[m.symbol] = m
+            if meta:
+                # 整包替換，讀取端不會看到半更新的狀態
+                self._prec = {k: SymbolPrecision.from_meta(m) for k, m in meta.items()}
+                self._meta = meta
+                self._loaded_at = time.monotonic()
+            return len(self._meta)
+
+    async def ensure_loaded(self):
+        # 只有尚未載入時才在熱路徑上補抓；過期交給背景任務刷新
+        if self._meta:
+            return
+        try:
+            if self._lock.locked():
+                # 其它協程正在載入：等它完成即可，不重複下載
+                async with self._lock:
+                    return
+            await self.load()
+        except Exception as e:
+            log.error("REGISTRY", "load error: %s", e)
+
+    def start(self):
+        """啟動背景 TTL 刷新任務（需在 event loop 內呼叫）。"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(max(1, self.ttl))
+            try:
+                n = await self.load()
+                if config.DEBUG_MODE:
+                    log.info("REGISTRY", "refreshed %d symbols", n)
+            except Exception as e:
+                log.error("REGISTRY", "refresh error: %s", e)
+
+    # ---------- lookup ----------
+    def get(self, symbol: str) -> Optional[SymbolMeta]:
+        return self._meta.get(symbol)
+
+    def precision(self, symbol: str) -> Optional[SymbolPrecision]:
+        return self._prec.get(symbol)
+
+    def symbols(self) -> List[str]:
+        return list(self._meta.keys())
+
+    # ---------- leverage ----------
+    def leverage(self, symbol: str) -> Optional[int]:
+        return self._leverage.get(symbol)
+
+    def set_leverage(self, symbol: str, leverage: int):
+        self._leverage[symbol] = int(leverage)
@@ -1,7 +1,10 @@
 # filters/symbol_filter.py
 import asyncio
-from typing import List
+from typing import Dict, List, Optional
 from decimal import Decimal
+
+import numpy as np
+
 import config
 
 async def _metrics_for(client, symbol: str):
@@ -19,12 +22,75 @@ async def _metrics_for(client, symbol: str):
         vol = Decimal("0")
     return symbol, funding, vol
 
-async def shortlist(client, max_candidates: int = 8) -> List[str]:
+def universe(client=None) -> List[str]:
     """
-    以 funding rate & 24h quote volume 過濾，
-    若不達標則以成交量排序回退。
+    掃描範圍：
+    - pool：config.SYMBOL_POOL
+    - all ：registry 內所有 TRADING 的 USDT 永續（registry 未載入時回傳空）
+    兩者皆扣除 SYMBOL_DENYLIST；結果為空時 shortlist 也是空的（不退回全市場 ticker）。
     """
-    tasks = [ _metrics_for(client, s) for s in config.SYMBOL_POOL ]
+    deny = set(config.SYMBOL_DENYLIST)
+    if config.SYMBOL_UNIVERSE == "all":
+        reg = getattr(client, "registry", None)
+        syms = []
+        for s in (reg.symbols() if reg is not None else []):
+            m = reg.get(s)
+            if m.quote_asset == "USDT" and m.contract_type == "PERPETUAL" and m.status == "TRADING":
+                syms.append(s)
+    else:
+        syms = list(config.SYMBOL_POOL)
+    return [s for s in syms if s not in deny]
+
+def build_table(tickers: list, premiums: list, symbols: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    把全市場 ticker / premium index 轉成欄式表格：
+    symbol / quote_volume / funding / price_change_pct（皆為 NumPy 陣列，同一列同一幣）。
+    symbols 為 None 時取 ticker 中所有 USDT 交易對（扣除 denylist）；空 list 則回傳空表。
+    """
+    funding_by = {}
+    for p in premiums or []:
+        try:
+            funding_by[p["symbol"]] = float(p.get("lastFundingRate") or 0.0)
+        except (KeyError, TypeError, ValueError):
+            continue
+    tick_by = {t.get("symbol"): t for t in tickers or [] if t.get("symbol")}
+    if symbols is None:
+        deny = set(config.SYMBOL_DENYLIST)
+        symbols = [s for s in tick_by if s.endswith("USDT") and s not in deny]
+
+    n = len(symbols)
+    vol = np.zeros(n, dtype=np.float64)
+    chg = np.zeros(n, dtype=np.float64)
+    fund = np.zeros(n, dtype=np.float64)
+    for i, s in enumerate(symbols):
+        t = tick_by.get(s)
+        if t:
+            try:
+                vol[i] = float(t.get("quoteVolume") or 0.0)
+                chg[i] = float(t.get("priceChangePercent") or 0.0)
+            except (TypeError, ValueError):
+                pass
+        fund[i] = funding_by.get(s, 0.0)
+    return {
+        "symbol": np.asarray(symbols, dtype=object),
+        "quote_volume": vol,
+        "funding": fund,
+        "price_change_pct": chg,
+    }
+
+def rank(table: Dict[str, np.ndarray], max_candidates: int) -> List[str]:
+    """向量化篩選：達標者依成交量排序；無人達標則退回成交量最高者。"""
+    vol = table["quote_volume"]
+    if vol.size == 0:
+        return []
+    order = np.argsort(-vol, kind="stable")
+    ok = (table["funding"] >= config.FUNDING_RATE_MIN) & (vol >= config.VOLUME_MIN_USD)
+    approved = order[ok[order]]
+    pick = approved if approved.size else order
+    return table["symbol"][pick[:max_candidates]].tolist()
+
+async def _shortlist_per_symbol(client, symbols: List[str], max_candidates: int) -> List[str]:
+    tasks = [ _metrics_for(client, s) for s in symbols ]
     res = await asyncio.gather(*tasks, return_exceptions=True)
     rows = []
     for r in res:
@@ -42,3 +108,22 @@ async def shortlist(client, max_candidates: int = 8) -> List[str]:
     # fallback：取最高成交量
     rows.sort(key=lambda x: x[2], reverse=True)
     return [s for s,_,_ in rows[:max_candidates]]
+
+async def shortlist(client, max_candidates: int = 8) -> List[str]:
+    """
+    以 funding rate & 24h quote volume 過濾，
+    若不達標則以成交量排序回退。
+    使用全市場 bulk 端點：每輪固定 2 個請求（與幣數無關）。
+    """
+    syms = universe(client)
+    if not syms:
+        return []
+    tickers, premiums = await asyncio.gather(
+        client.get_all_24h_stats(), client.get_all_premium_index()
+    )
+    if tickers is None or premiums is None:
+        # bulk 端點失敗：退回逐幣查詢
+        return await _shortlist_per_symbol(client, syms, max_candidates)
+
+    table = build_table(tickers, premiums, syms)
+    return rank(table, max_candidates)
@@ -1,70 +1,335 @@
 # main.py
 import asyncio
+import signal
 import time
-import traceback
 
 from config import (
-    API_KEY, API_SECRET, SYMBOL_POOL, SCAN_INTERVAL, DEBUG_MODE,
-    LEVERAGE, MAX_PYRAMID, TRAILING_GIVEBACK_PCT, MAX_LOSS_PCT
+    API_KEY, API_SECRET, SYMBOL_POOL, SCAN_INTERVAL,
+    LEVERAGE, MAX_PYRAMID, TRAILING_GIVEBACK_PCT, MAX_LOSS_PCT, MARKET_DATA_MODE, SHORTLIST_MAX,
+    KLINE_INTERVAL, KLINE_LIMIT, BATCH_EVAL, METRICS_ENABLED, USER_STREAM_ENABLED,
+    EXIT_ENGINE_ENABLED, SCHEDULER_MODE, RESAMPLE_ENABLED, TREND_CONFIRM_INTERVAL, SHARD_WORKERS
 )
+from engine.pipeline import SymbolPipeline
+from engine.scheduler import CandleScheduler
+from engine.shards import ShardCoordinator
 from exchange.binance_client import BinanceClient
+from exchange.rate_limiter import SharedBudget, SharedWeightLimiter
+from exchange.market_stream import MarketStream
+from position.position_mgr import PositionManager
+from position.user_stream import UserStream
+from risk.exit_engine import ExitEngine
 from risk.risk_mgr import RiskManager
 from filters.symbol_filter import shortlist
-from strategies.trend import generate_trend_signal, should_pyramid
+from strategies.trend import generate_trend_signal, should_pyramid, trend_bias
 from strategies.revert import generate_revert_signal
+from strategies.batch import evaluate_symbols
+from strategies.klines import closed_klines
+from monitor import journal, log, metrics
 
-async def manage_symbol(client, rm, symbol):
-    try:
-        # 設定槓桿（若已設定過，交易所會忽略）
-        await client.change_leverage(symbol, LEVERAGE)
+def position_gate(pm, symbol, sig):
+    """
+    依即時持倉決定 (是否進場, 是否允許加碼)：
+    已有同向持倉就不重複進場，加碼次數達 MAX_PYRAMID 後不再加碼；沒有持倉資訊時維持原行為。
+    """
+    if pm is None:
+        return True, MAX_PYRAMID > 0
+    st = pm.get(symbol)
+    if st.side == sig:
+        return False, st.add_count < MAX_PYRAMID
+    return True, MAX_PYRAMID > 0
+
+def to_intent(pm, symbol, sig, pyramid):
+    """訊號 -> (symbol, side, 單位數)；單位數 = 進場 + 加碼，0 代表不下單。"""
+    enter, can_add = position_gate(pm, symbol, sig)
+    if not enter:
+        log.info("HOLD", "%s 已持有 %s（加碼 %d/%d）", symbol, sig, pm.get(symbol).add_count, MAX_PYRAMID, rate=True)
+    units = int(enter) + int(bool(pyramid and can_add))
+    return (symbol, sig, units) if units else None
+
+async def confirmed_trend(client, symbol):
+    """進場週期的趨勢訊號；設定 TREND_CONFIRM_INTERVAL 時需與較高週期方向一致。"""
+    trend = await generate_trend_signal(client, symbol)
+    if trend and TREND_CONFIRM_INTERVAL:
+        # 多週期確認：進場週期的趨勢訊號需與較高週期方向一致
+        bias = await trend_bias(client, symbol, TREND_CONFIRM_INTERVAL)
+        if bias != trend:
+            log.debug("FILTER", "%s trend %s vs %s %s", symbol, trend, TREND_CONFIRM_INTERVAL, bias)
+            trend = None
+    return trend
 
-        trend = await generate_trend_signal(client, symbol)
-        revert = await generate_revert_signal(client, symbol)
+def _no_track(stage):
+    pass
+
+async def scan_symbol(client, symbol, pm=None, track=None):
+    """只做評估不下單：回傳下單意圖 (symbol, side, 單位數) 或 None；track(stage) 標記目前階段（逾時回報用）。"""
+    track = track or _no_track
+    try:
+        # 先取一次 K 線，trend / revert 並行評估時共用同一份快取
+        track("klines")
+        await client.get_klines(symbol, interval=KLINE_INTERVAL, limit=KLINE_LIMIT)
+        track("signals")
+        trend, revert = await asyncio.gather(
+            confirmed_trend(client, symbol), generate_revert_signal(client, symbol)
+        )
         sig = trend or revert
 
+        if client.stream is not None:
+            lat = client.stream.record_signal(symbol)
+            if lat is not None:
+                log.debug("LATENCY", "%s tick->signal %.1fms", symbol, lat)
+
         if not sig:
-            print(f"[SKIP] {symbol} 無交易訊號")
-            return
+            log.debug("SKIP", "%s 無交易訊號", symbol, rate=True)
+            return None
 
-        print(f"[EXEC] {symbol} side={sig}")
-        res = await rm.execute_trade(symbol, sig)
-        if res:
-            print(f"[ORDER OK] {symbol}: {res}")
-        else:
-            print(f"[ORDER FAIL] {symbol}")
+        # 依照你的設計：突破加碼（持倉允許時才檢查）
+        track("pyramid")
+        _, can_add = position_gate(pm, symbol, sig)
+        pyramid = can_add and await should_pyramid(client, symbol, side_long=(sig == "LONG"))
+        intent = to_intent(pm, symbol, sig, pyramid)
+        journal.record("signal", symbol=symbol, side=sig, trend=trend, revert=revert,
+                       pyramid=bool(pyramid), units=intent[2] if intent else 0)
+        return intent
 
-        # 依照你的設計：突破加碼
-        if await should_pyramid(client, symbol, side_long=(sig == "LONG")):
-            print(f"[PYRAMID] add one more unit {symbol}")
-            await rm.execute_trade(symbol, sig)
+    except Exception as e:
+        log.error("ERROR", "scan_symbol %s: %s", symbol, e, exc=e)
+        return None
 
+async def submit_intents(client, rm, intents):
+    """整輪的進場 / 加碼先一次規劃，再以 batchOrders（每次 5 筆）並行送出。"""
+    if not intents:
+        return []
+    try:
+        # 設定槓桿（已設定過的 symbol 不會再送請求）
+        await asyncio.gather(*(client.change_leverage(s, LEVERAGE) for s, _, _ in intents))
+        for s, sig, units in intents:
+            log.info("EXEC", "%s side=%s units=%d", s, sig, units)
+        plans = await rm.execute_batch(intents)
     except Exception as e:
-        print(f"[ERROR] manage_symbol {symbol}: {e}\n{traceback.format_exc()}")
+        log.error("ERROR", "submit_intents: %s", e, exc=e)
+        return []
+    for p in plans:
+        if p.ok:
+            log.info("ORDER OK", "%s %s: %s", p.symbol, p.kind, p.result)
+        else:
+            log.warning("ORDER FAIL", "%s %s: %s", p.symbol, p.kind, p.error)
+    return plans
+
+async def manage_symbol(client, rm, symbol, pm=None):
+    intent = await scan_symbol(client, symbol, pm)
+    if intent:
+        await submit_intents(client, rm, [intent])
+
+async def batch_evaluate(client, candidates, pm=None, budget_s=None):
+    """批次模式：一次抓齊 K 線，以 (symbols × bars) 矩陣向量化評估，回傳有訊號的下單意圖。"""
+    async def fetch(s, track):
+        track("klines")
+        try:
+            kl = await client.get_klines(s, interval=KLINE_INTERVAL, limit=KLINE_LIMIT)
+        except Exception as e:
+            log.error("ERROR", "klines %s: %s", s, e)
+            return None
+        kl = closed_klines(client, kl)
+        return (s, kl) if kl else None
+
+    # 抓取同樣有並行上限與截止時間；逾時的 symbol 本輪不評估
+    got = dict(await SymbolPipeline(name="batch").run(candidates, fetch, budget_s=budget_s))
+    syms = [s for s in candidates if s in got]
+    signals = evaluate_symbols(syms, [got[s] for s in syms])
+    fired = [(s, sig, pyr) for s, (sig, pyr) in signals.items() if sig]
+    log.debug("BATCH", "evaluated %d symbols, %d signals", len(signals), len(fired))
+    intents = []
+    for s, sig, pyr in fired:
+        intent = to_intent(pm, s, sig, pyr)
+        journal.record("signal", symbol=s, side=sig, pyramid=bool(pyr), units=intent[2] if intent else 0,
+                       source="batch")
+        if intent:
+            intents.append(intent)
+    return intents
+
+async def batch_scan(client, rm, candidates, pm=None):
+    await submit_intents(client, rm, await batch_evaluate(client, candidates, pm))
+
+async def evaluate_targets(client, targets, durations, pm=None, budget_s=None):
+    """評估本輪的 symbol，回傳下單意圖清單（不下單；分片模式的 worker 也走這裡）。"""
+    if BATCH_EVAL:
+        return await batch_evaluate(client, targets, pm, budget_s)
+    return await SymbolPipeline().run(
+        targets, lambda s, track: scan_symbol(client, s, pm, track),
+        budget_s=budget_s, durations=durations,
+    )
+
+async def manage_symbols(client, rm, targets, durations, pm=None, budget_s=None):
+    """評估 + 下單：逐 symbol 管線評估，意圖一出現就送單（批次評估模式則整輪一起送）。"""
+    if BATCH_EVAL:
+        return await submit_intents(client, rm, await batch_evaluate(client, targets, pm, budget_s))
+    return await SymbolPipeline().run(
+        targets, lambda s, track: scan_symbol(client, s, pm, track),
+        submit=lambda intents: submit_intents(client, rm, intents),
+        budget_s=budget_s, durations=durations,
+    )
+
+def regate(pm, intents):
+    """worker 沒有持倉資訊（單位數 = 進場 + 是否加碼）：gateway 以即時持倉重新決定。"""
+    out = []
+    for s, sig, units in intents:
+        i = to_intent(pm, s, sig, units > 1)
+        journal.record("signal", symbol=s, side=sig, pyramid=units > 1, units=i[2] if i else 0, source="shard")
+        if i:
+            out.append(i)
+    return out
+
+def report_overrun(elapsed, durations, budget):
+    metrics.inc("scan_overrun_total")
+    slowest = sorted(durations.items(), key=lambda x: x[1], reverse=True)[:5]
+    detail = ", ".join(f"{s}={d:.1f}s" for s, d in slowest)
+    log.warning("OVERRUN", "cycle %.1fs > budget %.0fs; slowest: %s", elapsed, budget, detail)
+
+def report_rate(client):
+    util = client.limiter.utilization()
+    metrics.gauge("binance_weight_used", util["weight_used"])
+    metrics.gauge("binance_weight_utilization_pct", util["weight_pct"])
+    log.debug("RATE", "%s", util)
+
+async def sharded_scanner(client, rm, budget, pm=None):
+    """分片模式：本 process 只做 shortlist 與下單 gateway，行情與策略評估交給 worker process。"""
+    shards = ShardCoordinator(
+        budget, on_intents=lambda intents: submit_intents(client, rm, regate(pm, intents))
+    )
+    try:
+        while True:
+            try:
+                with metrics.span("shortlist"):
+                    candidates = await shortlist(client, max_candidates=SHORTLIST_MAX)
+            except Exception as e:
+                log.error("ERROR", "shortlist: %s", e)
+                candidates = SYMBOL_POOL
+            shards.update(candidates)
+            if not shards.started:
+                shards.start()
+            report_rate(client)
+            if log.enabled(log.DEBUG):
+                for h in shards.health():
+                    log.debug("SHARD", "%s", h)
+            await asyncio.sleep(SCAN_INTERVAL)
+    finally:
+        shards.stop()
 
 async def scanner():
-    client = BinanceClient(API_KEY, API_SECRET, testnet=False)  # 是否用 TESTNET 可改 config.TESTNET
+    # 分片模式：所有 process 共用同一份限流額度
+    budget = SharedBudget() if SHARD_WORKERS > 1 else None
+    client = BinanceClient(  # 是否用 TESTNET 可改 config.TESTNET
+        API_KEY, API_SECRET, testnet=False,
+        limiter=SharedWeightLimiter(budget) if budget is not None else None
+    )
     rm = RiskManager(client)
 
+    # 啟動時載入交易對資訊一次，之後背景依 TTL 刷新
+    try:
+        n = await client.registry.load()
+        log.info("REGISTRY", "loaded %d symbols", n)
+    except Exception as e:
+        log.error("ERROR", "registry load: %s", e)
+    client.registry.start()
+
+    # 帳戶 user data stream：即時持倉，避免盲目重複進場 / 超量加碼
+    pm = None
+    if USER_STREAM_ENABLED:
+        pm = PositionManager()
+        UserStream(client, pm, on_account=lambda _msg: rm.account.invalidate()).start()
+    # 逐 tick 追蹤停利 / 最大虧損（需要即時持倉）
+    exits = None
+    if pm is not None and EXIT_ENGINE_ENABLED:
+        exits = ExitEngine(client, pm)
+        exits.start()
+
+    if METRICS_ENABLED:
+        await metrics.start_http_server()
+        asyncio.create_task(metrics.summary_loop())
+
+    if budget is not None:
+        return await sharded_scanner(client, rm, budget, pm)
+
+    # 對齊 K 線收盤：每根只評估一次，且收盤後立刻評估
+    sched = None
+    if SCHEDULER_MODE == "candle":
+        sched = CandleScheduler(client)
+        sched.add(KLINE_INTERVAL)
+        await sched.start()
+
+    candidates = SYMBOL_POOL
     while True:
+        dues = await sched.next_due(client.stream) if sched is not None else None
         start = time.time()
-        try:
-            candidates = await shortlist(client, max_candidates=len(SYMBOL_POOL))
-        except Exception as e:
-            print(f"[ERROR] shortlist: {e}")
-            candidates = SYMBOL_POOL
+        client.klines.new_cycle()
+        durations = {}
+        # 只是補評估上次還沒收盤的 symbol 時，沿用上一輪的候選清單
+        if dues is None or any(not d.retry for d in dues):
+            try:
+                with metrics.span("shortlist"):
+                    candidates = await shortlist(client, max_candidates=SHORTLIST_MAX)
+            except Exception as e:
+                log.error("ERROR", "shortlist: %s", e)
+                candidates = SYMBOL_POOL
+
+            if MARKET_DATA_MODE == "ws":
+                if client.stream is None:
+                    # 重採樣模式只訂閱 base 週期，較高週期由 BarAggregator 合成
+                    client.stream = MarketStream(
+                        client, candidates, interval=client.bars.base if RESAMPLE_ENABLED else None
+                    )
+                    client.stream.start()
+                else:
+                    await client.stream.update_symbols(candidates)
 
+        targets = candidates
+        if dues is not None:
+            targets = await sched.collect_all(candidates, dues)
+            if log.enabled(log.DEBUG):
+                desc = ", ".join(f"{d.interval}@{d.boundary}{' retry' if d.retry else ''}" for d in dues)
+                log.debug("SCHED", "%s: %d/%d symbols closed", desc, len(targets), len(candidates))
+
+        budget = sched.budget_s() if sched is not None else SCAN_INTERVAL
         try:
-            tasks = [ manage_symbol(client, rm, s) for s in candidates ]
-            await asyncio.gather(*tasks, return_exceptions=True)
+            # 評估與下單重疊：有意圖就先送，逾時的 symbol 取消並回報
+            await manage_symbols(client, rm, targets, durations, pm, budget_s=budget)
         except Exception as e:
-            print(f"[ERROR] scanner: {e}\n{traceback.format_exc()}")
+            log.error("ERROR", "scanner: %s", e, exc=e)
 
         elapsed = time.time() - start
+        metrics.observe("scan_cycle_ms", elapsed * 1000)
+        if elapsed > budget:
+            report_overrun(elapsed, durations, budget)
+        report_rate(client)
+        if log.enabled(log.DEBUG):
+            if exits is not None:
+                log.debug("EXIT", "%s", exits.latency_summary())
+            if client.stream is not None:
+                log.debug("LATENCY", "%s", client.stream.latency_summary())
+        if sched is not None:
+            continue
+
         wait = max(1, int(SCAN_INTERVAL - elapsed))
-        await asyncio.sleep(wait)
+        if client.stream is not None:
+            # 串流模式：K 線一收盤就喚醒，不必等滿 SCAN_INTERVAL
+            try:
+                await asyncio.wait_for(client.stream.bar_closed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            client.stream.take_closed()
+        else:
+            await asyncio.sleep(wait)
+
+def _exit_on_term(signum, frame):
+    # SIGTERM 不會跑 atexit：轉成 SystemExit，結束前把交易日誌與日誌寫完
+    raise SystemExit(0)
 
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, _exit_on_term)
     try:
         asyncio.run(scanner())
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, SystemExit):
         print("exiting")
+    finally:
+        journal.close()
+        log.close()
@@ -0,0 +1,60 @@
+# monitor/journal.py
+"""
+交易日誌（append-only JSONL，TRADE_JOURNAL 指定路徑，空字串 = 關閉）：
+每個訊號、計算出的下單數量、送出的下單請求與交易所回應各記一行，
+{"seq", "mono_ns", "ts", "pid", "kind", ...}；mono_ns 為 time.monotonic_ns()，同一 process 內可精確排序 / 算延遲。
+寫檔在背景 thread（monitor.log.AsyncWriter），呼叫端只做一次 queue put；
+queue 不設上限、結束時等全部寫完（與一般日誌不同，交易紀錄一筆都不丟）。
+kind：signal / size / order / response / error
+"""
+import json
+import os
+import time
+from itertools import count
+
+import config
+from monitor.log import AsyncWriter
+
+_seq = count(1)
+_pid = os.getpid()
+_writer = None
+
+
+def _open():
+    d = os.path.dirname(config.TRADE_JOURNAL)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    return open(config.TRADE_JOURNAL, "a", encoding="utf-8")
+
+
+def _fmt(rec: dict) -> str:
+    return json.dumps(rec, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+def enabled() -> bool:
+    return bool(config.TRADE_JOURNAL)
+
+
+def record(kind: str, **fields) -> int:
+    """附上序號與單調時間後排入寫檔 queue，回傳序號（回應以 req=序號 對應請求）；未啟用時回傳 0。"""
+    global _writer
+    if not config.TRADE_JOURNAL:
+        return 0
+    if _writer is None:
+        _writer = AsyncWriter(_open, _fmt, "journal-writer", max_queue=0, close_timeout=None)
+    rec = {"seq": next(_seq), "mono_ns": time.monotonic_ns(), "ts": round(time.time(), 6),
+           "pid": _pid, "kind": kind}
+    rec.update(fields)
+    _writer.put(rec)
+    return rec["seq"]
+
+
+def flush(timeout: float = 2.0):
+    if _writer is not None:
+        _writer.flush(timeout)
+
+
+def close():
+    """寫完所有排隊的紀錄才返回（正常結束與 SIGTERM 都會呼叫）。"""
+    if _writer is not None:
+        _writer.close(None)
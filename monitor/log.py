@@ -0,0 +1,224 @@
+# monitor/log.py
+"""
+非阻塞日誌：呼叫端只把 record 丟進 queue，格式化（含 % 參數與 traceback）與寫出都在背景 thread。
+    from monitor import log
+    log.info("REGISTRY", "loaded %d symbols", n)
+    log.debug("SKIP", "%s 無交易訊號", symbol, rate=True)   # 同一 tag 每 LOG_RATE_WINDOW_S 秒最多 LOG_RATE_BURST 筆
+    log.error("ERROR", "scan_symbol %s: %s", symbol, e, exc=e)
+- LOG_LEVEL 以下的呼叫只多一次整數比較（DEBUG_MODE=false 時預設 INFO，debug 幾乎零成本）
+- LOG_FORMAT=text 輸出與原本 print 相同的 "[TAG] 訊息"，json 則每行一筆（ts / level / tag / msg / 額外欄位）
+- queue 超過 LOG_QUEUE_MAX 筆時丟棄並計數，不讓日誌拖慢交易路徑（交易日誌 monitor/journal.py 不設上限、不丟棄）
+"""
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+_LEVELS = {v: k for k, v in _NAMES.items()}
+
+level = _LEVELS.get(config.LOG_LEVEL.upper(), INFO)
+
+
+class AsyncWriter:
+    """
+    背景 thread 寫檔：put() 只做 queue 操作；thread 一次取出所有排隊項目，格式化後一次寫出並 flush。
+    max_queue：None = LOG_QUEUE_MAX，0 = 不設上限（不丟棄）；close_timeout：結束時等寫完的秒數，None = 等到寫完。
+    """
+
+    def __init__(self, open_stream: Callable, fmt: Callable[[object], str], name: str,
+                 max_queue: int = None, close_timeout: Optional[float] = 2.0):
+        self.open_stream = open_stream
+        self.fmt = fmt
+        self.name = name
+        self.max_queue = config.LOG_QUEUE_MAX if max_queue is None else max_queue
+        self.close_timeout = close_timeout
+        self.q: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.dropped = 0
+        self.written = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, item) -> bool:
+        if self._thread is None:
+            self._start()
+        if self.max_queue and self.q.qsize() >= self.max_queue:
+            self.dropped += 1
+            return False
+        self.q.put(item)
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.close, self.close_timeout)
+
+    def _run(self):
+        stream = self.open_stream()
+        dropped = 0
+        while True:
+            item = self.q.get()
+            batch = [item]
+            try:
+                while len(batch) < 1024:
+                    batch.append(self.q.get_nowait())
+            except queue.Empty:
+                pass
+            stop = batch[-1] is None
+            lines, marks = [], []
+            for it in batch:
+                if it is None:
+                    continue
+                if isinstance(it, threading.Event):
+                    marks.append(it)
+                    continue
+                try:
+                    lines.append(self.fmt(it))
+                except Exception as e:
+                    lines.append(f"[LOG] format error: {e!r}")
+            if self.dropped != dropped:
+                lines.append(f"[LOG] dropped {self.dropped - dropped} records (queue full)")
+                dropped = self.dropped
+            if lines:
+                try:
+                    stream.write("\n".join(lines) + "\n")
+                    stream.flush()
+                    self.written += len(lines)
+                except Exception:
+                    pass
+            for m in marks:
+                m.set()
+            if stop:
+                return
+
+    def flush(self, timeout: float = 2.0):
+        """等目前排隊的項目寫完（測試 / 關閉前用）。"""
+        if self._thread is None:
+            return
+        mark = threading.Event()
+        self.q.put(mark)
+        mark.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 2.0):
+        """送出結束標記並等背景 thread 寫完；timeout=None 一直等。"""
+        t = self._thread
+        if t is not None and t.is_alive():
+            self.q.put(None)
+            t.join(timeout)
+
+
+# ---------- 日誌 record ----------
+# (wall time, level, tag, msg, args, fields, exc)
+Record = Tuple[float, int, str, str, tuple, Optional[dict], Optional[BaseException]]
+
+
+def _text(rec: Record) -> str:
+    ts, lvl, tag, msg, args, fields, exc = rec
+    out = f"[{tag}] {msg % args if args else msg}"
+    if fields:
+        out += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+    if exc is not None:
+        out += "\n" + "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)).rstrip()
+    return out
+
+
+def _json(rec: Record) -> str:
+    ts, lvl, tag, msg, args, fields, exc = rec
+    d = {"ts": round(ts, 6), "level": _NAMES.get(lvl, str(lvl)), "tag": tag,
+         "msg": msg % args if args else msg}
+    if fields:
+        d.update(fields)
+    if exc is not None:
+        d["exc"] = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+    return json.dumps(d, ensure_ascii=False, default=str)
+
+
+def _open_log():
+    if config.LOG_FILE:
+        d = os.path.dirname(config.LOG_FILE)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        return open(config.LOG_FILE, "a", encoding="utf-8")
+    return sys.stdout
+
+
+_writer = AsyncWriter(_open_log, _json if config.LOG_FORMAT == "json" else _text, "log-writer")
+
+# ---------- 重複訊息限流 ----------
+_rate: Dict[str, List[float]] = {}    # tag -> [視窗起點, 本視窗筆數, 被略過筆數]
+
+
+def _allow(tag: str, fields: Optional[dict]) -> Tuple[bool, Optional[dict]]:
+    now = time.monotonic()
+    st = _rate.get(tag)
+    if st is None or now - st[0] >= config.LOG_RATE_WINDOW_S:
+        suppressed = st[2] if st is not None else 0
+        _rate[tag] = [now, 1, 0]
+        if suppressed:
+            fields = dict(fields or {}, suppressed=int(suppressed))
+        return True, fields
+    if st[1] < config.LOG_RATE_BURST:
+        st[1] += 1
+        return True, fields
+    st[2] += 1
+    return False, fields
+
+
+def _emit(lvl: int, tag: str, msg: str, args: tuple, fields: dict, exc, rate: bool):
+    if rate:
+        ok, fields = _allow(tag, fields)
+        if not ok:
+            return
+    _writer.put((time.time(), lvl, tag, msg, args, fields or None, exc))
+
+
+def enabled(lvl: int) -> bool:
+    return lvl >= level
+
+
+def set_level(lvl: int):
+    global level
+    level = lvl
+
+
+def debug(tag: str, msg: str, *args, rate: bool = False, **fields):
+    if DEBUG >= level:
+        _emit(DEBUG, tag, msg, args, fields, None, rate)
+
+
+def info(tag: str, msg: str, *args, rate: bool = False, **fields):
+    if INFO >= level:
+        _emit(INFO, tag, msg, args, fields, None, rate)
+
+
+def warning(tag: str, msg: str, *args, rate: bool = False, **fields):
+    if WARNING >= level:
+        _emit(WARNING, tag, msg, args, fields, None, rate)
+
+
+def error(tag: str, msg: str, *args, exc: BaseException = None, rate: bool = False, **fields):
+    """exc 給例外物件時附上 traceback（在背景 thread 格式化）。"""
+    if ERROR >= level:
+        _emit(ERROR, tag, msg, args, fields, exc, rate)
+
+
+def flush(timeout: float = 2.0):
+    _writer.flush(timeout)
+
+
+def close(timeout: float = 2.0):
+    _writer.close(timeout)
+
+
+def stats() -> dict:
+    return {"queued": _writer.q.qsize(), "written": _writer.written, "dropped": _writer.dropped}
@@ -0,0 +1,216 @@
+# monitor/metrics.py
+"""
+熱路徑量測：延遲直方圖、呼叫 / 錯誤計數、gauge，並以 Prometheus 文字格式輸出。
+METRICS_ENABLED=false 時 span / timed 只多一次 bool 判斷，幾乎零成本。
+"""
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+
+import config
+from monitor import log
+
+ENABLED = config.METRICS_ENABLED
+
+# 延遲分桶（ms）
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: dict) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(BUCKETS, ms)] += 1
+        self.sum += ms
+        self.count += 1
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q: float) -> float:
+        """以分桶上界估算分位數。"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return float(BUCKETS[i]) if i < len(BUCKETS) else self.max
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self.hist: Dict[LabelKey, Histogram] = {}
+        self.counters: Dict[LabelKey, float] = {}
+        self.gauges: Dict[LabelKey, float] = {}
+
+    def observe(self, name: str, ms: float, **labels):
+        k = _key(name, labels)
+        h = self.hist.get(k)
+        if h is None:
+            h = self.hist[k] = Histogram()
+        h.observe(ms)
+
+    def inc(self, name: str, n: float = 1, **labels):
+        k = _key(name, labels)
+        self.counters[k] = self.counters.get(k, 0) + n
+
+    def set(self, name: str, value: float, **labels):
+        self.gauges[_key(name, labels)] = value
+
+    def reset(self):
+        self.hist.clear()
+        self.counters.clear()
+        self.gauges.clear()
+
+
+METRICS = Registry()
+
+
+# ---------- API ----------
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+
+def observe(name: str, ms: float, **labels):
+    if ENABLED:
+        METRICS.observe(name, ms, **labels)
+
+
+def inc(name: str, n: float = 1, **labels):
+    if ENABLED:
+        METRICS.inc(name, n, **labels)
+
+
+def gauge(name: str, value: float, **labels):
+    if ENABLED:
+        METRICS.set(name, value, **labels)
+
+
+class _Span:
+    __slots__ = ("name", "labels", "t0")
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        METRICS.observe(f"{self.name}_ms", (time.perf_counter() - self.t0) * 1000, **self.labels)
+        METRICS.inc(f"{self.name}_total", **self.labels)
+        if exc_type is not None and exc_type is not asyncio.CancelledError:
+            METRICS.inc(f"{self.name}_errors_total", **self.labels)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **labels):
+    """with span("shortlist"): ...  -> shortlist_ms 直方圖 + shortlist_total / _errors_total 計數"""
+    return _Span(name, labels) if ENABLED else _NOOP
+
+
+def timed(name: str, **labels):
+    """async 函式的 span 裝飾器。"""
+    def deco(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return await fn(*args, **kwargs)
+            with _Span(name, labels):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+# ---------- export ----------
+def _fmt_labels(labels, extra: Optional[dict] = None) -> str:
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render_prometheus() -> str:
+    lines = []
+    for (name, labels), v in sorted(METRICS.counters.items()):
+        lines.append(f"{name}{_fmt_labels(labels)} {v}")
+    for (name, labels), v in sorted(METRICS.gauges.items()):
+        lines.append(f"{name}{_fmt_labels(labels)} {v}")
+    for (name, labels), h in sorted(METRICS.hist.items()):
+        acc = 0
+        for b, c in zip(BUCKETS, h.counts):
+            acc += c
+            lines.append(f"{name}_bucket{_fmt_labels(labels, {'le': b})} {acc}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, {'le': '+Inf'})} {h.count}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {round(h.sum, 3)}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {h.count}")
+    return "\n".join(lines) + "\n"
+
+
+def summary() -> dict:
+    out = {}
+    for (name, labels), h in sorted(METRICS.hist.items()):
+        key = name + _fmt_labels(labels)
+        out[key] = {"n": h.count, "avg": round(h.sum / h.count, 2) if h.count else 0.0,
+                    "p50": h.quantile(0.5), "p99": h.quantile(0.99), "max": round(h.max, 2)}
+    for (name, labels), v in sorted(METRICS.counters.items()):
+        if name.endswith("_errors_total"):
+            out[name + _fmt_labels(labels)] = v
+    return out
+
+
+async def start_http_server(port: int = None, host: str = None):
+    """本地 /metrics 端點（Prometheus 文字格式，預設只綁 METRICS_HOST=127.0.0.1）；回傳 runner。"""
+    from aiohttp import web
+
+    async def handle(_req):
+        return web.Response(text=render_prometheus(), content_type="text/plain")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    host = host or config.METRICS_HOST
+    await web.TCPSite(runner, host, port or config.METRICS_PORT).start()
+    log.info("METRICS", "serving on %s:%s/metrics", host, port or config.METRICS_PORT)
+    return runner
+
+
+async def summary_loop(interval: float = None):
+    """定期印出摘要（p50 / p99 / 錯誤數）。"""
+    interval = interval or config.METRICS_SUMMARY_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        for k, v in summary().items():
+            log.info("METRICS", "%s %s", k, v)
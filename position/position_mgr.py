@@ -1,15 +1,45 @@
-from dataclasses import dataclass, field
-from typing import Dict
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List
 
 @dataclass
 class PosState:
     peak_profit_pct: float = 0.0   # 進場後最高的利潤%
     add_count: int = 0             # 已加碼次數
     last_breakout_price: float = 0.0  # 最近一次突破加碼的觸發價（避免連續觸發）
+    qty: float = 0.0               # 持倉數量（正 = 多、負 = 空）
+    entry_price: float = 0.0       # 持倉均價
+    realized_pnl: float = 0.0      # 累計已實現損益（跨多次開平倉）
+    unrealized_pnl: float = 0.0
+    update_time: int = 0           # 最後一次更新的交易所時間（ms），用來丟棄過期事件
+
+    @property
+    def is_open(self) -> bool:
+        return self.qty != 0
+
+    @property
+    def side(self) -> str:
+        if self.qty > 0:
+            return "LONG"
+        if self.qty < 0:
+            return "SHORT"
+        return ""
 
 class PositionManager:
+    """
+    記憶體內的持倉狀態：由 user data stream 的 ORDER_TRADE_UPDATE / ACCOUNT_UPDATE 即時維護，
+    啟動與重連時以 positionRisk 對帳。查詢皆為 O(1) dict 存取，不打 HTTP。
+    """
+
     def __init__(self):
         self.state: Dict[str, PosState] = {}
+        # 已計入加碼判斷的 orderId（同一張單分多筆成交只算一次）
+        self._seen_orders = set()
+        self._seen_fifo = deque()
+        # 只由成交事件推進的持倉數量（加碼判斷用）
+        self._ledger: Dict[str, float] = {}
+        # 持倉數量 / 均價變動時通知（例如出場引擎重算觸發價）
+        self.listeners: List[Callable[[str, PosState], None]] = []
 
     def get(self, symbol: str) -> PosState:
         if symbol not in self.state:
@@ -18,3 +48,109 @@ class PositionManager:
 
     def reset(self, symbol: str):
         self.state[symbol] = PosState()
+        self._ledger.pop(symbol, None)
+
+    def open_positions(self) -> List[str]:
+        return [s for s, p in self.state.items() if p.is_open]
+
+    def _notify(self, symbol: str, st: PosState):
+        for fn in self.listeners:
+            fn(symbol, st)
+
+    # ---------- 持倉更新 ----------
+    def _flat(self, st: PosState):
+        # 平倉後歸零加碼 / 追蹤狀態，保留累計已實現損益
+        st.qty = 0.0
+        st.entry_price = 0.0
+        st.unrealized_pnl = 0.0
+        st.add_count = 0
+        st.peak_profit_pct = 0.0
+        st.last_breakout_price = 0.0
+
+    def apply_position(self, symbol: str, amt: float, entry: float, ts: int = 0,
+                       unrealized: float = 0.0) -> PosState:
+        """以交易所的權威持倉覆蓋本地狀態（ACCOUNT_UPDATE / positionRisk）。"""
+        st = self.get(symbol)
+        if ts and ts < st.update_time:
+            return st
+        if amt == 0:
+            self._flat(st)
+        else:
+            if st.qty == 0 or (st.qty > 0) != (amt > 0):
+                # 新開倉或反手：加碼計數重來
+                self._flat(st)
+            st.qty = amt
+            st.entry_price = entry
+            st.unrealized_pnl = unrealized
+        if ts:
+            st.update_time = ts
+        self._notify(symbol, st)
+        return st
+
+    def _mark_order(self, order_id) -> bool:
+        """第一次看到該 orderId 時回傳 True。"""
+        if order_id in self._seen_orders:
+            return False
+        self._seen_orders.add(order_id)
+        self._seen_fifo.append(order_id)
+        if len(self._seen_fifo) > 5000:
+            self._seen_orders.discard(self._seen_fifo.popleft())
+        return True
+
+    def apply_fill(self, symbol: str, side: str, qty: float, realized: float = 0.0,
+                   order_id=None) -> PosState:
+        """
+        單筆成交（ORDER_TRADE_UPDATE）：累計已實現損益並判斷是否為加碼。
+        持倉數量 / 均價以 ACCOUNT_UPDATE 為準；交易所常先推 ACCOUNT_UPDATE 再推成交，
+        所以加碼判斷用只由成交推進的 _ledger，不受兩種事件先後順序影響。
+        """
+        st = self.get(symbol)
+        st.realized_pnl += realized
+        if qty <= 0:
+            return st
+        delta = qty if side == "BUY" else -qty
+        before = self._ledger.get(symbol, 0.0)
+        if before != 0 and (before > 0) == (delta > 0):
+            # 同向成交 = 加碼；同一張單分多筆成交只算一次
+            if order_id is None or self._mark_order(order_id):
+                st.add_count += 1
+        elif order_id is not None:
+            self._mark_order(order_id)
+        self._ledger[symbol] = before + delta
+        return st
+
+    def reconcile(self, rows: Iterable[dict]):
+        """REST positionRisk 對帳：不在回應中或數量為 0 的 symbol 視為空手。"""
+        seen = set()
+        for r in rows:
+            sym = r.get("symbol")
+            if not sym:
+                continue
+            amt = float(r.get("positionAmt") or 0)
+            if sym in seen and amt == 0:
+                # 雙向持倉模式下同 symbol 會有多列，只取非 0 的
+                continue
+            seen.add(sym)
+            self._ledger[sym] = amt
+            self.apply_position(sym, amt, float(r.get("entryPrice") or 0),
+                                unrealized=float(r.get("unRealizedProfit") or 0))
+        for sym, st in self.state.items():
+            if sym not in seen:
+                self._ledger.pop(sym, None)
+                if st.is_open:
+                    self._flat(st)
+                    self._notify(sym, st)
+
+    # ---------- user data stream 事件 ----------
+    def on_order_update(self, msg: dict):
+        o = msg.get("o") or {}
+        if o.get("x") != "TRADE":
+            return
+        self.apply_fill(o["s"], o.get("S", ""), float(o.get("l") or 0),
+                        realized=float(o.get("rp") or 0), order_id=o.get("i"))
+
+    def on_account_update(self, msg: dict):
+        ts = int(msg.get("T") or msg.get("E") or 0)
+        for p in (msg.get("a") or {}).get("P", []):
+            self.apply_position(p["s"], float(p.get("pa") or 0), float(p.get("ep") or 0), ts=ts,
+                                unrealized=float(p.get("up") or 0))
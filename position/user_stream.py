@@ -0,0 +1,122 @@
+# position/user_stream.py
+import asyncio
+import json
+from typing import Callable, Optional
+
+import aiohttp
+
+import config
+from monitor import log
+from position.position_mgr import PositionManager
+
+
+class UserStream:
+    """
+    帳戶 user data stream：以 listenKey 連線，ORDER_TRADE_UPDATE / ACCOUNT_UPDATE
+    即時寫入 PositionManager；背景定期續期 listenKey。
+    每次（重）連線先連 ws 再以 positionRisk 對帳，對帳期間到達的事件留在 socket 之後依序套用。
+    """
+
+    def __init__(self, client, positions: PositionManager, url: str = None,
+                 on_account: Optional[Callable[[dict], None]] = None):
+        self.client = client
+        self.positions = positions
+        self.url = (url or config.USER_STREAM_URL).rstrip("/")
+        # ACCOUNT_UPDATE 時額外通知（例如讓帳戶快照失效）
+        self.on_account = on_account
+        self.connected = False
+        self.reconnects = 0
+        self.listen_key: Optional[str] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.listen_key:
+            try:
+                await self.client.close_listen_key(self.listen_key)
+            except Exception:
+                pass
+            self.listen_key = None
+
+    async def _run_forever(self):
+        delay = config.WS_RECONNECT_DELAY
+        while True:
+            try:
+                await self._run_once()
+                delay = config.WS_RECONNECT_DELAY
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("USER", "error: %s", e)
+            self.connected = False
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    async def _run_once(self):
+        self.listen_key = await self.client.new_listen_key()
+        keepalive = asyncio.create_task(self._keepalive())
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.ws_connect(f"{self.url}/ws/{self.listen_key}", heartbeat=30) as ws:
+                    self._ws = ws
+                    self.connected = True
+                    log.info("USER", "connected")
+                    await self.reconcile()
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            if self.handle(json.loads(msg.data)) == "expired":
+                                break
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+        finally:
+            keepalive.cancel()
+            self._ws = None
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(config.LISTEN_KEY_KEEPALIVE)
+            try:
+                await self.client.renew_listen_key(self.listen_key)
+            except Exception as e:
+                # 續期失敗：關閉連線，外層重連時會換新的 listenKey
+                log.warning("USER", "keepalive failed: %s", e)
+                if self._ws is not None and not self._ws.closed:
+                    await self._ws.close()
+                return
+
+    async def reconcile(self):
+        rows = await self.client.get_position_risk()
+        if rows is None:
+            log.warning("USER", "reconcile failed: positionRisk unavailable")
+            return
+        self.positions.reconcile(rows)
+        if config.DEBUG_MODE:
+            log.info("USER", "reconciled, open=%s", self.positions.open_positions())
+
+    # ---------- events ----------
+    def handle(self, msg: dict) -> Optional[str]:
+        et = msg.get("e")
+        if et == "ORDER_TRADE_UPDATE":
+            self.positions.on_order_update(msg)
+        elif et == "ACCOUNT_UPDATE":
+            self.positions.on_account_update(msg)
+            if self.on_account is not None:
+                self.on_account(msg)
+        elif et == "listenKeyExpired":
+            log.warning("USER", "listenKey expired, reconnecting")
+            return "expired"
+        return None
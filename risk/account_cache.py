@@ -0,0 +1,99 @@
+# risk/account_cache.py
+import asyncio
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import config
+
+
+class AccountCache:
+    """
+    帳戶 / 價格快照快取：
+    - single-flight：同一時間多個協程要同一份資料，只會送出一個請求，其餘共用結果
+    - equity / 可用保證金在 ACCOUNT_CACHE_TTL 秒內直接取快取；成交後 invalidate
+    - 本地保證金預留：下單在途時先扣掉，避免同一輪多筆併發下單超額配置
+    金額 / 價格一律存成 float（交易所字串只在取得時轉一次），sizing 熱路徑不建 Decimal。
+    """
+
+    def __init__(self, client, ttl: float = None, price_ttl: float = None):
+        self.client = client
+        self.ttl = config.ACCOUNT_CACHE_TTL if ttl is None else ttl
+        self.price_ttl = config.PRICE_CACHE_TTL if price_ttl is None else price_ttl
+        self._balance: Optional[Tuple[float, float]] = None   # (equity, available)
+        self._balance_ts = 0.0
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._reserved: Dict[int, float] = {}
+        self._ids = itertools.count(1)
+
+    # ---------- single-flight ----------
+    async def _single_flight(self, key: str, fn: Callable[[], Awaitable]):
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = asyncio.ensure_future(fn())
+        self._inflight[key] = fut
+        try:
+            return await asyncio.shield(fut)
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+    # ---------- balance ----------
+    async def _fetch_balance(self) -> Tuple[float, float]:
+        getter = getattr(self.client, "get_balance_snapshot", None)
+        if getter is not None:
+            snap = await getter()
+            bal = (float(snap["balance"]), float(snap["available"]))
+        else:
+            eq = float(await self.client.get_equity())
+            bal = (eq, eq)
+        if bal[0] > 0:
+            self._balance = bal
+            self._balance_ts = time.monotonic()
+        return bal
+
+    async def _snapshot(self) -> Tuple[float, float]:
+        if self._balance is not None and time.monotonic() - self._balance_ts < self.ttl:
+            return self._balance
+        return await self._single_flight("balance", self._fetch_balance)
+
+    async def equity(self) -> float:
+        return (await self._snapshot())[0]
+
+    async def available(self) -> float:
+        """可用保證金（已扣除本地在途預留）。"""
+        _, avail = await self._snapshot()
+        return max(0.0, avail - sum(self._reserved.values()))
+
+    def invalidate(self):
+        self._balance_ts = 0.0
+
+    # ---------- price ----------
+    async def price(self, symbol: str) -> Optional[float]:
+        hit = self._prices.get(symbol)
+        if hit is not None and time.monotonic() - hit[1] < self.price_ttl:
+            return hit[0]
+
+        async def _fetch():
+            p = await self.client.get_price(symbol)
+            if p:
+                p = float(p)
+                self._prices[symbol] = (p, time.monotonic())
+            return p
+
+        return await self._single_flight(f"price:{symbol}", _fetch)
+
+    # ---------- margin reservation ----------
+    def reserve(self, margin: float) -> int:
+        rid = next(self._ids)
+        self._reserved[rid] = margin
+        return rid
+
+    def release(self, rid: int):
+        self._reserved.pop(rid, None)
+
+    @property
+    def reserved(self) -> float:
+        return sum(self._reserved.values())
@@ -0,0 +1,192 @@
+# risk/exit_engine.py
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import aiohttp
+import numpy as np
+
+import config
+from monitor import journal, log, metrics
+from position.position_mgr import PositionManager, PosState
+
+
+class _Watch:
+    """單一持倉的出場門檻（以價格表示，tick 只需比較兩個 float）。"""
+    __slots__ = ("symbol", "sign", "qty", "entry", "peak", "peak_pct", "stop", "trigger", "closing")
+
+    def __init__(self, symbol: str, qty: float, entry: float):
+        self.symbol = symbol
+        self.sign = 1 if qty > 0 else -1
+        self.qty = qty
+        self.entry = entry
+        self.peak = entry          # 進場後最有利的標記價格
+        self.peak_pct = 0.0
+        self.stop = 0.0
+        self.trigger = 0.0
+        self.closing = False
+
+
+class ExitEngine:
+    """
+    逐 tick 出場：訂閱全市場標記價格（!markPrice@arr@1s），對每個持倉維護
+    「最大虧損價」與「追蹤停利價」，價格穿越門檻就立刻送出 reduce-only 市價平倉。
+    - 門檻只在創新高（低）或持倉變動時重算；一般 tick 只有一次 dict 查詢加兩次比較
+    - 沒有持倉的 symbol 在 dict 查詢就被略過，不解析價格
+    - 利潤% 為保證金報酬率（價格變動 × 槓桿），與 MAX_LOSS_PCT / TRAILING_GIVEBACK_PCT 同單位
+    """
+
+    def __init__(self, client, positions: PositionManager, leverage: float = None,
+                 max_loss_pct: float = None, giveback_pct: float = None,
+                 activation_pct: float = None, url: str = None):
+        self.client = client
+        self.positions = positions
+        self.leverage = float(leverage or config.LEVERAGE)
+        self.max_loss = config.MAX_LOSS_PCT if max_loss_pct is None else max_loss_pct
+        self.giveback = config.TRAILING_GIVEBACK_PCT if giveback_pct is None else giveback_pct
+        self.activation = config.TRAILING_ACTIVATION_PCT if activation_pct is None else activation_pct
+        self.url = (url or config.WS_BASE_URL).rstrip("/")
+        self.watches: Dict[str, _Watch] = {}
+        self.ticks = 0
+        self.exits = 0
+        self.connected = False
+        self._latency = deque(maxlen=1000)
+        self._pending = set()
+        self._task: Optional[asyncio.Task] = None
+        positions.listeners.append(self.on_position)
+        for sym, st in positions.state.items():
+            self.on_position(sym, st)
+
+    # ---------- 持倉同步 ----------
+    def on_position(self, symbol: str, st: PosState):
+        if not st.is_open:
+            self.watches.pop(symbol, None)
+            return
+        w = self.watches.get(symbol)
+        if w is None or (w.qty > 0) != (st.qty > 0):
+            w = self.watches[symbol] = _Watch(symbol, st.qty, st.entry_price)
+        else:
+            # 加碼 / 減倉：均價變動，沿用原本的最佳價格；數量變了才解除平倉鎖定
+            if st.qty != w.qty:
+                w.closing = False
+            w.qty = st.qty
+            w.entry = st.entry_price
+        self._recompute(w)
+
+    def _recompute(self, w: _Watch):
+        s, lev, entry = w.sign, self.leverage, w.entry
+        if entry <= 0:
+            w.trigger = 0.0 if s > 0 else float("inf")
+            return
+        w.peak_pct = s * (w.peak / entry - 1) * lev
+        w.stop = entry * (1 - s * self.max_loss / lev)
+        w.trigger = w.stop
+        if w.peak_pct >= self.activation:
+            trail = entry * (1 + s * w.peak_pct * (1 - self.giveback) / lev)
+            w.trigger = max(w.stop, trail) if s > 0 else min(w.stop, trail)
+        st = self.positions.state.get(w.symbol)
+        if st is not None:
+            st.peak_profit_pct = w.peak_pct
+
+    # ---------- ticks ----------
+    def on_mark(self, symbol: str, price: float, event_ms: int = 0):
+        w = self.watches.get(symbol)
+        if w is None or w.closing:
+            return
+        s = w.sign
+        if (price - w.peak) * s > 0:
+            w.peak = price
+            self._recompute(w)
+        if (price - w.trigger) * s <= 0:
+            self._fire(w, price, event_ms)
+
+    def feed(self, msg):
+        """處理 markPriceUpdate frame（單筆、陣列或 combined stream 包裝）。"""
+        data = msg.get("data", msg) if isinstance(msg, dict) else msg
+        items = data if isinstance(data, list) else (data,)
+        self.ticks += len(items)
+        watches = self.watches
+        for d in items:
+            sym = d.get("s")
+            if sym in watches:
+                self.on_mark(sym, float(d["p"]), int(d.get("E", 0)))
+
+    # ---------- 平倉 ----------
+    def _fire(self, w: _Watch, price: float, event_ms: int):
+        w.closing = True
+        reason = "max_loss" if w.trigger == w.stop else "trailing"
+        task = asyncio.get_running_loop().create_task(self._close(w, price, event_ms, reason))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _close(self, w: _Watch, price: float, event_ms: int, reason: str):
+        if event_ms:
+            submit = time.time() * 1000 - event_ms
+            metrics.observe("exit_tick_to_submit_ms", submit, reason=reason)
+        log.info("EXIT", "%s %s mark=%s trigger=%.6g peak=%.2f%% qty=%s",
+                 w.symbol, reason, price, w.trigger, w.peak_pct * 100, w.qty)
+        journal.record("signal", symbol=w.symbol, side="CLOSE", reason=reason, mark=price,
+                       trigger=w.trigger, qty=w.qty, source="exit")
+        try:
+            res = await self.client.close_position(w.symbol, w.qty)
+        except Exception as e:
+            res = None
+            log.error("EXIT", "close error %s: %s", w.symbol, e)
+        if not res:
+            # 送單失敗：解除鎖定，下一個 tick 會再試
+            w.closing = False
+            metrics.inc("exit_errors_total", reason=reason)
+            return
+        self.exits += 1
+        metrics.inc("exit_total", reason=reason)
+        if event_ms:
+            lat = time.time() * 1000 - event_ms
+            self._latency.append(lat)
+            metrics.observe("exit_tick_to_order_ms", lat, reason=reason)
+
+    def latency_summary(self) -> dict:
+        v = np.asarray(self._latency, dtype=np.float64)
+        if not v.size:
+            return {"n": 0, "exits": self.exits, "ticks": self.ticks}
+        return {"n": int(v.size), "exits": self.exits, "ticks": self.ticks,
+                "p50_ms": float(np.percentile(v, 50)), "p99_ms": float(np.percentile(v, 99)),
+                "max_ms": float(v.max())}
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_forever())
+        return self._task
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self):
+        delay = config.WS_RECONNECT_DELAY
+        while True:
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.ws_connect(f"{self.url}/ws/!markPrice@arr@1s", heartbeat=30) as ws:
+                        self.connected = True
+                        delay = config.WS_RECONNECT_DELAY
+                        log.info("EXIT", "mark price stream connected")
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self.feed(json.loads(msg.data))
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("EXIT", "stream error: %s", e)
+            self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
@@ -1,46 +1,166 @@
 # risk/risk_mgr.py
-from decimal import Decimal, getcontext
-from typing import Optional
+import asyncio
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
 import config
 from exchange.binance_client import BinanceClient
+from monitor import journal, log, metrics
+from risk.account_cache import AccountCache
 
-getcontext().prec = 28
+BATCH_MAX = 5   # batchOrders 每次最多 5 筆
+
+@dataclass
+class OrderPlan:
+    """一筆待送出的市價單；qty 為已量化的送單字串，kind = entry（進場）或 pyramid（加碼）。"""
+    symbol: str
+    side: str
+    qty: str
+    margin: float
+    kind: str = "entry"
+    rid: Optional[int] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.result is not None
 
 class RiskManager:
-    def __init__(self, client: BinanceClient, equity_ratio: float = None):
+    def __init__(self, client: BinanceClient, equity_ratio: float = None,
+                 account_ttl: float = None, price_ttl: float = None):
         self.client = client
-        self.equity_ratio = Decimal(str(equity_ratio if equity_ratio is not None else config.EQUITY_RATIO))
+        self.equity_ratio = float(equity_ratio if equity_ratio is not None else config.EQUITY_RATIO)
+        # 併發的 manage_symbol 共用同一份 balance / price，不再每單各打一次
+        self.account = AccountCache(client, ttl=account_ttl, price_ttl=price_ttl)
 
-    async def get_order_qty(self, symbol: str) -> Decimal:
-        price = await self.client.get_price(symbol)
+    async def _qty_for(self, symbol: str, price: float, equity: float,
+                       available: float) -> Tuple[Optional[str], float]:
+        """回傳 (送單數量字串或 None, 所需保證金)；量化與最小名目檢查都是整數運算。"""
+        # 名目資金分配與槓桿；不得超過扣除在途預留後的可用保證金
+        margin = min(equity * self.equity_ratio, available)
+        if margin <= 0:
+            return None, 0.0
+        leverage = config.LEVERAGE
+        raw_qty = margin * leverage / price
+
+        # 量化成交易所允許的步進（SymbolPrecision：整數單位，不建 Decimal）
+        prec = await self.client.get_precision(symbol)
+        if prec is None:
+            return None, 0.0
+        u = prec.floor_qty(raw_qty)
+        if u <= 0 or (prec.min_notional and not prec.notional_ok(u, prec.round_price(price) or 0)):
+            qty = None
+        else:
+            qty = prec.qty_str(u)
+        journal.record("size", symbol=symbol, price=price, equity=equity, available=available,
+                       margin=margin, raw_qty=raw_qty, qty=qty)
+        if qty is None:
+            return None, 0.0
+        return qty, prec.qty_float(u) * price / leverage
+
+    async def _size(self, symbol: str) -> Tuple[Optional[str], float]:
+        """回傳 (下單數量字串, 所需保證金)。"""
+        price = await self.account.price(symbol)
         if not price or price <= 0:
-            return Decimal("0")
+            return None, 0.0
 
-        equity = await self.client.get_equity()
+        equity = await self.account.equity()
         if equity <= 0:
-            return Decimal("0")
+            return None, 0.0
+        return await self._qty_for(symbol, price, equity, await self.account.available())
 
-        # 名目資金分配與槓桿
-        notional = Decimal(str(equity)) * self.equity_ratio
-        raw_qty = (notional * Decimal(str(config.LEVERAGE))) / Decimal(str(price))
-
-        # 量化成交易所允許的步進
-        q = await self.client._quantize_qty(symbol, raw_qty)
-        return q
+    async def get_order_qty(self, symbol: str) -> Decimal:
+        qty, _ = await self._size(symbol)
+        return Decimal(qty) if qty else Decimal("0")
 
+    @metrics.timed("execute_trade")
     async def execute_trade(self, symbol: str, side: str):
+        if side not in ("LONG", "SHORT"):
+            log.warning("RISK", "Unknown side %s", side)
+            return None
+        rid = None
         try:
-            qty = await self.get_order_qty(symbol)
-            if qty <= 0:
-                print(f"[RISK] qty too small: {symbol}")
+            qty, margin = await self._size(symbol)
+            if not qty:
+                log.info("RISK", "qty too small: %s", symbol)
                 return None
+            rid = self.account.reserve(margin)
             if side == "LONG":
-                return await self.client.open_long(symbol, qty)
-            elif side == "SHORT":
-                return await self.client.open_short(symbol, qty)
+                order = await self.client.open_long(symbol, qty)
             else:
-                print(f"[RISK] Unknown side {side}")
-                return None
+                order = await self.client.open_short(symbol, qty)
+            if order:
+                # 成交後餘額已變動：先讓快照失效再釋放預留，避免中間空窗被重複配置
+                self.account.invalidate()
+            return order
         except Exception as e:
-            print(f"[RISK] execute_trade error {symbol}: {e}")
+            log.error("RISK", "execute_trade error %s: %s", symbol, e, exc=e)
             return None
+        finally:
+            if rid is not None:
+                self.account.release(rid)
+
+    # ---------- 批次下單 ----------
+    async def plan_orders(self, intents: Iterable[Tuple[str, str, int]]) -> List[OrderPlan]:
+        """
+        先算完整輪要送的單：intents 為 (symbol, side, 單位數)，單位數 = 進場 + 加碼。
+        價格 / 權益並行取得（同一份快照），保證金依序從可用餘額扣除並預留，不會超額配置。
+        """
+        intents = [(s, side, n) for s, side, n in intents if side in ("LONG", "SHORT") and n > 0]
+        if not intents:
+            return []
+        equity = await self.account.equity()
+        if equity <= 0:
+            return []
+        prices = await asyncio.gather(*(self.account.price(s) for s, _, _ in intents))
+        available = await self.account.available()
+        plans = []
+        try:
+            for (symbol, side, units), price in zip(intents, prices):
+                if not price or price <= 0:
+                    continue
+                for i in range(units):
+                    qty, margin = await self._qty_for(symbol, price, equity, available)
+                    if not qty:
+                        log.info("RISK", "qty too small: %s", symbol)
+                        break
+                    available -= margin
+                    plan = OrderPlan(symbol, side, qty, margin, kind="entry" if i == 0 else "pyramid")
+                    plan.rid = self.account.reserve(margin)
+                    plans.append(plan)
+        except Exception:
+            for p in plans:
+                self.account.release(p.rid)
+            raise
+        return plans
+
+    async def _submit_chunk(self, chunk: List[OrderPlan]):
+        orders = [self.client.market_order(p.symbol, p.side, p.qty) for p in chunk]
+        try:
+            results = await self.client.new_batch_orders(orders)
+        except Exception as e:
+            results = [{"msg": str(e)}] * len(chunk)
+        for p, r in zip(chunk, results):
+            if isinstance(r, dict) and "orderId" in r:
+                p.result = r
+            else:
+                p.error = r.get("msg", str(r)) if isinstance(r, dict) else str(r)
+
+    @metrics.timed("submit_orders")
+    async def submit_orders(self, plans: List[OrderPlan]) -> List[OrderPlan]:
+        """每 5 筆一個 batchOrders 請求，所有請求並行送出；結果 / 錯誤寫回各 OrderPlan。"""
+        chunks = [plans[i:i + BATCH_MAX] for i in range(0, len(plans), BATCH_MAX)]
+        try:
+            await asyncio.gather(*(self._submit_chunk(c) for c in chunks))
+        finally:
+            if any(p.ok for p in plans):
+                self.account.invalidate()
+            for p in plans:
+                if p.rid is not None:
+                    self.account.release(p.rid)
+                    p.rid = None
+        return plans
+
+    async def execute_batch(self, intents: Iterable[Tuple[str, str, int]]) -> List[OrderPlan]:
+        return await self.submit_orders(await self.plan_orders(intents))
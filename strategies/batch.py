@@ -0,0 +1,131 @@
+# strategies/batch.py
+"""
+多幣批次評估：把所有候選幣的 close / high / low 疊成 (symbols × bars) 的 float64 矩陣，
+一次用 NumPy 算出 EMA / MACD 交叉、RSI、布林帶與突破加碼條件。
+規則與 trend.generate_trend_signal / revert.generate_revert_signal / trend.should_pyramid 相同，
+輸出以 int8 表示：1 = LONG、-1 = SHORT、0 = 無訊號。
+"""
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import config
+from strategies.klines import parse_klines
+
+LONG, SHORT, NONE = 1, -1, 0
+
+
+def stack_klines(klines_list: Sequence[list]) -> Dict[str, np.ndarray]:
+    """把多個等長的 K 線（原始資料或 Bars）疊成 (symbols × bars) 矩陣。"""
+    bars = [parse_klines(kl) for kl in klines_list]
+    return {
+        "high": np.vstack([b.high for b in bars]),
+        "low": np.vstack([b.low for b in bars]),
+        "close": np.vstack([b.close for b in bars]),
+    }
+
+
+def ema_2d(x: np.ndarray, span: int) -> np.ndarray:
+    """逐欄遞迴、整列向量化；等同 ewm(span, adjust=False)。"""
+    a = 2.0 / (span + 1.0)
+    out = np.empty_like(x)
+    out[:, 0] = x[:, 0]
+    for j in range(1, x.shape[1]):
+        out[:, j] = out[:, j - 1] + a * (x[:, j] - out[:, j - 1])
+    return out
+
+
+def rsi_last(close: np.ndarray, period: int) -> np.ndarray:
+    """最後一根的 RSI（漲跌幅 SMA，與 revert.rsi 相同；第一筆 delta 視為 0）。"""
+    tail = close[:, -(period + 1):]
+    delta = np.diff(tail, axis=1)
+    if tail.shape[1] < period + 1:
+        # 整段資料只有 period 根：第一筆 delta 為 0
+        delta = np.concatenate([np.zeros((close.shape[0], 1)), delta], axis=1)
+    gain = np.where(delta > 0, delta, 0.0).mean(axis=1)
+    loss = np.where(delta < 0, -delta, 0.0).mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = gain / np.where(loss == 0, np.nan, loss)
+        return 100.0 - 100.0 / (1.0 + rs)
+
+
+def bollinger_last(close: np.ndarray, window: int, k: float):
+    w = close[:, -window:]
+    ma = w.mean(axis=1)
+    sd = w.std(axis=1, ddof=1)
+    return ma, ma + k * sd, ma - k * sd
+
+
+def trend_signals(close: np.ndarray) -> np.ndarray:
+    f = ema_2d(close, config.TREND_EMA_FAST)
+    s = ema_2d(close, config.TREND_EMA_SLOW)
+    m = f - s
+    g = ema_2d(m, config.MACD_SIGNAL)
+    f1, f2, s1, s2 = f[:, -2], f[:, -1], s[:, -2], s[:, -1]
+    m1, m2, g1, g2 = m[:, -2], m[:, -1], g[:, -2], g[:, -1]
+    up = ((f1 <= s1) & (f2 > s2)) | ((m1 <= g1) & (m2 > g2))
+    dn = ((f1 >= s1) & (f2 < s2)) | ((m1 >= g1) & (m2 < g2))
+    out = np.zeros(close.shape[0], dtype=np.int8)
+    out[dn] = SHORT
+    out[up] = LONG          # LONG 優先（與單幣版本的判斷順序一致）
+    return out
+
+
+def revert_signals(close: np.ndarray) -> np.ndarray:
+    r = rsi_last(close, config.REVERT_RSI_PERIOD)
+    _, upper, lower = bollinger_last(close, config.BOLL_WINDOW, config.BOLL_STDDEV)
+    last = close[:, -1]
+    out = np.zeros(close.shape[0], dtype=np.int8)
+    out[(last >= upper) & (r >= config.REVERT_RSI_OVERBOUGHT)] = SHORT
+    out[(last <= lower) & (r <= config.REVERT_RSI_OVERSOLD)] = LONG
+    return out
+
+
+def pyramid_flags(close: np.ndarray, high: np.ndarray, low: np.ndarray, side: np.ndarray) -> np.ndarray:
+    """突破前 N 根高點（LONG）/ 跌破前 N 根低點（SHORT）。"""
+    n = config.PYRAMID_BREAKOUT_LOOKBACK
+    if not config.PYRAMID_BREAKOUT_ENABLED or config.MAX_PYRAMID <= 0 or close.shape[1] < n + 2:
+        return np.zeros(close.shape[0], dtype=bool)
+    curr = close[:, -1]
+    prev_high = high[:, -(n + 1):-1].max(axis=1)
+    prev_low = low[:, -(n + 1):-1].min(axis=1)
+    return ((side == LONG) & (curr > prev_high)) | ((side == SHORT) & (curr < prev_low))
+
+
+def evaluate(close: np.ndarray, high: np.ndarray, low: np.ndarray):
+    """
+    回傳 (signal, pyramid)：
+    signal  - int8 向量，趨勢優先、反轉次之
+    pyramid - bool 向量，該訊號方向是否同時出現突破加碼
+    """
+    bars = close.shape[1]
+    sig = np.zeros(close.shape[0], dtype=np.int8)
+    if bars >= max(config.TREND_EMA_SLOW, config.MACD_SIGNAL) + 5:
+        sig = trend_signals(close)
+    if bars >= max(config.REVERT_RSI_PERIOD, config.BOLL_WINDOW) + 5:
+        rv = revert_signals(close)
+        sig = np.where(sig != NONE, sig, rv).astype(np.int8)
+    return sig, pyramid_flags(close, high, low, sig)
+
+
+def to_label(v: int) -> Optional[str]:
+    return "LONG" if v == LONG else "SHORT" if v == SHORT else None
+
+
+def evaluate_symbols(symbols: List[str], klines_list: List[list]) -> Dict[str, tuple]:
+    """
+    依 K 線長度分組後批次評估（不同長度的 EMA 起點不同，不能混在同一矩陣）。
+    回傳 {symbol: ("LONG"/"SHORT"/None, pyramid: bool)}。
+    """
+    parsed = [parse_klines(kl) for kl in klines_list]
+    groups: Dict[int, List[int]] = {}
+    for i, b in enumerate(parsed):
+        if b is not None and len(b):
+            groups.setdefault(len(b), []).append(i)
+    out: Dict[str, tuple] = {}
+    for idx in groups.values():
+        m = stack_klines([parsed[i] for i in idx])
+        sig, pyr = evaluate(m["close"], m["high"], m["low"])
+        for j, i in enumerate(idx):
+            out[symbols[i]] = (to_label(int(sig[j])), bool(pyr[j]))
+    return out
@@ -0,0 +1,334 @@
+# strategies/indicators.py
+"""
+O(1) 增量指標：每根「已收盤」K 線 update 一次，未收盤那根用 peek 試算（不改狀態）。
+收盤對齊模式下策略先以 closed_klines 去掉未收盤那根，最後一根即剛收盤的 K 線（同樣以 peek 計算，下一輪才 update）。
+數值定義與 trend.py / revert.py 的 pandas 版本一致：
+- EMA：ewm(span, adjust=False)，第一筆即為初值
+- MACD：EMA(fast) - EMA(slow)，signal = EMA(macd, signal)
+  pandas 每次從傳入視窗的第一根重新起算，狀態則保留全歷史；兩者差 r^n ×（視窗第一根的全歷史值 - 收盤價），
+  r = 1 - alpha、n = 距視窗第一根的根數。SymbolIndicators 保留最近一段的全歷史值，
+  以 MACD.anchored 在 O(1) 內換算成同一視窗的 pandas 值（誤差僅浮點捨入）
+- RSI：漲跌幅 rolling(period).mean()（預設 SMA，與 revert.rsi 相同；wilder=True 為 Wilder 平滑）
+- Bollinger：rolling(window) 平均 / 標準差（ddof=1），以 Welford 滑動視窗更新
+"""
+import math
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import config
+
+NAN = float("nan")
+
+
+class EMA:
+    def __init__(self, span: int):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> float:
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+    def peek(self, x: float) -> float:
+        return x if self.value is None else self.value + self.alpha * (x - self.value)
+
+
+class MACD:
+    def __init__(self, fast: int, slow: int, signal: int):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, x: float) -> Tuple[float, float, float, float]:
+        f = self.fast.update(x)
+        s = self.slow.update(x)
+        m = f - s
+        return m, self.signal.update(m), f, s
+
+    def peek(self, x: float) -> Tuple[float, float, float, float]:
+        f = self.fast.peek(x)
+        s = self.slow.peek(x)
+        m = f - s
+        return m, self.signal.peek(m), f, s
+
+    @property
+    def value(self) -> Optional[Tuple[float, float, float, float]]:
+        if self.fast.value is None:
+            return None
+        m = self.fast.value - self.slow.value
+        return m, self.signal.value, self.fast.value, self.slow.value
+
+    def anchored(self, base: Tuple[float, float, float, float], vals: Tuple[float, float, float, float],
+                 n: int) -> Tuple[float, float, float, float]:
+        """
+        全歷史的 (macd, signal, fast, slow) -> 從 base 那根重新起算的值（pandas 對該視窗 ewm 的結果）。
+        base = 視窗第一根的 (收盤價, fast, slow, signal) 全歷史值，n = vals 距 base 的根數。
+        """
+        x, fb, sb, gb = base
+        _, g, f, s = vals
+        rf, rs = 1.0 - self.fast.alpha, 1.0 - self.slow.alpha
+        ag = self.signal.alpha
+        rg = 1.0 - ag
+        cf, cs = fb - x, sb - x
+        f2 = f - rf ** n * cf
+        s2 = s - rs ** n * cs
+        gn = rg ** n
+
+        # signal 視窗的初值同樣移到 base，再扣掉 macd 兩條 EMA 修正量經 signal 平滑後的部分
+        def h(r):
+            return gn + ag * (n * r ** n if r == rg else r * (gn - r ** n) / (rg - r))
+
+        g2 = g - gn * (gb - (fb - sb)) - cf * h(rf) + cs * h(rs)
+        return f2 - s2, g2, f2, s2
+
+
+class RollingStats:
+    """固定視窗的平均 / 變異數（Welford 滑動更新，定期整窗重算以壓住浮點誤差）。"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buf = deque(maxlen=window)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._since_exact = 0
+
+    def _recompute(self):
+        n = len(self.buf)
+        self.mean = sum(self.buf) / n if n else 0.0
+        self.m2 = sum((v - self.mean) ** 2 for v in self.buf)
+        self._since_exact = 0
+
+    def update(self, x: float):
+        n = len(self.buf)
+        if n < self.window:
+            self.buf.append(x)
+            d = x - self.mean
+            self.mean += d / (n + 1)
+            self.m2 += d * (x - self.mean)
+        else:
+            old = self.buf[0]
+            self.buf.append(x)
+            old_mean = self.mean
+            self.mean += (x - old) / n
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+            self._since_exact += 1
+            if self._since_exact >= 50 * self.window:
+                self._recompute()
+
+    def _stats(self, mean: float, m2: float) -> Tuple[float, float]:
+        n = len(self.buf)
+        if n < self.window or n < 2:
+            return NAN, NAN
+        return mean, math.sqrt(max(m2, 0.0) / (n - 1))
+
+    def stats(self) -> Tuple[float, float]:
+        return self._stats(self.mean, self.m2)
+
+    def peek(self, x: float) -> Tuple[float, float]:
+        n = len(self.buf)
+        if n < self.window - 1:
+            return NAN, NAN
+        if n < self.window:
+            d = x - self.mean
+            mean = self.mean + d / (n + 1)
+            m2 = self.m2 + d * (x - mean)
+            if n + 1 < 2:
+                return NAN, NAN
+            return mean, math.sqrt(max(m2, 0.0) / n)
+        old = self.buf[0]
+        mean = self.mean + (x - old) / n
+        m2 = self.m2 + (x - old) * (x - mean + old - self.mean)
+        return self._stats(mean, m2)
+
+
+class Bollinger:
+    def __init__(self, window: int, k: float):
+        self.k = k
+        self.stats = RollingStats(window)
+
+    def update(self, x: float):
+        self.stats.update(x)
+
+    def peek(self, x: float) -> Tuple[float, float, float]:
+        ma, sd = self.stats.peek(x)
+        return ma, ma + self.k * sd, ma - self.k * sd
+
+
+class RSI:
+    def __init__(self, period: int, wilder: bool = False):
+        self.period = period
+        self.wilder = wilder
+        self.prev: Optional[float] = None
+        self.gains = deque(maxlen=period)
+        self.losses = deque(maxlen=period)
+        self.sum_gain = 0.0
+        self.sum_loss = 0.0
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+        self._since_exact = 0
+
+    @staticmethod
+    def _rsi(g: float, l: float) -> float:
+        if l == 0 or math.isnan(l) or math.isnan(g):
+            return NAN
+        return 100.0 - 100.0 / (1.0 + g / l)
+
+    def _split(self, x: float) -> Tuple[float, float]:
+        # 與 pandas 版本一致：第一筆 delta 為 NaN，被 where 換成 0
+        if self.prev is None:
+            return 0.0, 0.0
+        d = x - self.prev
+        return (d if d > 0 else 0.0), (-d if d < 0 else 0.0)
+
+    def _next(self, g: float, l: float):
+        if self.wilder:
+            n = len(self.gains) + 1
+            if self.avg_gain is None:
+                if n < self.period:
+                    return None, None, n
+                sg = self.sum_gain + g
+                sl = self.sum_loss + l
+                return sg / self.period, sl / self.period, n
+            a = 1.0 / self.period
+            return self.avg_gain + a * (g - self.avg_gain), self.avg_loss + a * (l - self.avg_loss), n
+        full = len(self.gains) == self.period
+        sg = self.sum_gain + g - (self.gains[0] if full else 0.0)
+        sl = self.sum_loss + l - (self.losses[0] if full else 0.0)
+        n = min(len(self.gains) + 1, self.period)
+        if n < self.period:
+            return None, None, n
+        return sg / self.period, sl / self.period, n
+
+    def update(self, x: float) -> float:
+        g, l = self._split(x)
+        ag, al, _ = self._next(g, l)
+        if len(self.gains) == self.period:
+            self.sum_gain -= self.gains[0]
+            self.sum_loss -= self.losses[0]
+        self.gains.append(g)
+        self.losses.append(l)
+        self.sum_gain += g
+        self.sum_loss += l
+        self._since_exact += 1
+        if self._since_exact >= 50 * self.period:
+            self.sum_gain, self.sum_loss = sum(self.gains), sum(self.losses)
+            self._since_exact = 0
+        self.prev = x
+        self.avg_gain, self.avg_loss = ag, al
+        return NAN if ag is None else self._rsi(ag, al)
+
+    def peek(self, x: float) -> float:
+        g, l = self._split(x)
+        ag, al, _ = self._next(g, l)
+        return NAN if ag is None else self._rsi(ag, al)
+
+
+class _Col:
+    """原始 K 線的欄位存取（不複製整欄）。"""
+    __slots__ = ("rows", "idx")
+
+    def __init__(self, rows, idx: int):
+        self.rows = rows
+        self.idx = idx
+
+    def __getitem__(self, i):
+        return self.rows[i][self.idx]
+
+
+class SymbolIndicators:
+    """
+    單一 (symbol, interval) 的指標狀態。sync() 吃 K 線原始資料（最後一根視為未收盤），
+    只把新收盤的 K 線餵進狀態；斷層（buffer 重抓、停機太久）時自動以歷史重新 seed。
+    """
+
+    def __init__(self):
+        self.macd = MACD(config.TREND_EMA_FAST, config.TREND_EMA_SLOW, config.MACD_SIGNAL)
+        self.rsi = RSI(config.REVERT_RSI_PERIOD)
+        self.boll = Bollinger(config.BOLL_WINDOW, config.BOLL_STDDEV)
+        self.last_open: Optional[int] = None
+        self.closed = 0
+        self.bars = 0
+        self.last_close = NAN
+        # 最近已收盤 K 線的 (開盤時間, 收盤價, fast, slow, signal) 全歷史值：換算視窗起點用
+        self.hist = deque(maxlen=max(config.KLINE_LIMIT, config.KLINE_BUFFER_SIZE) + 1)
+        self.base: Optional[Tuple[float, float, float, float]] = None
+        self.span = 0
+
+    def _feed(self, open_time: int, close: float):
+        _, g, f, s = self.macd.update(close)
+        self.rsi.update(close)
+        self.boll.update(close)
+        self.hist.append((open_time, close, f, s, g))
+        self.closed += 1
+
+    def sync(self, klines) -> bool:
+        """
+        klines 可為原始 list-of-lists 或 strategies.klines.Bars。
+        回傳 True 代表狀態可用（至少有一根已收盤 + 一根未收盤）。
+        """
+        n = len(klines)
+        if n < 2:
+            return False
+        if hasattr(klines, "open_time"):
+            ot, cl = klines.open_time, klines.close
+        else:
+            ot = _Col(klines, 0)
+            cl = _Col(klines, 4)
+        start = 0
+        if self.last_open is not None:
+            # 通常只有 1~2 根新 K 線：從尾端往回找上次處理到的位置
+            i = n - 2
+            while i >= 0 and int(ot[i]) > self.last_open:
+                i -= 1
+            if i >= 0 and int(ot[i]) == self.last_open:
+                start = i + 1
+            else:
+                self.__init__()
+        if n - 1 > self.hist.maxlen:
+            self.hist = deque(self.hist, maxlen=n - 1)
+        for j in range(start, n - 1):
+            self._feed(int(ot[j]), float(cl[j]))
+        self.last_open = int(ot[n - 2])
+        self.last_close = float(cl[n - 1])
+        self.bars = n
+        # 視窗第一根（pandas 版本的 EMA 起點）；已吃進的根一定在 hist 裡
+        b = self.hist[-(n - 1)] if len(self.hist) >= n - 1 else None
+        if b is not None and b[0] == int(ot[0]):
+            self.base, self.span = b[1:], n - 2
+        else:
+            self.base, self.span = None, 0
+        return True
+
+    # ---------- strategy views ----------
+    def trend(self) -> Optional[dict]:
+        prev = self.macd.value
+        if prev is None:
+            return None
+        cur = self.macd.peek(self.last_close)
+        if self.base is not None:
+            prev = self.macd.anchored(self.base, prev, self.span)
+            cur = self.macd.anchored(self.base, cur, self.span + 1)
+        m1, s1, f1, sl1 = prev
+        m2, s2, f2, sl2 = cur
+        return {"ema_fast": (f1, f2), "ema_slow": (sl1, sl2), "macd": (m1, m2), "signal": (s1, s2)}
+
+    def revert(self) -> dict:
+        ma, upper, lower = self.boll.peek(self.last_close)
+        return {"close": self.last_close, "rsi": self.rsi.peek(self.last_close),
+                "ma": ma, "upper": upper, "lower": lower}
+
+
+_STATES: Dict[Tuple[str, str], SymbolIndicators] = {}
+
+
+def state_for(symbol: str, interval: str) -> SymbolIndicators:
+    key = (symbol, interval)
+    st = _STATES.get(key)
+    if st is None:
+        st = _STATES[key] = SymbolIndicators()
+    return st
+
+
+def reset(symbol: str = None):
+    for k in [k for k in _STATES if symbol is None or k[0] == symbol]:
+        _STATES.pop(k, None)
@@ -0,0 +1,93 @@
+# strategies/klines.py
+"""
+共用 K 線解析：把交易所回傳的 list-of-lists 直接轉成欄式 NumPy 陣列
+（int64 時間、float64 OHLCV），熱路徑不經過 pandas。
+真的需要 DataFrame 時再呼叫 Bars.df()（延遲建立並快取）。
+"""
+from typing import Optional
+
+import numpy as np
+
+
+class Bars:
+    __slots__ = ("open_time", "open", "high", "low", "close", "volume", "close_time", "_df")
+
+    def __init__(self, open_time, open_, high, low, close, volume, close_time):
+        self.open_time = open_time
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.close_time = close_time
+        self._df = None
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def tail(self, n: int) -> "Bars":
+        """最後 n 根（切片為 view，不複製）。"""
+        return self.window(len(self), n)
+
+    def window(self, end: int, n: int) -> "Bars":
+        """[end - n, end) 這段 K 線（切片為 view，不複製）；回測逐根重播時使用。"""
+        s = slice(max(0, end - n), end)
+        return Bars(self.open_time[s], self.open[s], self.high[s], self.low[s],
+                    self.close[s], self.volume[s], self.close_time[s])
+
+    def df(self):
+        """延遲建立的 DataFrame 視圖（欄位與舊版 klines_to_df 相同的前 7 欄）。"""
+        if self._df is None:
+            import pandas as pd
+            self._df = pd.DataFrame({
+                "open_time": pd.to_datetime(self.open_time, unit="ms"),
+                "open": self.open, "high": self.high, "low": self.low,
+                "close": self.close, "volume": self.volume, "close_time": self.close_time,
+            })
+        return self._df
+
+
+def parse_klines(klines) -> Optional[Bars]:
+    """K 線原始資料 -> Bars；已是 Bars 直接回傳；格式錯誤回傳 None。"""
+    if isinstance(klines, Bars):
+        return klines
+    try:
+        if not klines:
+            e = np.empty(0, dtype=np.float64)
+            t = np.empty(0, dtype=np.int64)
+            return Bars(t, e, e, e, e, e, t)
+        cols = list(zip(*klines))
+        f8 = np.float64
+        return Bars(
+            np.array(cols[0], dtype=np.int64),
+            np.array(cols[1], dtype=f8),
+            np.array(cols[2], dtype=f8),
+            np.array(cols[3], dtype=f8),
+            np.array(cols[4], dtype=f8),
+            np.array(cols[5], dtype=f8),
+            np.array(cols[6], dtype=np.int64),
+        )
+    except Exception:
+        return None
+
+
+def closed_klines(client, klines):
+    """
+    收盤對齊模式（client.clock 已掛上）：去掉 close_time 還沒到的最後一根，策略一律以「剛收盤」那根為最新一根，
+    REST / WebSocket 不論快取裡有沒有新 K 線都評估同一根。沒有時鐘（interval 模式、回測）時原樣回傳。
+    """
+    clock = getattr(client, "clock", None)
+    if clock is None or klines is None or not len(klines):
+        return klines
+    last_close = klines.close_time[-1] if isinstance(klines, Bars) else klines[-1][6]
+    if int(last_close) < clock.now_ms():
+        return klines
+    if isinstance(klines, Bars):
+        return klines.window(len(klines) - 1, len(klines) - 1)
+    return klines[:-1]
+
+
+def klines_to_df(klines):
+    """相容舊介面：回傳 DataFrame（僅在真的需要 pandas 時使用）。"""
+    bars = parse_klines(klines)
+    return bars.df() if bars is not None else None
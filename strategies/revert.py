@@ -3,21 +3,12 @@ import pandas as pd
 import numpy as np
 from typing import Optional
 import config
+from strategies import indicators
+from monitor import log, metrics
+from strategies.batch import rsi_last, bollinger_last
+from strategies.klines import closed_klines, parse_klines, klines_to_df  # noqa: F401 (klines_to_df 保留舊匯入路徑)
 
-def klines_to_df(klines):
-    cols = [
-        "open_time","open","high","low","close","volume","close_time",
-        "quote_asset_volume","num_trades","taker_buy_base","taker_buy_quote","ignore"
-    ]
-    try:
-        df = pd.DataFrame(klines, columns=cols)
-        for c in ["open","high","low","close","volume"]:
-            df[c] = df[c].astype(float)
-        df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
-        return df
-    except Exception:
-        return None
-
+# pandas 參考實作：rsi_last 與增量 RSI 的定義，tests/test_indicators.py 逐根比對
 def rsi(series: pd.Series, period: int = 14) -> pd.Series:
     delta = series.diff()
     gain = delta.where(delta > 0, 0.0).rolling(period).mean()
@@ -25,33 +16,41 @@ def rsi(series: pd.Series, period: int = 14) -> pd.Series:
     rs = gain / loss.replace(0, np.nan)
     return 100 - (100 / (1 + rs))
 
+def revert_decision(last_close, lower, upper, last_rsi) -> Optional[str]:
+    # 寬鬆的反轉入場條件（保留你原本閾值 40/60）；NaN 的比較一律為 False
+    if last_close <= lower and last_rsi is not None and last_rsi <= config.REVERT_RSI_OVERSOLD:
+        return "LONG"
+    if last_close >= upper and last_rsi is not None and last_rsi >= config.REVERT_RSI_OVERBOUGHT:
+        return "SHORT"
+    return None
+
+@metrics.timed("strategy", fn="revert")
 async def generate_revert_signal(client, symbol: str, interval: str = None) -> Optional[str]:
     """
     保留你原本的反轉策略：RSI + 布林帶
     回傳 "LONG"/"SHORT"/None
     """
     try:
-        kl = await client.get_klines(symbol, interval=interval or config.KLINE_INTERVAL, limit=config.KLINE_LIMIT)
-        df = klines_to_df(kl)
-        if df is None or len(df) < max(config.REVERT_RSI_PERIOD, config.BOLL_WINDOW) + 5:
-            return None
+        interval = interval or config.KLINE_INTERVAL
+        kl = closed_klines(client, await client.get_klines(symbol, interval=interval, limit=config.KLINE_LIMIT))
+        need = max(config.REVERT_RSI_PERIOD, config.BOLL_WINDOW) + 5
 
-        close = df["close"]
-        r = rsi(close, config.REVERT_RSI_PERIOD)
-        ma = close.rolling(config.BOLL_WINDOW).mean()
-        std = close.rolling(config.BOLL_WINDOW).std()
-        upper = ma + config.BOLL_STDDEV * std
-        lower = ma - config.BOLL_STDDEV * std
+        if config.INCREMENTAL_INDICATORS:
+            st = indicators.state_for(symbol, interval)
+            if not kl or not st.sync(kl) or st.bars < need:
+                return None
+            v = st.revert()
+            return revert_decision(v["close"], v["lower"], v["upper"], v["rsi"])
 
-        last_close = close.iloc[-1]
-        last_rsi = r.iloc[-1] if len(r) > 0 else None
+        bars = parse_klines(kl)
+        if bars is None or len(bars) < need:
+            return None
 
-        # 寬鬆的反轉入場條件（保留你原本閾值 40/60）
-        if last_close <= lower.iloc[-1] and last_rsi is not None and last_rsi <= config.REVERT_RSI_OVERSOLD:
-            return "LONG"
-        if last_close >= upper.iloc[-1] and last_rsi is not None and last_rsi >= config.REVERT_RSI_OVERBOUGHT:
-            return "SHORT"
-        return None
+        # 只需要最後一根：RSI / 布林帶直接取尾端視窗計算（定義同 rsi() 與 rolling）
+        close = bars.close[None, :]
+        last_rsi = float(rsi_last(close, config.REVERT_RSI_PERIOD)[0])
+        _, upper, lower = bollinger_last(close, config.BOLL_WINDOW, config.BOLL_STDDEV)
+        return revert_decision(float(bars.close[-1]), float(lower[0]), float(upper[0]), last_rsi)
     except Exception as e:
-        print(f"[STRATEGY:revert] error {symbol}: {e}")
+        log.error("STRATEGY:revert", "error %s: %s", symbol, e, exc=e)
         return None
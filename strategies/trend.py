@@ -1,24 +1,13 @@
 # strategies/trend.py
 import pandas as pd
-import numpy as np
 from typing import Optional
 import config
+from strategies import indicators
+from monitor import log, metrics
+from strategies.batch import ema_2d
+from strategies.klines import closed_klines, parse_klines, klines_to_df  # noqa: F401 (klines_to_df 保留舊匯入路徑)
 
-# ---- utils ----
-def klines_to_df(klines):
-    cols = [
-        "open_time","open","high","low","close","volume","close_time",
-        "quote_asset_volume","num_trades","taker_buy_base","taker_buy_quote","ignore"
-    ]
-    try:
-        df = pd.DataFrame(klines, columns=cols)
-        for c in ["open","high","low","close","volume"]:
-            df[c] = df[c].astype(float)
-        df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
-        return df
-    except Exception:
-        return None
-
+# ---- pandas 參考實作：NumPy / 增量路徑的定義，tests/test_indicators.py 逐根比對 ----
 def ema(series: pd.Series, span: int) -> pd.Series:
     return series.ewm(span=span, adjust=False).mean()
 
@@ -29,59 +18,110 @@ def macd(series: pd.Series, fast: int, slow: int, signal: int):
     signal_line = macd_line.ewm(span=signal, adjust=False).mean()
     return macd_line, signal_line, ema_fast, ema_slow
 
+def trend_decision(f1, f2, s1, s2, m1, m2, g1, g2) -> Optional[str]:
+    """
+    f/s = EMA fast/slow，m/g = MACD / signal；1 = 前一根（iloc[-2]），2 = 最新一根（iloc[-1]）。
+    """
+    # EMA 交叉
+    ema_golden = f1 <= s1 and f2 > s2
+    ema_dead   = f1 >= s1 and f2 < s2
+
+    # MACD 交叉
+    macd_up = m1 <= g1 and m2 > g2
+    macd_dn = m1 >= g1 and m2 < g2
+
+    if ema_golden or macd_up:
+        return "LONG"
+    if ema_dead or macd_dn:
+        return "SHORT"
+    return None
+
 # ---- strategy ----
+@metrics.timed("strategy", fn="trend")
 async def generate_trend_signal(client, symbol: str, interval: str = None) -> Optional[str]:
     """
     保留你原本的趨勢策略：EMA 交叉 + MACD 交叉 擇一觸發
     回傳 "LONG"/"SHORT"/None
     """
     try:
-        kl = await client.get_klines(symbol, interval=interval or config.KLINE_INTERVAL, limit=config.KLINE_LIMIT)
-        df = klines_to_df(kl)
-        if df is None or len(df) < max(config.TREND_EMA_SLOW, config.MACD_SIGNAL) + 5:
-            return None
+        interval = interval or config.KLINE_INTERVAL
+        kl = closed_klines(client, await client.get_klines(symbol, interval=interval, limit=config.KLINE_LIMIT))
+        need = max(config.TREND_EMA_SLOW, config.MACD_SIGNAL) + 5
 
-        close = df["close"]
-        macd_line, signal_line, ema_fast, ema_slow = macd(
-            close, config.TREND_EMA_FAST, config.TREND_EMA_SLOW, config.MACD_SIGNAL
-        )
+        if config.INCREMENTAL_INDICATORS:
+            st = indicators.state_for(symbol, interval)
+            if not kl or not st.sync(kl) or st.bars < need:
+                return None
+            v = st.trend()
+            if v is None:
+                return None
+            return trend_decision(*v["ema_fast"], *v["ema_slow"], *v["macd"], *v["signal"])
 
-        # EMA 交叉
-        ema_golden = ema_fast.iloc[-2] <= ema_slow.iloc[-2] and ema_fast.iloc[-1] > ema_slow.iloc[-1]
-        ema_dead   = ema_fast.iloc[-2] >= ema_slow.iloc[-2] and ema_fast.iloc[-1] < ema_slow.iloc[-1]
+        bars = parse_klines(kl)
+        if bars is None or len(bars) < need:
+            return None
 
-        # MACD 交叉
-        macd_up = macd_line.iloc[-2] <= signal_line.iloc[-2] and macd_line.iloc[-1] > signal_line.iloc[-1]
-        macd_dn = macd_line.iloc[-2] >= signal_line.iloc[-2] and macd_line.iloc[-1] < signal_line.iloc[-1]
+        # 與 macd() 相同的定義，但直接在 NumPy 上計算（不建 DataFrame）
+        close = bars.close[None, :]
+        ema_fast = ema_2d(close, config.TREND_EMA_FAST)[0]
+        ema_slow = ema_2d(close, config.TREND_EMA_SLOW)[0]
+        macd_line = ema_fast - ema_slow
+        signal_line = ema_2d(macd_line[None, :], config.MACD_SIGNAL)[0]
+        return trend_decision(
+            ema_fast[-2], ema_fast[-1], ema_slow[-2], ema_slow[-1],
+            macd_line[-2], macd_line[-1], signal_line[-2], signal_line[-1],
+        )
+    except Exception as e:
+        log.error("STRATEGY:trend", "error %s: %s", symbol, e, exc=e)
+        return None
 
-        if ema_golden or macd_up:
+@metrics.timed("strategy", fn="bias")
+async def trend_bias(client, symbol: str, interval: str) -> Optional[str]:
+    """
+    較高週期的趨勢方向（多週期確認用）：最後一根已收盤 K 線 EMA fast 在 slow 之上 = LONG，之下 = SHORT。
+    """
+    try:
+        kl = await client.get_klines(symbol, interval=interval, limit=config.KLINE_LIMIT)
+        if not kl:
+            return None
+        # 有伺服器時鐘時依 close_time 判斷；否則最後一根視為未收盤
+        kl = closed_klines(client, kl) if getattr(client, "clock", None) is not None else kl[:-1]
+        bars = parse_klines(kl)
+        if bars is None or len(bars) < config.TREND_EMA_SLOW + 4:
+            return None
+        close = bars.close[None, :]
+        fast = ema_2d(close, config.TREND_EMA_FAST)[0, -1]
+        slow = ema_2d(close, config.TREND_EMA_SLOW)[0, -1]
+        if fast > slow:
             return "LONG"
-        if ema_dead or macd_dn:
+        if fast < slow:
             return "SHORT"
         return None
     except Exception as e:
-        print(f"[STRATEGY:trend] error {symbol}: {e}")
+        log.error("STRATEGY:trend", "trend_bias error %s %s: %s", symbol, interval, e, exc=e)
         return None
 
-async def should_pyramid(client, symbol: str, side_long: bool) -> bool:
+@metrics.timed("strategy", fn="pyramid")
+async def should_pyramid(client, symbol: str, side_long: bool, interval: str = None) -> bool:
     """
     保留你原本的「突破前高/前低」加碼邏輯。
     """
     if not config.PYRAMID_BREAKOUT_ENABLED or config.MAX_PYRAMID <= 0:
         return False
     try:
-        kl = await client.get_klines(symbol, interval=config.KLINE_INTERVAL, limit=config.PYRAMID_BREAKOUT_LOOKBACK + 5)
-        df = klines_to_df(kl)
-        if df is None or len(df) < config.PYRAMID_BREAKOUT_LOOKBACK + 2:
+        interval = interval or config.KLINE_INTERVAL
+        kl = await client.get_klines(symbol, interval=interval, limit=config.PYRAMID_BREAKOUT_LOOKBACK + 5)
+        bars = parse_klines(closed_klines(client, kl))
+        if bars is None or len(bars) < config.PYRAMID_BREAKOUT_LOOKBACK + 2:
             return False
 
-        curr = df["close"].iloc[-1]
+        curr = bars.close[-1]
         if side_long:
-            prev_high = df["high"].iloc[-(config.PYRAMID_BREAKOUT_LOOKBACK+1):-1].max()
-            return curr > prev_high
+            prev_high = bars.high[-(config.PYRAMID_BREAKOUT_LOOKBACK+1):-1].max()
+            return bool(curr > prev_high)
         else:
-            prev_low = df["low"].iloc[-(config.PYRAMID_BREAKOUT_LOOKBACK+1):-1].min()
-            return curr < prev_low
+            prev_low = bars.low[-(config.PYRAMID_BREAKOUT_LOOKBACK+1):-1].min()
+            return bool(curr < prev_low)
     except Exception as e:
-        print(f"[STRATEGY:trend] should_pyramid error {symbol}: {e}")
+        log.error("STRATEGY:trend", "should_pyramid error %s: %s", symbol, e, exc=e)
         return False
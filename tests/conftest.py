@@ -0,0 +1,10 @@
+# tests/conftest.py
+import os
+import sys
+
+# 必須在匯入 config 之前設定：假金鑰、不寫交易日誌
+os.environ.setdefault("API_KEY", "test")
+os.environ.setdefault("API_SECRET", "test")
+os.environ["TRADE_JOURNAL"] = ""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
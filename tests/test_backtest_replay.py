@@ -0,0 +1,37 @@
+# tests/test_backtest_replay.py
+"""replay 只在重播期間調整 config，結束（含例外）後還原。"""
+import asyncio
+
+import numpy as np
+import pytest
+
+import config
+from backtest.engine import replay
+from strategies.klines import Bars
+
+
+def make_bars(n=150, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    ot = np.arange(n, dtype=np.int64) * 60_000
+    return Bars(ot, close.copy(), close + 0.2, close - 0.2, close, np.ones(n), ot + 59_999)
+
+
+@pytest.fixture
+def live_settings(monkeypatch):
+    monkeypatch.setattr(config, "INCREMENTAL_INDICATORS", False)
+    monkeypatch.setattr(config, "TRADE_JOURNAL", "journal/trades.jsonl")
+
+
+def test_replay_restores_config(live_settings):
+    sim, curve = asyncio.run(replay("BTCUSDT", make_bars(), "1m"))
+    assert curve.size == 150
+    assert config.INCREMENTAL_INDICATORS is False
+    assert config.TRADE_JOURNAL == "journal/trades.jsonl"
+
+
+def test_replay_restores_config_on_error(live_settings):
+    with pytest.raises(Exception):
+        asyncio.run(replay("BTCUSDT", None, "1m"))
+    assert config.INCREMENTAL_INDICATORS is False
+    assert config.TRADE_JOURNAL == "journal/trades.jsonl"
@@ -0,0 +1,102 @@
+# tests/test_closed_bar_signals.py
+"""收盤對齊模式：策略只評估剛收盤的那根，REST（快取已有新 K 線）與 WebSocket（尚未有新 K 線）結果一致。"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from strategies import indicators
+from strategies.klines import closed_klines
+from strategies.trend import generate_trend_signal, macd, trend_decision
+
+STEP = 60_000
+T0 = 1_700_000_000_000 - 1_700_000_000_000 % STEP
+
+
+def make_rows(closes):
+    rows = []
+    for i, c in enumerate(closes):
+        ot = T0 + i * STEP
+        rows.append([ot, str(c), str(c), str(c), str(c), "1", ot + STEP - 1])
+    return rows
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def now_ms(self):
+        return self.now
+
+
+class FakeClient:
+    def __init__(self, rows, clock=None):
+        self.rows = rows
+        self.clock = clock
+
+    async def get_klines(self, symbol, interval=None, limit=None):
+        return self.rows[-limit:]
+
+
+def closes_with_cross(n=150, turn=90):
+    """先跌後漲：EMA / MACD 在 turn 之後出現黃金交叉。"""
+    x = np.arange(n, dtype=float)
+    return np.where(x < turn, 100 - 0.5 * x, 100 - 0.5 * turn + 0.8 * (x - turn)).round(4)
+
+
+def reference(closes):
+    """pandas 參考版本：逐根以「前一根已收盤 vs 剛收盤」判斷，回傳 {bar index: 訊號}。"""
+    m, s, f, sl = macd(pd.Series(closes), config.TREND_EMA_FAST, config.TREND_EMA_SLOW, config.MACD_SIGNAL)
+    out = {}
+    for j in range(1, len(closes)):
+        d = trend_decision(f[j - 1], f[j], sl[j - 1], sl[j], m[j - 1], m[j], s[j - 1], s[j])
+        if d:
+            out[j] = d
+    return out
+
+
+@pytest.mark.parametrize("incremental", [True, False])
+def test_closed_bar_crossover_fires_once(monkeypatch, incremental):
+    monkeypatch.setattr(config, "INCREMENTAL_INDICATORS", incremental)
+    indicators.reset()
+    closes = closes_with_cross()
+    rows = make_rows(closes)
+    expected = reference(closes)
+    need = max(config.TREND_EMA_SLOW, config.MACD_SIGNAL) + 5
+    cross = min(k for k in expected if k >= need)
+    assert expected[cross] == "LONG"
+
+    clock = FakeClock()
+    fired = {"rest": {}, "ws": {}}
+    for k in range(need, len(rows) - 1):
+        # 第 k 根剛收盤 1.5 秒：REST 快取已含第 k+1 根（剛開盤、價格往反方向大跳），WebSocket 尚未收到
+        clock.now = rows[k + 1][0] + 1500
+        forming = list(rows[k + 1])
+        forming[4] = str(closes[k] * (0.9 if k >= cross else 1.1))
+        views = {"rest": rows[:k + 1] + [forming], "ws": rows[:k + 1]}
+        for mode, view in views.items():
+            sig = asyncio.run(generate_trend_signal(FakeClient(view, clock), f"{mode}USDT", "1m"))
+            if sig:
+                assert k not in fired[mode]
+                fired[mode][k] = sig
+
+    want = {k: v for k, v in expected.items() if need <= k < len(rows) - 1}
+    assert fired["rest"] == want
+    assert fired["ws"] == want
+    assert fired["rest"][cross] == "LONG"
+
+
+def test_closed_klines_without_clock_is_unchanged():
+    rows = make_rows([1.0, 2.0, 3.0])
+    assert closed_klines(FakeClient(rows), rows) is rows
+
+
+def test_closed_klines_drops_only_forming_row():
+    rows = make_rows([1.0, 2.0, 3.0])
+    clock = FakeClock()
+    clock.now = rows[-1][0] + 10
+    assert closed_klines(FakeClient(rows, clock), rows) == rows[:-1]
+    clock.now = rows[-1][6] + 1
+    assert closed_klines(FakeClient(rows, clock), rows) == rows
@@ -0,0 +1,101 @@
+# tests/test_indicators.py
+"""增量指標（strategies.indicators）與 trend.py / revert.py 的 pandas 版本逐根比對（重播 K 線視窗）。"""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from strategies.indicators import EMA, RSI, SymbolIndicators
+from strategies.revert import revert_decision, rsi
+from strategies.trend import ema, macd, trend_decision
+
+STEP = 60_000
+
+
+def random_walk(n, seed):
+    rng = np.random.default_rng(seed)
+    return (100 + np.cumsum(rng.normal(0, 0.8, n))).round(4)
+
+
+def rows_for(closes, start=0):
+    return [[(start + i) * STEP, "0", "0", "0", str(c), "0", (start + i) * STEP + STEP - 1]
+            for i, c in enumerate(closes)]
+
+
+def pandas_views(window):
+    """與 SymbolIndicators.trend() / revert() 對應的 pandas 值（最後一根為未收盤）。"""
+    s = pd.Series(window)
+    m, g, f, sl = macd(s, config.TREND_EMA_FAST, config.TREND_EMA_SLOW, config.MACD_SIGNAL)
+    ma = s.rolling(config.BOLL_WINDOW).mean().iloc[-1]
+    sd = s.rolling(config.BOLL_WINDOW).std().iloc[-1]
+    trend = {"ema_fast": (f.iloc[-2], f.iloc[-1]), "ema_slow": (sl.iloc[-2], sl.iloc[-1]),
+             "macd": (m.iloc[-2], m.iloc[-1]), "signal": (g.iloc[-2], g.iloc[-1])}
+    revert = {"close": window[-1], "rsi": rsi(s, config.REVERT_RSI_PERIOD).iloc[-1], "ma": ma,
+              "upper": ma + config.BOLL_STDDEV * sd, "lower": ma - config.BOLL_STDDEV * sd}
+    return trend, revert
+
+
+def close(a, b, tol=1e-9):
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return abs(a - b) <= tol * max(1.0, abs(a))
+
+
+@pytest.mark.parametrize("limit", [200, 120])
+def test_replayed_windows_match_pandas(limit):
+    closes = random_walk(900, seed=limit)
+    rows = rows_for(closes)
+    st = SymbolIndicators()
+    for i in range(limit - 1, len(rows)):
+        window = rows[i + 1 - limit:i + 1]
+        # 未收盤那根在同一根內會被多次更新：改價格不應影響狀態
+        forming = list(window[-1])
+        forming[4] = str(closes[i] * 1.01)
+        assert st.sync(window[:-1] + [forming])
+        assert st.sync(window)
+        got_t, got_r = st.trend(), st.revert()
+        want_t, want_r = pandas_views(closes[i + 1 - limit:i + 1])
+        for k, (a1, a2) in want_t.items():
+            assert close(got_t[k][0], a1) and close(got_t[k][1], a2), (i, k, got_t[k], (a1, a2))
+        for k, v in want_r.items():
+            assert close(got_r[k], v), (i, k, got_r[k], v)
+        assert trend_decision(*got_t["ema_fast"], *got_t["ema_slow"], *got_t["macd"], *got_t["signal"]) == \
+            trend_decision(*want_t["ema_fast"], *want_t["ema_slow"], *want_t["macd"], *want_t["signal"])
+        assert revert_decision(got_r["close"], got_r["lower"], got_r["upper"], got_r["rsi"]) == \
+            revert_decision(want_r["close"], want_r["lower"], want_r["upper"], want_r["rsi"])
+
+
+def test_gap_reseeds_from_new_window():
+    closes = random_walk(1200, seed=7)
+    rows = rows_for(closes)
+    st = SymbolIndicators()
+    limit = config.KLINE_LIMIT
+    for i in range(limit - 1, limit + 50):
+        st.sync(rows[i + 1 - limit:i + 1])
+    # 停機太久：新視窗與上次處理到的 K 線沒有交集
+    i = 1100
+    assert st.sync(rows[i + 1 - limit:i + 1])
+    want_t, _ = pandas_views(closes[i + 1 - limit:i + 1])
+    got_t = st.trend()
+    for k, (a1, a2) in want_t.items():
+        assert close(got_t[k][0], a1) and close(got_t[k][1], a2)
+
+
+def test_ema_matches_pandas_ewm():
+    closes = random_walk(500, seed=3)
+    e = EMA(config.TREND_EMA_SLOW)
+    got = [e.update(c) for c in closes]
+    want = ema(pd.Series(closes), config.TREND_EMA_SLOW).to_numpy()
+    assert np.allclose(got, want, rtol=1e-12, atol=0)
+
+
+def test_rsi_matches_pandas_rolling():
+    closes = random_walk(500, seed=4)
+    r = RSI(config.REVERT_RSI_PERIOD)
+    got = np.array([r.update(c) for c in closes])
+    want = rsi(pd.Series(closes), config.REVERT_RSI_PERIOD).to_numpy()
+    assert np.array_equal(np.isnan(got), np.isnan(want))
+    ok = ~np.isnan(want)
+    assert np.allclose(got[ok], want[ok], rtol=1e-9, atol=1e-9)
@@ -0,0 +1,78 @@
+# tests/test_journal.py
+"""交易日誌不丟紀錄：queue 不受 LOG_QUEUE_MAX 限制，SIGTERM 結束前也會寫完。"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+import config
+from monitor import journal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SlowFile:
+    def __init__(self, path):
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write(self, s):
+        time.sleep(0.001)
+        return self.f.write(s)
+
+    def flush(self):
+        self.f.flush()
+
+
+def seqs(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["seq"] for line in f]
+
+
+def test_journal_ignores_log_queue_max(tmp_path, monkeypatch):
+    path = str(tmp_path / "trades.jsonl")
+    monkeypatch.setattr(config, "TRADE_JOURNAL", path)
+    monkeypatch.setattr(config, "LOG_QUEUE_MAX", 10)
+    monkeypatch.setattr(journal, "_writer", None)
+    monkeypatch.setattr(journal, "_open", lambda: SlowFile(path))
+    first = journal.record("order", endpoint="new_order", i=0)
+    for i in range(1, 5000):
+        journal.record("order", endpoint="new_order", i=i)
+    assert journal._writer.dropped == 0
+    journal.close()
+    assert seqs(path) == list(range(first, first + 5000))
+
+
+CHILD = textwrap.dedent("""
+    import os, signal, sys, time
+    sys.path.insert(0, {root!r})
+    os.environ.update(API_KEY="test", API_SECRET="test", TRADE_JOURNAL={path!r}, LOG_QUEUE_MAX="10")
+    import main
+    from monitor import journal
+    from tests.test_journal import SlowFile
+    journal._open = lambda: SlowFile({path!r})
+    signal.signal(signal.SIGTERM, main._exit_on_term)
+    try:
+        for i in range(3000):
+            journal.record("order", endpoint="new_order", i=i)
+        print("queued", journal._writer.q.qsize(), flush=True)
+        time.sleep(60)
+    except SystemExit:
+        pass
+    finally:
+        journal.close()
+""")
+
+
+def test_sigterm_flushes_journal(tmp_path):
+    path = str(tmp_path / "trades.jsonl")
+    p = subprocess.Popen([sys.executable, "-c", CHILD.format(root=ROOT, path=path)],
+                         stdout=subprocess.PIPE, text=True)
+    # 略過 config 載入時的輸出
+    line = next((ln for ln in p.stdout if ln.startswith("queued")), "")
+    assert line.startswith("queued") and int(line.split()[1]) > 0
+    p.send_signal(signal.SIGTERM)
+    assert p.wait(30) == 0
+    assert seqs(path) == list(range(1, 3001))
@@ -0,0 +1,84 @@
+# tests/test_kline_store.py
+"""K 線落地檔：停機太久整包重抓時不在舊檔留下空洞；load_kls 拒絕不連續的檔案。"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from backtest.data import load_kls
+from exchange.kline_cache import KlineCache, interval_ms
+from exchange.kline_store import KlineFile, KlineStore
+
+STEP = interval_ms("1m")
+NOW = 1_700_000_000_000 // STEP * STEP
+
+
+@pytest.fixture(autouse=True)
+def frozen_time(monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: (NOW + 30_000) / 1000)
+
+
+def row(ot):
+    c = str(100 + (ot // STEP) % 7)
+    return [ot, c, c, c, c, "1", ot + STEP - 1, "1", 1, "0", "0", "0"]
+
+
+class FakeClient:
+    """依目前時間產生連續的 1m K 線（最後一根為未收盤）。"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def fetch_klines(self, symbol, interval=None, limit=None, start_time=None):
+        self.calls.append((limit, start_time))
+        now = NOW
+        start = now - (limit - 1) * STEP if start_time is None else start_time
+        return [row(t) for t in range(start, min(now, start + (limit - 1) * STEP) + 1, STEP)]
+
+
+def seed_store(root, last_open, n):
+    f = KlineStore(root).file("BTCUSDT", "1m", STEP)
+    f.append([row(last_open - (n - 1 - i) * STEP) for i in range(n)])
+    f.flush()
+
+
+def test_long_downtime_rotates_instead_of_leaving_a_hole(tmp_path):
+    root = str(tmp_path)
+    now = NOW
+    old_last = now - 3000 * STEP
+    seed_store(root, old_last, 50)
+
+    cache = KlineCache(FakeClient(), size=100, ttl=0, store=KlineStore(root))
+    rows = asyncio.run(cache.get("BTCUSDT", "1m", limit=100))
+    assert len(rows) == 100 and rows[-1][0] == now
+    cache.close()
+
+    bars = load_kls(os.path.join(root, "BTCUSDT-1m.kls"))
+    assert len(bars) == 99
+    assert int(bars.open_time[0]) == now - 99 * STEP
+    old = load_kls(os.path.join(root, f"BTCUSDT-1m-{old_last - 49 * STEP}.kls"))
+    assert len(old) == 50 and int(old.open_time[-1]) == old_last
+
+
+def test_short_downtime_appends_to_same_file(tmp_path):
+    root = str(tmp_path)
+    now = NOW
+    seed_store(root, now - 20 * STEP, 200)
+
+    client = FakeClient()
+    cache = KlineCache(client, size=100, ttl=0, store=KlineStore(root))
+    asyncio.run(cache.get("BTCUSDT", "1m", limit=100))
+    cache.close()
+    assert client.calls == [(22, now - 20 * STEP)]
+    assert os.listdir(root) == ["BTCUSDT-1m.kls"]
+    assert len(load_kls(os.path.join(root, "BTCUSDT-1m.kls"))) == 219
+
+
+def test_load_kls_rejects_gaps(tmp_path):
+    path = str(tmp_path / "BTCUSDT-1m.kls")
+    f = KlineFile(path, STEP)
+    f.append([row(i * STEP) for i in range(10)] + [row(i * STEP) for i in range(15, 20)])
+    f.flush()
+    with pytest.raises(ValueError, match="non-contiguous"):
+        load_kls(path)
@@ -0,0 +1,34 @@
+# tests/test_market_stream.py
+"""訂閱清單變動：退訂的 symbol 不再標記為 live，也不再提供舊的 WS 行情。"""
+import asyncio
+
+from exchange.kline_cache import KlineCache
+from exchange.market_stream import MarketStream
+
+
+class FakeClient:
+    def __init__(self):
+        self.klines = KlineCache(self, size=10, ttl=0, store=None)
+
+
+def mark(sym, p):
+    return {"data": {"e": "markPriceUpdate", "E": 1, "s": sym, "p": str(p), "r": "0.0001"}}
+
+
+def test_update_symbols_drops_live_flag_and_marks():
+    client = FakeClient()
+    ms = MarketStream(client, ["AUSDT", "BUSDT"], interval="1m")
+    ms._set_live(True)
+    for s in ("AUSDT", "BUSDT"):
+        ms.handle(mark(s, 1.5))
+    assert client.klines._fresh(("BUSDT", "1m"))
+
+    asyncio.run(ms.update_symbols(["AUSDT", "CUSDT"]))
+    assert not client.klines._fresh(("BUSDT", "1m"))
+    assert client.klines._fresh(("AUSDT", "1m"))
+    assert ms.price("BUSDT") is None and "BUSDT" not in ms.funding
+    assert ms.price("AUSDT") == 1.5
+
+    # 重連前 socket 裡殘留的退訂 frame 不再寫入
+    ms.handle(mark("BUSDT", 2.0))
+    assert ms.price("BUSDT") is None
@@ -0,0 +1,49 @@
+# tests/test_precision.py
+"""exchange.precision 的整數路徑與舊版 Decimal 實作（tools.bench_precision）逐筆等價。"""
+from decimal import Decimal
+
+import pytest
+
+from exchange.precision import SymbolPrecision
+from exchange.symbol_registry import SymbolMeta
+from tools.bench_precision import STEPS, TICKS, check, compare_case
+
+
+def test_seeded_random_cases_match_legacy():
+    res = check(20_000, seed=11)
+    assert res["mismatches"] == 0, res["examples"]
+
+
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import given, settings, strategies as st  # noqa: E402
+
+
+@st.composite
+def metas(draw):
+    s, t = Decimal(draw(st.sampled_from(STEPS))), Decimal(draw(st.sampled_from(TICKS)))
+    return SymbolMeta(
+        symbol="TESTUSDT", step_size=s, min_qty=s * draw(st.sampled_from([1, 3])),
+        max_qty=s * draw(st.sampled_from([10 ** 4, 10 ** 6, 10 ** 9])),
+        tick_size=t, min_price=t, max_price=t * 10 ** 9,
+        min_notional=Decimal(draw(st.sampled_from(["0", "5", "20", "100"]))),
+    )
+
+
+def values(unit: Decimal):
+    """一般浮點數、剛好落在步進上、步進 ± 1e-15 相對誤差；也以字串形式送入。"""
+    plain = st.floats(min_value=0, max_value=1e7, allow_nan=False, allow_infinity=False)
+    on_grid = st.integers(0, 10 ** 6).map(lambda k: float(unit * k))
+    near = st.tuples(on_grid, st.sampled_from([-1, 1])).map(lambda x: max(0.0, x[0] + x[1] * x[0] * 1e-15))
+    num = st.one_of(plain, on_grid, near)
+    as_str = st.tuples(num, st.integers(0, 12)).map(lambda x: f"{x[0]:.{x[1]}f}")
+    return st.one_of(num, as_str)
+
+
+@settings(max_examples=500, deadline=None)
+@given(data=st.data())
+def test_matches_legacy_decimal(data):
+    meta = data.draw(metas())
+    prec = SymbolPrecision.from_meta(meta)
+    qty = data.draw(values(meta.step_size))
+    price = data.draw(values(meta.tick_size))
+    assert compare_case(meta, prec, qty, price, data.draw(st.booleans())) == []
@@ -0,0 +1,98 @@
+# tests/test_resample.py
+"""
+本地重採樣（exchange.bar_aggregator）：
+- BarAggregator._fold 的三條路徑：剛 bootstrap、重算尾端 bucket、base 沒涵蓋到最後一根
+- 錄下的交易所 1m K 線合成 5m / 15m / 1h，逐根比對交易所同週期回應
+  （fixture 以 python -m tools.verify_resample --record tests/fixtures/klines 錄製）
+"""
+import glob
+import os
+from collections import deque
+
+import pytest
+
+from exchange.bar_aggregator import BarAggregator, resample
+from exchange.kline_cache import interval_ms
+from tools.verify_resample import compare, load_fixture
+
+M1 = 60_000
+M5 = 5 * M1
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "klines")
+
+
+def m1(t, o, h, l, c, v=1.0):
+    return [t, str(o), str(h), str(l), str(c), str(v), t + M1 - 1, str(v * c), 3, str(v / 2), str(v * c / 2), "0"]
+
+
+def minutes(start, closes):
+    return [m1(start + i * M1, c, c + 1, c - 1, c) for i, c in enumerate(closes)]
+
+
+def five(rows):
+    return [r[:] for r in resample(rows, M5)]
+
+
+def test_fold_empty_series_or_base_needs_bootstrap():
+    assert BarAggregator._fold(deque(), minutes(0, [1, 2]), M5) is False
+    assert BarAggregator._fold(deque(five(minutes(0, [1]))), [], M5) is False
+
+
+def test_fold_base_older_than_series_keeps_rest_version():
+    # 剛 bootstrap：REST 的 5m 已含 base 之後的 bucket，不動
+    ser = deque(five(minutes(0, range(10))))
+    before = [r[:] for r in ser]
+    assert BarAggregator._fold(ser, minutes(0, range(4)), M5) is True
+    assert list(ser) == before
+
+
+def test_fold_replaces_trailing_bucket_and_appends_new():
+    base = minutes(0, [10, 11, 12, 13, 14, 15, 16])           # 0..4 一根完整 5m，5..6 未收盤
+    ser = deque(five(base[:6]), maxlen=10)                    # 最後一根 5m 只含第 5 分鐘
+    assert int(ser[-1][0]) == M5 and ser[-1][4] == 15.0
+    more = base + minutes(7 * M1, [17, 18, 19, 20])           # 補到第 10 分鐘（第三根 5m 開盤）
+    assert BarAggregator._fold(ser, more, M5) is True
+    assert [int(r[0]) for r in ser] == [0, M5, 2 * M5]
+    assert ser[1] == resample(more[5:10], M5)[0]              # 尾端那根以完整 5 分鐘重算
+    assert ser[1][4] == 19.0 and ser[1][2] == 20.0 and ser[1][5] == 5.0
+    assert ser[2][1] == 20.0 and ser[2][5] == 1.0
+
+
+def test_fold_same_rows_is_idempotent():
+    base = minutes(0, range(12))
+    ser = deque(five(base))
+    want = [r[:] for r in ser]
+    assert BarAggregator._fold(ser, base, M5) is True
+    assert BarAggregator._fold(ser, base, M5) is True
+    assert list(ser) == want
+
+
+def test_fold_base_not_covering_last_bucket_start():
+    # base 從 bucket 中間開始（離線太久、buffer 已滾過）：不能重算，要求重新 bootstrap
+    ser = deque(five(minutes(0, range(7))))
+    before = [r[:] for r in ser]
+    assert BarAggregator._fold(ser, minutes(6 * M1, range(20)), M5) is False
+    assert list(ser) == before
+
+
+def _recorded():
+    out = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*-1m.json"))):
+        symbol = os.path.basename(path).split("-")[0]
+        for iv in ("5m", "15m", "1h"):
+            if os.path.exists(os.path.join(FIXTURES, f"{symbol}-{iv}.json")):
+                out.append((symbol, iv))
+    return out
+
+
+@pytest.mark.skipif(not _recorded(), reason="尚未錄製交易所 fixture（tools.verify_resample --record）")
+@pytest.mark.parametrize("symbol,interval", _recorded() or [("", "")])
+def test_resample_matches_recorded_exchange(symbol, interval):
+    base = load_fixture(FIXTURES, symbol, "1m")
+    ref = load_fixture(FIXTURES, symbol, interval)
+    step = interval_ms(interval)
+    derived = resample(base, step)
+    if int(base[0][0]) % step:
+        derived = derived[1:]
+    overlap = {int(r[0]) for r in derived[:-1]} & {int(r[0]) for r in ref[:-1]}
+    assert overlap
+    assert compare(derived, ref) == []
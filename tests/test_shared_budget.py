@@ -0,0 +1,135 @@
+# tests/test_shared_budget.py
+"""共享限流鎖：持鎖的 process 被終止時，其它 process 不會永久卡住，下單排隊數也不會殘留。"""
+import asyncio
+import multiprocessing as mp
+import os
+import signal
+import time
+
+import pytest
+
+import config
+from engine.shards import _exit_on_term
+from exchange.rate_limiter import SharedBudget, SharedWeightLimiter
+
+ctx = mp.get_context("fork")
+
+
+def _hold_lock(budget, ready, term_handler, order_slot):
+    if term_handler:
+        signal.signal(signal.SIGTERM, _exit_on_term)
+    if order_slot is not None:
+        # 下單排隊中（已寫入自己那格）時拿著鎖被終止
+        SharedWeightLimiter(budget, slot=order_slot)._wait_order(1)
+    with budget.lock:
+        ready.set()
+        time.sleep(60)
+
+
+def _start_holder(budget, term_handler=False, order_slot=None):
+    ready = ctx.Event()
+    p = ctx.Process(target=_hold_lock, args=(budget, ready, term_handler, order_slot), daemon=True)
+    p.start()
+    assert ready.wait(10)
+    return p
+
+
+def _kill(p):
+    os.kill(p.pid, signal.SIGKILL)
+    p.join(5)
+
+
+def _used(budget):
+    return budget.values[SharedBudget.FIELDS.index("used_weight")]
+
+
+@pytest.fixture
+def short_timeout(monkeypatch):
+    monkeypatch.setattr(config, "SHARD_LOCK_TIMEOUT_S", 0.1)
+
+
+def test_killed_holder_times_out_without_blocking_loop(short_timeout):
+    budget = SharedBudget(ctx, slots=3)
+    lim = SharedWeightLimiter(budget, weight_limit=1000)
+    _kill(_start_holder(budget))
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        t = asyncio.create_task(ticker())
+        t0 = time.perf_counter()
+        await lim.acquire(5)
+        elapsed = time.perf_counter() - t0
+        t.cancel()
+        return ticks, elapsed
+
+    ticks, elapsed = asyncio.run(run())
+    assert 0.1 <= elapsed < 1.0
+    assert ticks >= 5          # 等鎖期間 event loop 照常運作
+    assert lim.lock_timeouts == 1
+
+    assert budget.recover() is True
+    asyncio.run(lim.acquire(5))
+    assert lim.lock_timeouts == 1
+    # 逾時期間的本地用量在下次持鎖時併入共享計數
+    assert _used(budget) == 10
+    assert budget.recover() is False
+
+
+def test_order_wait_released_while_lock_is_held_elsewhere(short_timeout):
+    budget = SharedBudget(ctx, slots=3)
+    gateway = SharedWeightLimiter(budget, weight_limit=1000)
+    worker = SharedWeightLimiter(budget, slot=1, weight_limit=1000)
+
+    async def run():
+        gateway._wait_order(1)                  # 持鎖時寫入：共享排隊數 = 1
+        assert sum(budget.waiting) == 1
+        p = _start_holder(budget)
+        _kill(p)
+        gateway._wait_order(-1)                 # 拿不到鎖：不寫入，背景重試
+        assert sum(budget.waiting) == 1
+        assert budget.recover() is True
+        await asyncio.sleep(0.05)
+        assert sum(budget.waiting) == 0
+        t0 = time.perf_counter()
+        await worker.acquire(1)
+        return time.perf_counter() - t0
+
+    assert asyncio.run(run()) < 0.05
+    assert worker.throttled == 0
+
+
+def test_dead_process_order_slot_is_cleared_on_recover(short_timeout):
+    budget = SharedBudget(ctx, slots=3)
+    _kill(_start_holder(budget, order_slot=2))
+    assert budget.waiting[2] == 1
+    assert budget.recover(slots=(2,)) is True
+    lim = SharedWeightLimiter(budget, slot=1, weight_limit=1000)
+    asyncio.run(lim.acquire(1))
+    assert lim.throttled == 0 and lim.lock_timeouts == 0
+
+
+def test_order_wait_is_never_negative(short_timeout):
+    budget = SharedBudget(ctx, slots=2)
+    lim = SharedWeightLimiter(budget, weight_limit=1000)
+    lim._wait_order(-1)
+    lim._wait_order(1)
+    assert budget.waiting[0] == 1
+    lim._wait_order(-1)
+    assert budget.waiting[0] == 0 and lim._order_waiting == 0
+
+
+def test_sigterm_releases_lock(short_timeout):
+    budget = SharedBudget(ctx)
+    p = _start_holder(budget, term_handler=True)
+    p.terminate()
+    p.join(5)
+    assert p.exitcode == 0
+    assert budget.lock.acquire(timeout=1)
+    budget.lock.release()
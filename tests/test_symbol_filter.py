@@ -0,0 +1,43 @@
+# tests/test_symbol_filter.py
+"""shortlist：空的掃描範圍不退回全市場 ticker。"""
+import asyncio
+
+import config
+from filters.symbol_filter import build_table, shortlist
+
+TICKERS = [{"symbol": "BTCUSDT", "quoteVolume": "9e9", "priceChangePercent": "1"},
+           {"symbol": "BTCUSDT_250926", "quoteVolume": "8e9", "priceChangePercent": "1"},
+           {"symbol": "OLDUSDT", "quoteVolume": "7e9", "priceChangePercent": "1"}]
+PREMIUMS = [{"symbol": t["symbol"], "lastFundingRate": "0.0001"} for t in TICKERS]
+
+
+class FakeClient:
+    registry = None
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get_all_24h_stats(self):
+        self.calls += 1
+        return TICKERS
+
+    async def get_all_premium_index(self):
+        self.calls += 1
+        return PREMIUMS
+
+
+def test_build_table_none_vs_empty():
+    assert build_table(TICKERS, PREMIUMS, [])["symbol"].tolist() == []
+    assert build_table(TICKERS, PREMIUMS, None)["symbol"].tolist() == ["BTCUSDT", "OLDUSDT"]
+
+
+def test_empty_universe_gives_empty_shortlist(monkeypatch):
+    monkeypatch.setattr(config, "SYMBOL_UNIVERSE", "all")   # registry 未載入
+    client = FakeClient()
+    assert asyncio.run(shortlist(client, max_candidates=5)) == []
+    assert client.calls == 0
+
+    monkeypatch.setattr(config, "SYMBOL_UNIVERSE", "pool")
+    monkeypatch.setattr(config, "SYMBOL_POOL", ["BTCUSDT"])
+    monkeypatch.setattr(config, "SYMBOL_DENYLIST", ["BTCUSDT"])
+    assert asyncio.run(shortlist(client, max_candidates=5)) == []
@@ -0,0 +1,177 @@
+# tools/bench_cycle.py
+"""
+整輪掃描 benchmark：對本地替身交易所（tools.mock_exchange，獨立 process）
+跑完整的 shortlist + manage_symbols 週期，或 HedgeEngine.run 週期。
+    python -m tools.bench_cycle --sizes 10,100,500 --cycles 5 --latency-ms 20 --out bench.json
+每個規模輸出：週期時間、每輪呼叫數、每輪 API weight、各階段的 wall / CPU 時間（JSON）。
+第 0 輪為冷啟動（registry / K 線快取皆為空），其餘為穩態。
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import platform
+import time
+
+# 必須在匯入 config 之前設定：假金鑰、全市場掃描、關閉 debug 輸出與一般日誌
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+os.environ["SYMBOL_UNIVERSE"] = "all"
+os.environ.setdefault("DEBUG_MODE", "false")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("TRADE_JOURNAL", "")
+
+import aiohttp  # noqa: E402
+
+import config  # noqa: E402
+from engine.hedge_engine import HedgeEngine  # noqa: E402
+from exchange.binance_client import BinanceClient  # noqa: E402
+from filters.symbol_filter import shortlist  # noqa: E402
+from main import manage_symbols  # noqa: E402
+from risk.risk_mgr import RiskManager  # noqa: E402
+from tools.mock_exchange import MockExchange, make_symbols, serve  # noqa: E402
+
+
+def _mock_process(n: int, port: int, opts: dict):
+    async def _run():
+        runner = await serve(MockExchange(make_symbols(n), **opts), port=port)
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await runner.cleanup()
+    asyncio.run(_run())
+
+
+async def _wait_ready(session: aiohttp.ClientSession, base_url: str, timeout: float = 10.0):
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        try:
+            async with session.get(f"{base_url}/fapi/v1/time") as r:
+                if r.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("mock exchange not ready")
+
+
+async def _stats(session: aiohttp.ClientSession, base_url: str) -> dict:
+    async with session.get(f"{base_url}/__stats?reset=1") as r:
+        return await r.json()
+
+
+class _Stage:
+    """量測一個階段的 wall / CPU 時間（ms）。"""
+
+    def __init__(self, out: dict, name: str):
+        self.out, self.name = out, name
+
+    def __enter__(self):
+        self.w0, self.c0 = time.perf_counter(), time.process_time()
+
+    def __exit__(self, *exc):
+        self.out[self.name] = {
+            "wall_ms": round((time.perf_counter() - self.w0) * 1000, 2),
+            "cpu_ms": round((time.process_time() - self.c0) * 1000, 2),
+        }
+
+
+async def _bench_size(mode: str, n: int, base_url: str, cycles: int) -> dict:
+    client = BinanceClient("bench", "bench", base_url=base_url)
+    rm = RiskManager(client)
+    engine = HedgeEngine(client, rm, max_candidates=n)
+    rows = []
+    async with aiohttp.ClientSession() as session:
+        await _wait_ready(session, base_url)
+        await _stats(session, base_url)
+        for c in range(cycles + 1):
+            stages = {}
+            t0 = time.perf_counter()
+            if c == 0:
+                with _Stage(stages, "registry"):
+                    await client.registry.load()
+            if mode == "engine":
+                with _Stage(stages, "engine_run"):
+                    await engine.run()
+            else:
+                client.klines.new_cycle()
+                with _Stage(stages, "shortlist"):
+                    candidates = await shortlist(client, max_candidates=n)
+                with _Stage(stages, "manage_symbols"):
+                    await manage_symbols(client, rm, candidates, {})
+            cycle_ms = (time.perf_counter() - t0) * 1000
+            st = await _stats(session, base_url)
+            rows.append({
+                "cycle": c, "cold": c == 0, "cycle_ms": round(cycle_ms, 2),
+                "calls": st["total_calls"], "weight": st["total_weight"],
+                "errors": st["errors"], "throttled": st["throttled"],
+                "calls_by_endpoint": st["calls"], "stages": stages,
+            })
+    await client.close()
+
+    warm = [r for r in rows if not r["cold"]] or rows
+
+    def _avg(key):
+        return round(sum(r[key] for r in warm) / len(warm), 2)
+
+    return {
+        "mode": mode, "symbols": n,
+        "cold_cycle_ms": rows[0]["cycle_ms"], "cold_calls": rows[0]["calls"], "cold_weight": rows[0]["weight"],
+        "steady_cycle_ms": _avg("cycle_ms"), "steady_calls": _avg("calls"), "steady_weight": _avg("weight"),
+        "limiter": client.limiter.utilization(),
+        "cycles": rows,
+    }
+
+
+def run(sizes, cycles: int, mode: str, port: int, opts: dict) -> dict:
+    results = []
+    for i, n in enumerate(sizes):
+        # 每個規模各起一個替身 process：weight 計數互不干擾，server CPU 也不算進 bot
+        p = port + i
+        proc = mp.Process(target=_mock_process, args=(n, p, opts), daemon=True)
+        proc.start()
+        try:
+            results.append(asyncio.run(_bench_size(mode, n, f"http://127.0.0.1:{p}", cycles)))
+        finally:
+            proc.terminate()
+            proc.join()
+    return {
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "config": {
+            "transport": config.BINANCE_TRANSPORT, "kline_cache": config.KLINE_CACHE_ENABLED,
+            "incremental_indicators": config.INCREMENTAL_INDICATORS, "kline_limit": config.KLINE_LIMIT,
+            "max_concurrency": int(os.getenv("BINANCE_MAX_CONCURRENCY", "5")),
+            "pipeline_concurrency": config.PIPELINE_CONCURRENCY,
+        },
+        "mock": opts,
+        "results": results,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="整輪掃描 benchmark（本地替身交易所）")
+    ap.add_argument("--sizes", default="10,100,500")
+    ap.add_argument("--cycles", type=int, default=3)
+    ap.add_argument("--mode", choices=("manage", "engine"), default="manage")
+    ap.add_argument("--port", type=int, default=18180)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--weight-limit", type=int, default=0)
+    ap.add_argument("--out", default="", help="另存 JSON 結果（追蹤版本間的效能回歸）")
+    args = ap.parse_args()
+    opts = {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate, "weight_limit": args.weight_limit}
+    res = run([int(x) for x in args.sizes.split(",") if x], args.cycles, args.mode, args.port, opts)
+    text = json.dumps(res, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# tools/bench_exit.py
+"""
+出場引擎 tick 吞吐量 benchmark（單核、不連網）：
+    python -m tools.bench_exit --symbols 500 --positions 50 --seconds 60
+以 !markPrice@arr@1s 格式的陣列 frame 餵給 ExitEngine.feed，價格小幅隨機漫步、門檻設為不觸發，
+量測的是純 tick 路徑（frame 解析後的 dict 查詢 / 比較 / 創新高重算）。
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+
+import numpy as np  # noqa: E402
+
+from position.position_mgr import PositionManager  # noqa: E402
+from risk.exit_engine import ExitEngine  # noqa: E402
+from tools.mock_exchange import make_symbols  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="出場引擎 tick 吞吐量 benchmark")
+    ap.add_argument("--symbols", type=int, default=500, help="每個 frame 的 symbol 數（全市場）")
+    ap.add_argument("--positions", type=int, default=50, help="持倉數")
+    ap.add_argument("--seconds", type=int, default=60, help="模擬的 frame 數（每秒一個）")
+    args = ap.parse_args()
+
+    symbols = make_symbols(args.symbols)
+    pm = PositionManager()
+    rng = np.random.default_rng(0)
+    for i, s in enumerate(symbols[:args.positions]):
+        pm.apply_position(s, 1.0 if i % 2 == 0 else -1.0, 100.0)
+    # 只量 tick 路徑：停損 / 追蹤門檻放到不會觸發（不送單）
+    engine = ExitEngine(None, pm, max_loss_pct=1.0, activation_pct=float("inf"))
+
+    # 預先產生 frame（隨機漫步，每步 ±0.01%，遠小於停損距離）
+    walk = 100.0 * np.cumprod(1 + rng.normal(0, 1e-4, size=(args.seconds, args.symbols)), axis=0)
+    frames = [[{"e": "markPriceUpdate", "E": 0, "s": s, "p": f"{p:.4f}"} for s, p in zip(symbols, row)]
+              for row in walk]
+
+    t0 = time.perf_counter()
+    for f in frames:
+        engine.feed(f)
+    elapsed = time.perf_counter() - t0
+    ticks = args.seconds * args.symbols
+    print(json.dumps({
+        "frames": args.seconds, "ticks": ticks, "positions": args.positions,
+        "elapsed_ms": round(elapsed * 1000, 2), "ticks_per_s": int(ticks / elapsed),
+        "us_per_frame": round(elapsed / args.seconds * 1e6, 1), "exits": engine.exits,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# tools/bench_klines.py
+"""
+K 線解析 micro-benchmark：舊版 pandas klines_to_df vs strategies.klines.parse_klines。
+    python -m tools.bench_klines --repeat 200
+輸出 JSON：各長度（200 / 1000 / 1500 根）每次呼叫的平均微秒數與加速倍率。
+"""
+import argparse
+import json
+import os
+import random
+import timeit
+
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+
+import pandas as pd  # noqa: E402
+
+from strategies.klines import parse_klines  # noqa: E402
+
+COLS = [
+    "open_time","open","high","low","close","volume","close_time",
+    "quote_asset_volume","num_trades","taker_buy_base","taker_buy_quote","ignore"
+]
+
+
+def legacy_klines_to_df(klines):
+    """原本 trend.py / revert.py 內的實作（作為比較基準）。"""
+    df = pd.DataFrame(klines, columns=COLS)
+    for c in ["open","high","low","close","volume"]:
+        df[c] = df[c].astype(float)
+    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
+    return df
+
+
+def fake_klines(n: int, step_ms: int = 300_000) -> list:
+    t0 = 1_700_000_000_000
+    p = 100.0
+    out = []
+    for i in range(n):
+        o = p
+        p = max(0.01, p + random.gauss(0, 0.5))
+        h, l = max(o, p) + 0.1, min(o, p) - 0.1
+        out.append([t0 + i * step_ms, f"{o:.4f}", f"{h:.4f}", f"{l:.4f}", f"{p:.4f}", "123.45",
+                    t0 + (i + 1) * step_ms - 1, "12345.6", 42, "60.0", "6000.0", "0"])
+    return out
+
+
+def run(repeat: int):
+    res = []
+    for n in (200, 1000, 1500):
+        kl = fake_klines(n)
+        t_old = min(timeit.repeat(lambda: legacy_klines_to_df(kl), number=repeat, repeat=3)) / repeat
+        t_new = min(timeit.repeat(lambda: parse_klines(kl), number=repeat, repeat=3)) / repeat
+        res.append({
+            "bars": n,
+            "pandas_us": round(t_old * 1e6, 1),
+            "numpy_us": round(t_new * 1e6, 1),
+            "speedup": round(t_old / t_new, 1) if t_new else None,
+        })
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser(description="K 線解析 benchmark")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+    print(json.dumps(run(args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
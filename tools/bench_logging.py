@@ -0,0 +1,108 @@
+# tools/bench_logging.py
+"""
+日誌開銷：同步 print vs monitor.log（背景 thread 寫出）vs 未啟用等級的 log.debug，以及 journal.record。
+    python -m tools.bench_logging --calls 20000 --write-us 50
+輸出以慢速 stdout 模擬（每次 write sleep --write-us 微秒，相當於終端機 / pipe 塞住）：
+1) 呼叫端每次呼叫的平均微秒數
+2) event loop 上每 tick 發 --per-tick 筆日誌時的 tick 延遲（p50 / max）
+3) journal：寫出筆數與 seq 連續性；有缺漏時 exit code 為 1（JSON）
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+os.environ["LOG_LEVEL"] = "INFO"
+os.environ["LOG_FILE"] = ""
+os.environ["LOG_QUEUE_MAX"] = "10000000"
+_JOURNAL = os.path.join(tempfile.mkdtemp(prefix="bench_journal_"), "trades.jsonl")
+os.environ["TRADE_JOURNAL"] = _JOURNAL
+
+
+class SlowStream:
+    """每次 write 固定延遲的 stdout 替身，只計算寫出的行數。"""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.lines = 0
+
+    def write(self, s: str):
+        time.sleep(self.delay_s)
+        self.lines += s.count("\n")
+        return len(s)
+
+    def flush(self):
+        pass
+
+
+def _per_call(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+async def _loop_lag(emit, ticks: int, per_tick: int, tick_s: float = 0.005) -> dict:
+    lags = []
+    for _ in range(ticks):
+        t0 = time.perf_counter()
+        for i in range(per_tick):
+            emit(i)
+        await asyncio.sleep(tick_s)
+        lags.append((time.perf_counter() - t0 - tick_s) * 1000)
+    lags.sort()
+    return {"p50_ms": round(lags[len(lags) // 2], 3), "max_ms": round(lags[-1], 3)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=20000)
+    ap.add_argument("--write-us", type=float, default=50.0, help="慢速 stdout 每次 write 的延遲（微秒）")
+    ap.add_argument("--ticks", type=int, default=200)
+    ap.add_argument("--per-tick", type=int, default=20)
+    args = ap.parse_args()
+
+    real_stdout = sys.stdout
+    slow = SlowStream(args.write_us / 1e6)
+    sys.stdout = slow   # log writer 第一次寫出時才開 stream，因此也會寫到 slow
+    from monitor import journal, log
+
+    def p(i):
+        print(f"[SIGNAL] BTCUSDT -> LONG {i}")
+
+    def info(i):
+        log.info("SIGNAL", "%s -> %s %d", "BTCUSDT", "LONG", i)
+
+    def debug(i):
+        log.debug("SKIP", "%s 無交易訊號 %d", "BTCUSDT", i)
+
+    def rec(i):
+        journal.record("order", endpoint="new_order", params={"symbol": "BTCUSDT", "side": "BUY", "quantity": str(i)})
+
+    out = {"calls": args.calls, "write_us": args.write_us, "per_call_us": {}, "loop_lag": {}}
+    for name, fn in (("print", p), ("log.info", info), ("log.debug(disabled)", debug), ("journal.record", rec)):
+        out["per_call_us"][name] = round(_per_call(fn, args.calls), 3)
+    log.flush(60)
+    for name, fn in (("print", p), ("log.info", info)):
+        out["loop_lag"][name] = asyncio.run(_loop_lag(fn, args.ticks, args.per_tick))
+    log.flush(60)
+    journal.flush(60)
+    out["log"] = log.stats()
+
+    with open(_JOURNAL, encoding="utf-8") as f:
+        seqs = [json.loads(line)["seq"] for line in f]
+    out["journal"] = {"lines": len(seqs), "expected": args.calls,
+                      "contiguous": seqs == list(range(1, len(seqs) + 1))}
+    sys.stdout = real_stdout
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+    ok = out["journal"]["lines"] == args.calls and out["journal"]["contiguous"]
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# tools/bench_precision.py
+"""
+下單量化：舊版 Decimal 路徑 vs exchange.precision 的整數路徑。
+    python -m tools.bench_precision --cases 200000 --repeat 20000
+1) 等價性：隨機產生 stepSize / tickSize / 上下限與輸入值（float、字串、剛好落在步進上的邊界值），
+   逐筆比對數量捨去、價格對齊、最小名目檢查與送單字串；有任何不一致時 exit code 為 1。
+   同一組比對（compare_case）也在 tests/test_precision.py 以 Hypothesis 跑，不必手動執行。
+2) micro-benchmark：每次呼叫的平均微秒數與加速倍率（JSON）。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal, getcontext
+
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+os.environ.setdefault("TRADE_JOURNAL", "")
+
+from exchange.precision import SymbolPrecision  # noqa: E402
+from exchange.symbol_registry import SymbolMeta  # noqa: E402
+
+getcontext().prec = 28
+
+STEPS = ["1", "10", "5", "0.5", "0.1", "0.025", "0.01", "0.001", "0.0001", "0.00001", "0.00100000"]
+TICKS = ["1", "0.5", "0.1", "0.01", "0.001", "0.0001", "0.000010", "0.0000001"]
+
+
+# ---------- 舊版實作（作為比較基準） ----------
+def legacy_quantize(meta: SymbolMeta, qty) -> Decimal:
+    """原本 BinanceClient._lot_size_constraints + _quantize_qty。"""
+    step, min_qty, max_qty = meta.market_constraints()
+    qty = Decimal(str(qty))
+    if max_qty > 0 and qty > max_qty:
+        qty = max_qty
+    q = (qty // step) * step if step != 0 else qty
+    return Decimal("0") if q < min_qty else q
+
+
+def legacy_price(tick: Decimal, price, up: bool) -> Decimal:
+    p = Decimal(str(price))
+    return (p / tick).to_integral_value(rounding=ROUND_CEILING if up else ROUND_FLOOR) * tick
+
+
+def legacy_size(meta: SymbolMeta, equity, available, price, ratio="0.02", leverage=30) -> Decimal:
+    """原本 RiskManager._qty_for 的 Decimal 運算。"""
+    margin = min(Decimal(str(equity)) * Decimal(ratio), Decimal(str(available)))
+    raw = (margin * Decimal(str(leverage))) / Decimal(str(price))
+    q = legacy_quantize(meta, raw)
+    return q * Decimal(str(price)) / Decimal(str(leverage))
+
+
+def new_size(prec: SymbolPrecision, equity, available, price, ratio=0.02, leverage=30):
+    margin = min(equity * ratio, available)
+    u = prec.floor_qty(margin * leverage / price)
+    return prec.qty_str(u), prec.qty_float(u) * price / leverage
+
+
+# ---------- 隨機案例 ----------
+def random_meta(rng: random.Random) -> SymbolMeta:
+    step, tick = rng.choice(STEPS), rng.choice(TICKS)
+    s, t = Decimal(step), Decimal(tick)
+    return SymbolMeta(
+        symbol="TESTUSDT", step_size=s, min_qty=s * rng.choice([1, 1, 3]),
+        max_qty=s * rng.choice([10 ** 4, 10 ** 6, 10 ** 9]),
+        tick_size=t, min_price=t, max_price=t * 10 ** 9,
+        min_notional=Decimal(rng.choice(["0", "5", "20", "100"])),
+    )
+
+
+def random_value(rng: random.Random, unit: Decimal):
+    """隨機數量 / 價格：一般值、剛好在步進上、步進 ± 極小值；型別為 float 或字串。"""
+    kind = rng.random()
+    if kind < 0.5:
+        v = 10 ** rng.uniform(-6, 7)
+    else:
+        k = rng.randint(0, 10 ** 6)
+        v = float(unit * k)
+        if kind > 0.8:
+            v = v + rng.choice([-1, 1]) * v * 1e-15
+    v = max(v, 0.0)
+    return f"{v:.{rng.randint(0, 12)}f}" if rng.random() < 0.3 else v
+
+
+def compare_case(meta: SymbolMeta, prec: SymbolPrecision, qty, price, up: bool) -> list:
+    """單筆案例：數量捨去、價格對齊、最小名目與舊版比對，回傳不一致清單（tests/test_precision.py 共用）。"""
+    bad = []
+    ref = legacy_quantize(meta, qty)
+    u = prec.floor_qty(qty)
+    got = prec.qty_str(u) if u > 0 else "0"
+    if (ref > 0 and got != str(ref)) or (ref <= 0 and u != 0):
+        bad.append({"kind": "qty", "step": str(meta.step_size), "in": repr(qty), "ref": str(ref), "got": got})
+
+    ref_p = legacy_price(meta.tick_size, price, up)
+    pu = prec.round_price(price, up=up)
+    in_range = meta.min_price <= ref_p <= meta.max_price and ref_p > 0
+    # 舊版沒有價格對齊：基準只比數值（送單字串固定為 tickSize 的小數位數）
+    if (in_range and Decimal(prec.price_str(pu)) != ref_p) or (not in_range and pu != 0):
+        bad.append({"kind": "price", "tick": str(meta.tick_size), "in": repr(price), "up": up,
+                    "ref": str(ref_p), "got": prec.price_str(pu)})
+
+    if u > 0 and pu > 0:
+        ref_ok = ref * ref_p >= meta.min_notional
+        if prec.notional_ok(u, pu) != ref_ok:
+            bad.append({"kind": "notional", "qty": got, "price": prec.price_str(pu),
+                        "min": str(meta.min_notional)})
+    return bad
+
+
+def check(cases: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    bad = []
+    n = 0
+    for _ in range(max(1, cases // 50)):
+        meta = random_meta(rng)
+        prec = SymbolPrecision.from_meta(meta)
+        for _ in range(50):
+            n += 1
+            qty = random_value(rng, meta.step_size)
+            price = random_value(rng, meta.tick_size)
+            bad += compare_case(meta, prec, qty, price, rng.random() < 0.5)
+    return {"cases": n, "mismatches": len(bad), "examples": bad[:10]}
+
+
+def bench(repeat: int) -> list:
+    meta = SymbolMeta(symbol="BTCUSDT", step_size=Decimal("0.001"), min_qty=Decimal("0.001"),
+                      max_qty=Decimal("1000"), market_step_size=Decimal("0.001"),
+                      market_min_qty=Decimal("0.001"), market_max_qty=Decimal("120"),
+                      tick_size=Decimal("0.10"), min_price=Decimal("556.80"),
+                      max_price=Decimal("4529764"), min_notional=Decimal("100"))
+    prec = SymbolPrecision.from_meta(meta)
+    qty, price = 1.2345678912345, 64123.37
+    tick = meta.tick_size
+    rows = []
+    for name, old, new in (
+        ("quantize_qty", lambda: str(legacy_quantize(meta, qty)),
+         lambda: prec.qty_str(prec.floor_qty(qty))),
+        ("round_price", lambda: str(legacy_price(tick, price, False)),
+         lambda: prec.price_str(prec.round_price(price))),
+        ("size_order", lambda: legacy_size(meta, 1234.56, 1000.0, price),
+         lambda: new_size(prec, 1234.56, 1000.0, price)),
+    ):
+        t_old = min(timeit.repeat(old, number=repeat, repeat=3)) / repeat
+        t_new = min(timeit.repeat(new, number=repeat, repeat=3)) / repeat
+        rows.append({"op": name, "decimal_us": round(t_old * 1e6, 3), "int_us": round(t_new * 1e6, 3),
+                     "speedup": round(t_old / t_new, 1) if t_new else None})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="下單量化：Decimal vs 整數運算")
+    ap.add_argument("--cases", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=20_000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    eq = check(args.cases, args.seed)
+    print(json.dumps({"equivalence": eq, "benchmark": bench(args.repeat)}, indent=2))
+    sys.exit(1 if eq["mismatches"] else 0)
+
+
+if __name__ == "__main__":
+    main()
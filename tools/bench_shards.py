@@ -0,0 +1,106 @@
+# tools/bench_shards.py
+"""
+分片掃描的擴展性：不同 symbol 數 × worker 數下，每個 shard 的穩態週期時間。
+    python -m tools.bench_shards --sizes 7,100,300 --workers 1,4 --cycles 3 --latency-ms 20
+每個組合各起一個替身交易所 process（tools.mock_exchange），以 SCHEDULER_MODE=interval 讓 worker 連續掃描，
+讀共享 health 陣列取得各 shard 的週期時間（第 0 輪冷啟動不計）；gateway 只計數、不下單。
+--pandas 改用 pandas 指標路徑（INCREMENTAL_INDICATORS=false），CPU 負載較重、較能看出多核效果。
+連續掃描會很快用完真實帳戶的每分鐘 weight，預設把 BINANCE_WEIGHT_LIMIT 放大，只量 CPU / I/O 的擴展性；
+要觀察共用額度的節流，改用 --weight-limit 2400。worker 數超過 CPU 核心數時不會更快（輸出含 cpu_count）。
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+# 必須在匯入 config 之前設定（worker 以 spawn 啟動，也會繼承這些環境變數）
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+os.environ.setdefault("DEBUG_MODE", "false")
+os.environ["SCHEDULER_MODE"] = "interval"
+os.environ["SCAN_INTERVAL"] = "1"
+os.environ["MARKET_DATA_MODE"] = "rest"
+os.environ.setdefault("BINANCE_WEIGHT_LIMIT", "1000000")
+if "--weight-limit" in sys.argv and sys.argv[sys.argv.index("--weight-limit") + 1] != "0":
+    os.environ["BINANCE_WEIGHT_LIMIT"] = sys.argv[sys.argv.index("--weight-limit") + 1]
+if "--pandas" in sys.argv:
+    os.environ["INCREMENTAL_INDICATORS"] = "false"
+
+from engine.shards import ShardCoordinator  # noqa: E402
+from exchange.rate_limiter import SharedBudget  # noqa: E402
+from tools.bench_cycle import _mock_process  # noqa: E402
+from tools.mock_exchange import make_symbols  # noqa: E402
+
+
+async def _bench(n: int, workers: int, cycles: int, timeout: float) -> dict:
+    symbols = make_symbols(n)
+    seen = {"intents": 0}
+
+    async def count(intents):
+        seen["intents"] += len(intents)
+
+    shards = ShardCoordinator(SharedBudget(slots=workers + 1), on_intents=count, workers=workers)
+    shards.update(symbols)
+    shards.start()
+    samples = {i: {} for i in range(workers)}
+    t0 = time.monotonic()
+    try:
+        while time.monotonic() - t0 < timeout:
+            await asyncio.sleep(0.05)
+            for h in shards.health():
+                if h["cycles"] > 1:          # 第 1 輪為冷啟動（K 線快取為空）
+                    samples[h["shard"]][h["cycles"]] = h["cycle_ms"]
+            if all(len(s) >= cycles for s in samples.values()):
+                break
+    finally:
+        shards.stop()
+    per_shard = [sum(s.values()) / len(s) if s else None for s in samples.values()]
+    done = [x for x in per_shard if x is not None]
+    return {
+        "symbols": n, "workers": workers,
+        "shard_symbols": [len(p) for p in shards._assigned],
+        "steady_cycle_ms": round(max(done), 1) if done else None,
+        "per_shard_cycle_ms": [round(x, 1) if x is not None else None for x in per_shard],
+        "intents": seen["intents"],
+    }
+
+
+def run(sizes, workers, cycles: int, port: int, opts: dict, timeout: float) -> list:
+    results = []
+    for k, n in enumerate(sizes):
+        p = port + k
+        proc = mp.get_context("spawn").Process(target=_mock_process, args=(n, p, opts), daemon=True)
+        proc.start()
+        os.environ["BINANCE_BASE_URL"] = f"http://127.0.0.1:{p}"
+        time.sleep(1.5)
+        try:
+            for w in workers:
+                results.append(asyncio.run(_bench(n, w, cycles, timeout)))
+        finally:
+            proc.terminate()
+            proc.join()
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="分片掃描擴展性 benchmark（本地替身交易所）")
+    ap.add_argument("--sizes", default="7,100,300")
+    ap.add_argument("--workers", default="1,4")
+    ap.add_argument("--cycles", type=int, default=3)
+    ap.add_argument("--port", type=int, default=18280)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--timeout", type=float, default=180.0, help="每個組合最多等待秒數")
+    ap.add_argument("--pandas", action="store_true", help="改用 pandas 指標路徑")
+    ap.add_argument("--weight-limit", type=int, default=0, help="共用的每分鐘 weight 上限（0 = 不限）")
+    args = ap.parse_args()
+    opts = {"latency_ms": args.latency_ms, "jitter_ms": 0.0, "error_rate": 0.0, "weight_limit": 0}
+    res = run([int(x) for x in args.sizes.split(",") if x], [int(x) for x in args.workers.split(",") if x],
+              args.cycles, args.port, opts, args.timeout)
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": res}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
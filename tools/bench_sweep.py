@@ -0,0 +1,87 @@
+# tools/bench_sweep.py
+"""
+參數掃描的吞吐量：合成的 5m K 線（隨機漫步、價格對齊 tick）× 網格，與逐組合 replay 比較。
+    python -m tools.bench_sweep --bars 26000 --files 2 --workers 4 --replay-sample 2
+網格預設 4×3×2×3×2×2 = 288 組；--replay-sample 個組合另以 backtest.replay 實跑，
+換算成整個網格的估計耗時並逐欄比對結果（不一致時 exit code 為 1）。
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+os.environ.setdefault("DEBUG_MODE", "false")
+
+import numpy as np  # noqa: E402
+
+from backtest import sweep  # noqa: E402
+from backtest.data import KLINE_DTYPE  # noqa: E402
+
+GRID = {
+    "TREND_EMA_FAST": [8, 10, 12, 16],
+    "TREND_EMA_SLOW": [21, 26, 34],
+    "MACD_SIGNAL": [7, 9],
+    "REVERT_RSI_OVERSOLD": [30, 35, 40],
+    "REVERT_RSI_OVERBOUGHT": [60, 70],
+    "BOLL_STDDEV": [2.0, 2.5],
+}
+
+
+def synth(path: str, n: int, seed: int, p0: float = 100.0):
+    rng = np.random.default_rng(seed)
+    tick = p0 * 1e-4
+    close = p0 + np.cumsum(np.round(rng.standard_t(4, n) * p0 * 0.002 / tick) * tick)
+    close = np.round(close.clip(p0 * 0.2) / tick) * tick
+    opn = np.concatenate([[p0], close[:-1]])
+    wick = np.round(np.abs(rng.normal(0, p0 * 0.001, (2, n))) / tick) * tick
+    rec = np.empty(n, dtype=KLINE_DTYPE)
+    rec["open_time"] = 1_700_000_000_000 + np.arange(n) * 300_000
+    rec["open"], rec["close"] = opn, close
+    rec["high"] = np.maximum(opn, close) + wick[0]
+    rec["low"] = np.minimum(opn, close) - wick[1]
+    rec["volume"] = 1.0
+    rec["close_time"] = rec["open_time"] + 299_999
+    np.save(path, rec)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="參數掃描 vs 逐組合 replay")
+    ap.add_argument("--bars", type=int, default=26000, help="每個檔案的 K 線數（26000 根 5m ≈ 3 個月）")
+    ap.add_argument("--files", type=int, default=2)
+    ap.add_argument("--workers", type=int, default=0, help="0 = CPU 核心數")
+    ap.add_argument("--replay-sample", type=int, default=2)
+    args = ap.parse_args()
+
+    root = tempfile.mkdtemp(prefix="sweep_bench_")
+    try:
+        paths = [os.path.join(root, f"SYN{i}USDT-5m.npy") for i in range(args.files)]
+        for i, p in enumerate(paths):
+            synth(p, args.bars, seed=i)
+        t0 = time.perf_counter()
+        rows = sweep.sweep(paths, GRID, workers=args.workers or None)
+        elapsed = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        bad = sweep.verify(paths, rows, args.replay_sample)
+        replay_per_combo = (time.perf_counter() - t0) / max(1, min(args.replay_sample, len(rows)))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    out = {
+        "cpu_count": os.cpu_count(), "files": args.files, "bars": args.bars, "combos": len(rows),
+        "sweep_s": round(elapsed, 2),
+        "sweep_ms_per_combo": round(1000 * elapsed / max(1, len(rows)), 2),
+        "replay_ms_per_combo": round(1000 * replay_per_combo, 2),
+        "replay_est_s": round(replay_per_combo * len(rows), 1),
+        "speedup": round(replay_per_combo * len(rows) / elapsed, 1) if elapsed else None,
+        "mismatched": len(bad),
+    }
+    print(json.dumps(out, indent=2))
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# tools/bench_transport.py
+"""
+比較兩種 REST 傳輸層（executor vs aiohttp）對本地替身伺服器的延遲與吞吐：
+    python -m tools.bench_transport --requests 2000 --concurrency 20
+輸出 JSON：每種傳輸層的 p50 / p99 延遲（ms）與 requests/sec。
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# config.py 沒有金鑰會直接結束；benchmark 一律使用假金鑰打本地伺服器
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+
+from exchange.binance_client import BinanceClient  # noqa: E402
+from tools.mock_exchange import MockExchange, make_symbols, serve  # noqa: E402
+
+
+def _pct(values, q):
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * (len(s) - 1) + 0.5))] if s else 0.0
+
+
+async def _bench_one(transport: str, base_url: str, symbols, n: int, concurrency: int, signed_every: int):
+    client = BinanceClient("bench", "bench", base_url=base_url, transport=transport)
+    client._sem = asyncio.Semaphore(concurrency)
+    lat = []
+
+    async def one(i):
+        t0 = time.perf_counter()
+        if signed_every and i % signed_every == 0:
+            await client._call("balance")
+        else:
+            await client.fetch_klines(symbols[i % len(symbols)], interval="5m", limit=200)
+        lat.append((time.perf_counter() - t0) * 1000)
+
+    # 暖機（建立連線池）
+    await asyncio.gather(*(one(i) for i in range(min(concurrency, n))))
+    lat.clear()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    wall = time.perf_counter() - t0
+    await client.close()
+    return {
+        "transport": transport,
+        "requests": n,
+        "concurrency": concurrency,
+        "p50_ms": round(_pct(lat, 0.50), 3),
+        "p99_ms": round(_pct(lat, 0.99), 3),
+        "rps": round(n / wall, 1),
+    }
+
+
+async def run(n: int, concurrency: int, port: int, signed_every: int):
+    symbols = make_symbols(20)
+    runner = await serve(MockExchange(symbols), port=port)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        results = []
+        for transport in ("executor", "aiohttp"):
+            results.append(await _bench_one(transport, base_url, symbols, n, concurrency, signed_every))
+        return results
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="REST 傳輸層 benchmark")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--port", type=int, default=18080)
+    ap.add_argument("--signed-every", type=int, default=10, help="每 N 個請求插入一個簽名請求（0 = 不插入）")
+    args = ap.parse_args()
+    res = asyncio.run(run(args.requests, args.concurrency, args.port, args.signed_every))
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# tools/bench_warm_start.py
+"""
+K 線持久化的啟動成本：冷啟動（整包 REST）vs 從 KLINE_STORE 還原（只補缺口）。
+    python -m tools.bench_warm_start --symbols 200 --latency-ms 50 --downtime-bars 12
+1) 冷啟動：空的 store，所有 symbol 各抓一次 KLINE_BUFFER_SIZE 根（同時寫進 store）
+2) 模擬停機：每個檔案砍掉最後 --downtime-bars 根，等同離線期間沒寫到的 K 線
+3) 暖啟動：新的 client 讀同一個 store，只補缺口
+輸出兩次啟動的耗時、呼叫數、weight，並逐根比對還原後的 buffer 與 REST 結果（不一致時 exit code 為 1）。
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("API_KEY", "bench")
+os.environ.setdefault("API_SECRET", "bench")
+os.environ.setdefault("DEBUG_MODE", "false")
+
+import aiohttp  # noqa: E402
+
+from exchange.binance_client import BinanceClient  # noqa: E402
+from exchange.kline_store import KlineStore  # noqa: E402
+from tools.mock_exchange import MockExchange, make_symbols, serve  # noqa: E402
+
+
+async def _stats(base_url: str) -> dict:
+    async with aiohttp.ClientSession() as s:
+        async with s.get(f"{base_url}/__stats?reset=1") as r:
+            return await r.json()
+
+
+async def _start(base_url: str, root: str, symbols, interval: str) -> dict:
+    """新的 client（等同重新啟動）把所有 symbol 的 K 線載入到可評估的狀態。"""
+    client = BinanceClient("bench", "bench", base_url=base_url)
+    client.klines.store = KlineStore(root)
+    await _stats(base_url)
+    t0 = time.perf_counter()
+    res = await asyncio.gather(*(client.klines.get(s, interval=interval, limit=client.klines.size)
+                                 for s in symbols))
+    elapsed = time.perf_counter() - t0
+    st = await _stats(base_url)
+    await client.close()
+    return {"elapsed_ms": round(elapsed * 1000, 2), "calls": st["total_calls"],
+            "weight": st["total_weight"], "rows": dict(zip(symbols, res))}
+
+
+def _drop_tail(root: str, symbols, interval: str, n: int):
+    store = KlineStore(root)
+    for s in symbols:
+        f = store.file(s, interval)
+        f.truncate(f.count - n)
+    store.close()
+
+
+def _diff(a: list, b: list) -> int:
+    """已收盤 K 線逐欄比對（數值比較：還原的是數字，REST 是字串）。"""
+    ours = {int(r[0]): r for r in a[:-1]}
+    bad = 0
+    for r in b[:-1]:
+        d = ours.get(int(r[0]))
+        if d is None or any(float(d[i]) != float(r[i]) for i in range(11)):
+            bad += 1
+    return bad
+
+
+async def _run(args) -> int:
+    symbols = make_symbols(args.symbols)
+    runner = await serve(MockExchange(symbols, latency_ms=args.latency_ms), port=args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    root = args.dir or tempfile.mkdtemp(prefix="kline_store_")
+    try:
+        cold = await _start(base_url, root, symbols, args.interval)
+        _drop_tail(root, symbols, args.interval, args.downtime_bars)
+        warm = await _start(base_url, root, symbols, args.interval)
+        ref = await _start(base_url, tempfile.mkdtemp(prefix="kline_ref_"), symbols, args.interval)
+    finally:
+        await runner.cleanup()
+        if not args.dir:
+            shutil.rmtree(root, ignore_errors=True)
+    mismatched = sum(_diff(warm["rows"][s], ref["rows"][s]) for s in symbols)
+    out = {
+        "symbols": len(symbols), "interval": args.interval, "downtime_bars": args.downtime_bars,
+        "cold": {k: v for k, v in cold.items() if k != "rows"},
+        "warm": {k: v for k, v in warm.items() if k != "rows"},
+        "speedup": round(cold["elapsed_ms"] / warm["elapsed_ms"], 2) if warm["elapsed_ms"] else None,
+        "mismatched_bars": mismatched,
+    }
+    print(json.dumps(out, indent=2))
+    return mismatched
+
+
+def main():
+    ap = argparse.ArgumentParser(description="K 線持久化：冷啟動 vs 暖啟動")
+    ap.add_argument("--symbols", type=int, default=100)
+    ap.add_argument("--interval", default="5m")
+    ap.add_argument("--downtime-bars", type=int, default=12)
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    ap.add_argument("--port", type=int, default=18200)
+    ap.add_argument("--dir", default="", help="store 目錄（預設用暫存目錄，結束後刪除）")
+    args = ap.parse_args()
+    sys.exit(1 if asyncio.run(_run(args)) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+# tools/mock_exchange.py
+"""
+本地 USDT-M 期貨替身伺服器（只實作 bot 會用到的端點），回傳格式與 fapi 相同。
+    python -m tools.mock_exchange --port 8080 --symbols 50 --latency-ms 20 --jitter-ms 5 \
+        --error-rate 0.01 --weight-limit 2400
+再以 BINANCE_BASE_URL=http://127.0.0.1:8080 啟動 bot / benchmark。
+- 可設定延遲、抖動、隨機 5xx 錯誤率，以及超過每分鐘 weight 時回 429 + Retry-After
+- 每個回應帶 X-MBX-USED-WEIGHT-1M header
+- klines 依 interval 參數回傳；各週期都由同一條 1m 路徑合成，可用來驗證本地重採樣
+- GET /__stats（?reset=1 同時歸零）回傳各端點呼叫數與累計 weight
+- 市價單立即以當下價格成交並記錄持倉（positionRisk）；/ws/<listenKey> 推送
+  ORDER_TRADE_UPDATE / ACCOUNT_UPDATE，可用來測試 user data stream；
+  /ws/!markPrice@arr@1s 每秒推送全市場標記價格
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Set
+
+from aiohttp import web
+
+from exchange.endpoints import ENDPOINTS, weight_of
+
+
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000}
+
+
+def _step_ms(interval: str) -> int:
+    """'15m' -> 900000（不匯入 exchange.kline_cache：那會載入需要金鑰的 config）。"""
+    try:
+        return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+    except (KeyError, ValueError, IndexError):
+        return 0
+
+
+def make_symbols(n: int) -> List[str]:
+    base = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "ADAUSDT", "DOGEUSDT", "1000PEPEUSDT"]
+    extra = [f"MOCK{i:03d}USDT" for i in range(max(0, n - len(base)))]
+    return (base + extra)[:n]
+
+
+class MockExchange:
+    def __init__(self, symbols: List[str], interval_ms: int = 300_000, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0, weight_limit: int = 0):
+        self.symbols = symbols
+        self.interval_ms = interval_ms
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.weight_limit = weight_limit
+        self.orders = 0
+        self.positions: Dict[str, List[float]] = {}   # symbol -> [positionAmt, entryPrice]
+        self.user_ws: Set[web.WebSocketResponse] = set()
+        self._paths = {(ep.method, ep.path): name for name, ep in ENDPOINTS.items()}
+        self._window = 0
+        self.used_weight = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.calls = Counter()
+        self.weight = Counter()
+        self.errors = 0
+        self.throttled = 0
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(self.calls), "weight": dict(self.weight),
+            "total_calls": sum(self.calls.values()), "total_weight": sum(self.weight.values()),
+            "errors": self.errors, "throttled": self.throttled,
+        }
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        if request.path.startswith(("/__", "/ws/")):
+            return await handler(request)
+        name = self._paths.get((request.method, request.path), request.path)
+        w = weight_of(name, dict(request.query)) if name in ENDPOINTS else 1
+        now = time.time()
+        if int(now // 60) != self._window:
+            self._window = int(now // 60)
+            self.used_weight = 0
+        if self.weight_limit and self.used_weight + w > self.weight_limit:
+            self.throttled += 1
+            return web.json_response(
+                {"code": -1003, "msg": "Too many requests; current limit is exceeded."}, status=429,
+                headers={"Retry-After": str(int(60 - now % 60) + 1),
+                         "X-MBX-USED-WEIGHT-1M": str(self.used_weight)},
+            )
+        self.used_weight += w
+        self.calls[name] += 1
+        self.weight[name] += w
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep(max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"code": -1001, "msg": "Internal error."}, status=503)
+        resp = await handler(request)
+        resp.headers["X-MBX-USED-WEIGHT-1M"] = str(self.used_weight)
+        return resp
+
+    # 以時間決定性地產生價格，讓多次請求的 K 線彼此一致
+    def _price(self, symbol: str, t_ms: int) -> float:
+        seed = sum(ord(c) for c in symbol)
+        x = t_ms / self.interval_ms
+        return 100.0 + seed % 50 + 5 * math.sin(x / 7 + seed) + 2 * math.sin(x / 2.3 + seed / 3)
+
+    def _minute(self, symbol: str, open_ms: int) -> tuple:
+        o = round(self._price(symbol, open_ms), 4)
+        c = round(self._price(symbol, open_ms + 60_000), 4)
+        h, l = round(max(o, c) * 1.001, 4), round(min(o, c) * 0.999, 4)
+        return o, h, l, c
+
+    def kline_row(self, symbol: str, open_ms: int, step: int = None) -> list:
+        """任何週期的 K 線都由 1m 子 K 線合成，不同 interval 的回應彼此一致（可驗證本地重採樣）。"""
+        step = step or self.interval_ms
+        subs = [self._minute(symbol, t) for t in range(open_ms, open_ms + step, 60_000)]
+        o, c = subs[0][0], subs[-1][3]
+        h, l = max(x[1] for x in subs), min(x[2] for x in subs)
+        n = len(subs)
+        vol = 1000.0 * 60_000 / self.interval_ms   # 每根 1m 的量；預設 5m 一根仍為 1000
+        return [open_ms, f"{o:.4f}", f"{h:.4f}", f"{l:.4f}", f"{c:.4f}", f"{vol * n:.1f}",
+                open_ms + step - 1, f"{sum(vol * x[3] for x in subs):.2f}", 20 * n,
+                f"{vol * n / 2:.1f}", f"{sum(vol / 2 * x[3] for x in subs):.2f}", "0"]
+
+    def klines(self, symbol: str, limit: int, start_time: int = None, step: int = None) -> list:
+        step = step or self.interval_ms
+        now = int(time.time() * 1000)
+        last_open = now - now % step
+        first = last_open - (limit - 1) * step
+        if start_time is not None:
+            first = max(int(start_time) - int(start_time) % step, first)
+        return [self.kline_row(symbol, t, step) for t in range(first, last_open + 1, step)][:limit]
+
+    def symbol_info(self, symbol: str) -> dict:
+        return {
+            "symbol": symbol, "status": "TRADING", "quoteAsset": "USDT", "contractType": "PERPETUAL",
+            "filters": [
+                {"filterType": "PRICE_FILTER", "tickSize": "0.0001", "minPrice": "0.0001", "maxPrice": "1000000"},
+                {"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "10000"},
+                {"filterType": "MARKET_LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "1000"},
+                {"filterType": "MIN_NOTIONAL", "notional": "5"},
+            ],
+        }
+
+    def ticker(self, symbol: str) -> dict:
+        now = int(time.time() * 1000)
+        p = self._price(symbol, now)
+        return {"symbol": symbol, "lastPrice": f"{p:.4f}", "priceChangePercent": "1.0",
+                "quoteVolume": f"{5_000_000 + 1000 * (sum(map(ord, symbol)) % 997):.2f}"}
+
+    def premium(self, symbol: str) -> dict:
+        now = int(time.time() * 1000)
+        return {"symbol": symbol, "markPrice": f"{self._price(symbol, now):.4f}", "lastFundingRate": "0.0001"}
+
+    # ---------- routes ----------
+    def routes(self, app: web.Application):
+        r = app.router
+        r.add_get("/fapi/v1/time", self.h_time)
+        r.add_get("/fapi/v1/exchangeInfo", self.h_exchange_info)
+        r.add_get("/fapi/v1/klines", self.h_klines)
+        r.add_get("/fapi/v2/ticker/price", self.h_ticker_price)
+        r.add_get("/fapi/v1/ticker/24hr", self.h_ticker_24hr)
+        r.add_get("/fapi/v1/premiumIndex", self.h_premium)
+        r.add_get("/fapi/v3/balance", self.h_balance)
+        r.add_post("/fapi/v1/leverage", self.h_leverage)
+        r.add_post("/fapi/v1/order", self.h_order)
+        r.add_post("/fapi/v1/batchOrders", self.h_batch_orders)
+        r.add_get("/fapi/v3/positionRisk", self.h_position_risk)
+        r.add_post("/fapi/v1/listenKey", self.h_listen_key)
+        r.add_put("/fapi/v1/listenKey", self.h_listen_key)
+        r.add_delete("/fapi/v1/listenKey", self.h_listen_key)
+        r.add_get("/ws/!markPrice@arr@1s", self.h_mark_ws)
+        r.add_get("/ws/{listen_key}", self.h_user_ws)
+        r.add_get("/__stats", self.h_stats)
+
+    async def h_stats(self, req):
+        st = self.stats()
+        if req.query.get("reset"):
+            self.reset_stats()
+        return web.json_response(st)
+
+    async def h_time(self, req):
+        return web.json_response({"serverTime": int(time.time() * 1000)})
+
+    async def h_exchange_info(self, req):
+        return web.json_response({"symbols": [self.symbol_info(s) for s in self.symbols]})
+
+    async def h_klines(self, req):
+        q = req.query
+        start = q.get("startTime")
+        step = _step_ms(q.get("interval", "")) or self.interval_ms
+        return web.json_response(
+            self.klines(q["symbol"], int(q.get("limit", 500)), int(start) if start else None, step)
+        )
+
+    async def h_ticker_price(self, req):
+        s = req.query.get("symbol")
+        if s:
+            return web.json_response({"symbol": s, "price": self.ticker(s)["lastPrice"]})
+        return web.json_response([{"symbol": x, "price": self.ticker(x)["lastPrice"]} for x in self.symbols])
+
+    async def h_ticker_24hr(self, req):
+        s = req.query.get("symbol")
+        return web.json_response(self.ticker(s) if s else [self.ticker(x) for x in self.symbols])
+
+    async def h_premium(self, req):
+        s = req.query.get("symbol")
+        return web.json_response(self.premium(s) if s else [self.premium(x) for x in self.symbols])
+
+    async def h_balance(self, req):
+        return web.json_response([{"asset": "USDT", "balance": "10000.0", "availableBalance": "10000.0"}])
+
+    async def h_leverage(self, req):
+        q = req.query
+        return web.json_response({"symbol": q.get("symbol"), "leverage": int(q.get("leverage", 1)),
+                                  "maxNotionalValue": "1000000"})
+
+    def fill(self, symbol: str, side: str, qty: float) -> dict:
+        """市價單立即全部成交：更新持倉並回傳 (成交價, 已實現損益)。"""
+        price = self._price(symbol, int(time.time() * 1000))
+        amt, entry = self.positions.get(symbol, [0.0, 0.0])
+        delta = qty if side == "BUY" else -qty
+        realized = 0.0
+        new = amt + delta
+        if amt == 0 or (amt > 0) == (delta > 0):
+            entry = (abs(amt) * entry + qty * price) / abs(new)
+        else:
+            closed = min(abs(amt), qty)
+            realized = closed * (price - entry) * (1 if amt > 0 else -1)
+            if new != 0 and (new > 0) != (amt > 0):
+                entry = price
+        self.positions[symbol] = [new, entry if new else 0.0]
+        return {"price": price, "realized": realized}
+
+    async def push_user(self, msg: dict):
+        for ws in list(self.user_ws):
+            try:
+                await ws.send_json(msg)
+            except Exception:
+                self.user_ws.discard(ws)
+
+    async def execute(self, sym: str, side: str, qty: float, otype: str = "MARKET") -> dict:
+        if qty <= 0:
+            return {"code": -4003, "msg": "Quantity less than or equal to zero."}
+        self.orders += 1
+        f = self.fill(sym, side, qty)
+        now = int(time.time() * 1000)
+        amt, entry = self.positions[sym]
+        # 與真實交易所相同：先推 ACCOUNT_UPDATE 再推成交
+        await self.push_user({"e": "ACCOUNT_UPDATE", "E": now, "T": now, "a": {
+            "m": "ORDER", "B": [],
+            "P": [{"s": sym, "pa": str(amt), "ep": str(entry), "up": "0", "ps": "BOTH"}]}})
+        await self.push_user({"e": "ORDER_TRADE_UPDATE", "E": now, "T": now, "o": {
+            "s": sym, "S": side, "o": otype, "q": str(qty), "X": "FILLED", "x": "TRADE",
+            "i": self.orders, "l": str(qty), "z": str(qty), "L": f"{f['price']:.4f}",
+            "ap": f"{f['price']:.4f}", "rp": f"{f['realized']:.8f}", "T": now, "ps": "BOTH"}})
+        return {"orderId": self.orders, "symbol": sym, "side": side,
+                "type": otype, "origQty": str(qty), "status": "FILLED"}
+
+    async def h_order(self, req):
+        q = req.query
+        res = await self.execute(q.get("symbol"), q.get("side"), float(q.get("quantity") or 0),
+                                 q.get("type", "MARKET"))
+        return web.json_response(res, status=400 if "code" in res else 200)
+
+    async def h_batch_orders(self, req):
+        orders = json.loads(req.query.get("batchOrders") or "[]")
+        if not 0 < len(orders) <= 5:
+            return web.json_response({"code": -1130, "msg": "Invalid batchOrders."}, status=400)
+        res = [await self.execute(o.get("symbol"), o.get("side"), float(o.get("quantity") or 0),
+                                  o.get("type", "MARKET")) for o in orders]
+        return web.json_response(res)
+
+    async def h_position_risk(self, req):
+        now = int(time.time() * 1000)
+        return web.json_response([
+            {"symbol": s, "positionAmt": str(amt), "entryPrice": str(entry),
+             "markPrice": f"{self._price(s, now):.4f}", "unRealizedProfit": "0", "positionSide": "BOTH",
+             "updateTime": now}
+            for s, (amt, entry) in self.positions.items()
+        ])
+
+    async def h_listen_key(self, req):
+        return web.json_response({"listenKey": "mock-listen-key"} if req.method == "POST" else {})
+
+    async def h_mark_ws(self, req):
+        """全市場標記價格，每秒推送一次陣列。"""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(req)
+        try:
+            while not ws.closed:
+                now = int(time.time() * 1000)
+                await ws.send_json([{"e": "markPriceUpdate", "E": now, "s": s,
+                                     "p": f"{self._price(s, now):.4f}", "r": "0.0001"} for s in self.symbols])
+                await asyncio.sleep(1)
+        except ConnectionResetError:
+            pass
+        return ws
+
+    async def h_user_ws(self, req):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(req)
+        self.user_ws.add(ws)
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            self.user_ws.discard(ws)
+        return ws
+
+
+def make_app(exchange: MockExchange) -> web.Application:
+    app = web.Application(middlewares=[exchange.middleware])
+    app["exchange"] = exchange
+    exchange.routes(app)
+    return app
+
+
+async def serve(exchange: MockExchange, host: str = "127.0.0.1", port: int = 8080) -> web.AppRunner:
+    """啟動替身伺服器並回傳 runner（呼叫端負責 runner.cleanup()）。"""
+    runner = web.AppRunner(make_app(exchange), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    ap = argparse.ArgumentParser(description="本地 USDT-M 期貨替身伺服器")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--symbols", type=int, default=7)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--weight-limit", type=int, default=0, help="0 = 不限制")
+    args = ap.parse_args()
+
+    async def _serve():
+        ex = MockExchange(make_symbols(args.symbols), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, weight_limit=args.weight_limit)
+        runner = await serve(ex, args.host, args.port)
+        print(f"[MOCK] serving {args.symbols} symbols on http://{args.host}:{args.port}")
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# tools/verify_resample.py
+"""
+驗證本地重採樣：以交易所的 1m K 線合成較高週期，逐根比對交易所直接回傳的同週期 K 線
+（只比已收盤的 K 線；OHLC 與時間需完全一致，成交量類欄位容許浮點誤差）。
+    python -m tools.verify_resample --symbols BTCUSDT,ETHUSDT --intervals 5m,15m,1h,4h
+    python -m tools.verify_resample --mock              # 本地替身交易所（tools.mock_exchange）
+    python -m tools.verify_resample --record tests/fixtures/klines   # 比對的同時把交易所回應存成 fixture
+    python -m tools.verify_resample --fixtures tests/fixtures/klines # 離線重跑已錄下的 fixture
+fixture 為 <SYMBOL>-<interval>.json（交易所 klines 回應原樣），tests/test_resample.py 也會讀。
+有不一致時 exit code 為 1，可放進部署前檢查。
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+
+os.environ.setdefault("API_KEY", "verify")
+os.environ.setdefault("API_SECRET", "verify")
+os.environ.setdefault("DEBUG_MODE", "false")
+
+from exchange.bar_aggregator import resample  # noqa: E402
+from exchange.binance_client import BinanceClient  # noqa: E402
+from exchange.kline_cache import interval_ms  # noqa: E402
+
+BASE_LIMIT = 1500   # klines 單次上限
+EXACT = (0, 1, 2, 3, 4, 6)          # open_time / OHLC / close_time
+SUMS = (5, 7, 8, 9, 10)             # volume / quote volume / trades / taker volumes
+
+
+def compare(derived, exchange, rel_tol: float = 1e-9) -> list:
+    """回傳不一致清單 [(open_time, 欄位, 本地, 交易所)]；只比兩邊都有、且已收盤的 K 線。"""
+    ours = {int(r[0]): r for r in derived[:-1]}
+    diffs = []
+    for r in exchange[:-1]:
+        t = int(r[0])
+        d = ours.get(t)
+        if d is None:
+            continue
+        for i in EXACT:
+            if float(d[i]) != float(r[i]):
+                diffs.append((t, i, d[i], r[i]))
+        for i in SUMS:
+            if not math.isclose(float(d[i]), float(r[i]), rel_tol=rel_tol, abs_tol=1e-8):
+                diffs.append((t, i, d[i], r[i]))
+    return diffs
+
+
+class FixtureClient:
+    """以錄下的 fixture 代替交易所：fetch_klines 回傳檔案中最後 limit 根。"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    async def fetch_klines(self, symbol: str, interval: str = None, limit: int = None, start_time: int = None):
+        return load_fixture(self.root, symbol, interval)[-limit:]
+
+    async def close(self):
+        pass
+
+
+def fixture_path(root: str, symbol: str, interval: str) -> str:
+    return os.path.join(root, f"{symbol}-{interval}.json")
+
+
+def load_fixture(root: str, symbol: str, interval: str) -> list:
+    with open(fixture_path(root, symbol, interval), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class RecordingClient:
+    """把每次 fetch_klines 的回應寫成 fixture（同一週期以最後一次為準）。"""
+
+    def __init__(self, client, root: str):
+        self.client = client
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    async def fetch_klines(self, symbol: str, interval: str = None, limit: int = None, start_time: int = None):
+        rows = await self.client.fetch_klines(symbol, interval=interval, limit=limit)
+        with open(fixture_path(self.root, symbol, interval), "w", encoding="utf-8") as f:
+            json.dump(rows, f, separators=(",", ":"))
+        return rows
+
+    async def close(self):
+        await self.client.close()
+
+
+async def verify(client, symbols, intervals, base: str = "1m") -> int:
+    bad = 0
+    base_ms = interval_ms(base)
+    for s in symbols:
+        rows = await client.fetch_klines(s, interval=base, limit=BASE_LIMIT)
+        for iv in intervals:
+            step = interval_ms(iv)
+            derived = resample(rows, step)
+            # 第一個 bucket 可能不完整（base 從中間開始）：丟掉
+            if derived and int(rows[0][0]) % step:
+                derived = derived[1:]
+            ref = await client.fetch_klines(s, interval=iv, limit=max(2, BASE_LIMIT * base_ms // step))
+            diffs = compare(derived, ref)
+            n = len({int(r[0]) for r in derived[:-1]} & {int(r[0]) for r in ref[:-1]})
+            status = "OK" if not diffs and n else "MISMATCH" if diffs else "NO OVERLAP"
+            print(f"[VERIFY] {s} {iv}: {n} closed bars compared, {len(diffs)} diffs -> {status}")
+            for t, i, ours, theirs in diffs[:5]:
+                print(f"    open_time={t} col={i} local={ours} exchange={theirs}")
+            bad += bool(diffs) or not n
+    return bad
+
+
+async def _run(args) -> int:
+    runner = None
+    base_url = args.base_url
+    if args.mock:
+        from tools.mock_exchange import MockExchange, serve
+        runner = await serve(MockExchange(args.symbols.split(",")), port=args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    if args.fixtures:
+        client = FixtureClient(args.fixtures)
+    else:
+        client = BinanceClient("verify", "verify", base_url=base_url or None)
+    if args.record:
+        client = RecordingClient(client, args.record)
+    try:
+        return await verify(client, args.symbols.split(","), args.intervals.split(","), args.base)
+    finally:
+        await client.close()
+        if runner is not None:
+            await runner.cleanup()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="比對本地重採樣與交易所 K 線")
+    ap.add_argument("--symbols", default="BTCUSDT,ETHUSDT")
+    ap.add_argument("--intervals", default="5m,15m,1h,4h")
+    ap.add_argument("--base", default="1m")
+    ap.add_argument("--base-url", default="", help="預設依 config（正式 / TESTNET）")
+    ap.add_argument("--mock", action="store_true", help="改連本地替身交易所")
+    ap.add_argument("--port", type=int, default=18190)
+    ap.add_argument("--record", default="", help="把交易所回應存到此目錄（fixture）")
+    ap.add_argument("--fixtures", default="", help="改讀此目錄下錄好的 fixture，不連網")
+    args = ap.parse_args()
+    sys.exit(1 if asyncio.run(_run(args)) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# tools/ws_replay.py
+"""
+本地 WebSocket 替身伺服器：重播錄好的 Binance combined stream frame。
+
+錄製（連正式 stream，存成 JSONL，每行 {"dt": 相對秒數, "msg": frame}）：
+    python -m tools.ws_replay record --symbols BTCUSDT,ETHUSDT --seconds 120 --out frames.jsonl
+重播：
+    python -m tools.ws_replay serve frames.jsonl --port 8765 --speed 1
+再以 MARKET_DATA_MODE=ws WS_BASE_URL=ws://127.0.0.1:8765 啟動 bot。
+重播時會把 frame 內的事件時間 E 改成當下時間，tick->signal 延遲才有意義。
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import aiohttp
+from aiohttp import web
+
+
+def load_frames(path: str) -> List[dict]:
+    frames = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                frames.append(json.loads(line))
+    return frames
+
+
+def _rebase(msg: dict) -> dict:
+    data = msg.get("data", msg)
+    if "E" in data:
+        data["E"] = int(time.time() * 1000)
+    return msg
+
+
+def make_app(frames: List[dict], speed: float = 1.0, loop_forever: bool = False) -> web.Application:
+    async def stream(request: web.Request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        # 只送客戶端有訂閱的 stream（無 streams 參數則全送）
+        wanted = set(filter(None, request.query.get("streams", "").split("/")))
+        request.app["connections"] += 1
+        try:
+            while True:
+                prev = 0.0
+                for fr in frames:
+                    dt = float(fr.get("dt", 0.0))
+                    if speed > 0 and dt > prev:
+                        await asyncio.sleep((dt - prev) / speed)
+                    prev = dt
+                    msg = fr.get("msg", fr)
+                    if wanted and msg.get("stream") not in wanted:
+                        continue
+                    if ws.closed:
+                        return ws
+                    await ws.send_str(json.dumps(_rebase(msg)))
+                    request.app["sent"] += 1
+                if not loop_forever:
+                    break
+        finally:
+            await ws.close()
+        return ws
+
+    app = web.Application()
+    app["connections"] = 0
+    app["sent"] = 0
+    app.router.add_get("/stream", stream)
+    app.router.add_get("/ws", stream)
+    return app
+
+
+async def serve(frames: List[dict], host: str = "127.0.0.1", port: int = 8765,
+                speed: float = 1.0, loop_forever: bool = False) -> web.AppRunner:
+    """啟動替身伺服器並回傳 runner（呼叫端負責 runner.cleanup()）。"""
+    runner = web.AppRunner(make_app(frames, speed, loop_forever))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+async def record(url: str, symbols: List[str], interval: str, seconds: float, out: str):
+    names = []
+    for s in symbols:
+        s = s.lower()
+        names += [f"{s}@kline_{interval}", f"{s}@markPrice@1s", f"{s}@ticker"]
+    full = f"{url.rstrip('/')}/stream?streams={'/'.join(names)}"
+    t0 = time.monotonic()
+    n = 0
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(full) as ws:
+            with open(out, "w", encoding="utf-8") as f:
+                while time.monotonic() - t0 < seconds:
+                    try:
+                        msg = await ws.receive(timeout=max(0.1, seconds - (time.monotonic() - t0)))
+                    except asyncio.TimeoutError:
+                        break
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        break
+                    f.write(json.dumps({"dt": round(time.monotonic() - t0, 6), "msg": json.loads(msg.data)}) + "\n")
+                    n += 1
+    print(f"[REPLAY] recorded {n} frames -> {out}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Binance combined stream 錄製 / 重播")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("record")
+    r.add_argument("--url", default="wss://fstream.binance.com")
+    r.add_argument("--symbols", required=True)
+    r.add_argument("--interval", default="5m")
+    r.add_argument("--seconds", type=float, default=60)
+    r.add_argument("--out", default="frames.jsonl")
+    sv = sub.add_parser("serve")
+    sv.add_argument("frames")
+    sv.add_argument("--host", default="127.0.0.1")
+    sv.add_argument("--port", type=int, default=8765)
+    sv.add_argument("--speed", type=float, default=1.0, help="0 = 不等待，全速送出")
+    sv.add_argument("--loop", action="store_true")
+    args = ap.parse_args()
+
+    if args.cmd == "record":
+        asyncio.run(record(args.url, args.symbols.split(","), args.interval, args.seconds, args.out))
+        return
+
+    async def _serve():
+        runner = await serve(load_frames(args.frames), args.host, args.port, args.speed, args.loop)
+        print(f"[REPLAY] serving {args.frames} on ws://{args.host}:{args.port}/stream")
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()